@@ -0,0 +1,117 @@
+"""
+Equivalence check and micro-benchmark for utils.clear_text
+
+Compares the str.translate based normalizer against the previous
+regex/concatenation implementation (kept below as the reference) on the
+documents in test_files/ plus synthetic text, then times both.
+
+Usage:
+    python benchmarks/bench_clear_text.py [--repeat N]
+Exits with status 1 if any output differs.
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.clear_text import no_accent_vietnamese, remove_special_character  # noqa: E402
+
+
+# ============= Reference implementation =============
+
+def reference_no_accent_vietnamese(s):
+    s = re.sub(r'[àáạảãâầấậẩẫăằắặẳẵ]', 'a', s)
+    s = re.sub(r'[ÀÁẠẢÃĂẰẮẶẲẴÂẦẤẬẨẪ]', 'A', s)
+    s = re.sub(r'[èéẹẻẽêềếệểễ]', 'e', s)
+    s = re.sub(r'[ÈÉẸẺẼÊỀẾỆỂỄ]', 'E', s)
+    s = re.sub(r'[òóọỏõôồốộổỗơờớợởỡ]', 'o', s)
+    s = re.sub(r'[ÒÓỌỎÕÔỒỐỘỔỖƠỜỚỢỞỠ]', 'O', s)
+    s = re.sub(r'[ìíịỉĩ]', 'i', s)
+    s = re.sub(r'[ÌÍỊỈĨ]', 'I', s)
+    s = re.sub(r'[ùúụủũưừứựửữ]', 'u', s)
+    s = re.sub(r'[ƯỪỨỰỬỮÙÚỤỦŨ]', 'U', s)
+    s = re.sub(r'[ỳýỵỷỹ]', 'y', s)
+    s = re.sub(r'[ỲÝỴỶỸ]', 'Y', s)
+    s = re.sub(r'[Đ]', 'D', s)
+    s = re.sub(r'[đ]', 'd', s)
+    return s
+
+
+def reference_remove_special_character(lines):
+    new_lines = ""
+    for line in lines.split("\n"):
+        clear_line = ""
+        for i, c in enumerate(reference_no_accent_vietnamese(line)):
+            if len(c.encode("utf-8")) > 1:
+                clear_line += " "
+            elif '\x0c'.encode() is line[i].encode():
+                pass
+            else:
+                clear_line += line[i]
+        if len(clear_line) > 0:
+            new_lines += clear_line + "\n"
+    return new_lines
+
+
+# ============= Corpus =============
+
+def load_corpus():
+    """Texts from test_files/ (PDFs need pdfplumber) plus synthetic samples"""
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(ROOT, "test_files", "*"))):
+        name = os.path.basename(path)
+        if path.lower().endswith(".txt"):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                corpus[name] = f.read()
+        elif path.lower().endswith(".pdf"):
+            try:
+                import pdfplumber
+            except ImportError:
+                print(f"skipping {name}: pdfplumber not installed")
+                continue
+            with pdfplumber.open(path) as pdf:
+                corpus[name] = "\n".join(page.extract_text() or "" for page in pdf.pages)
+
+    # every character of the Latin, Vietnamese and common symbol blocks
+    symbols = "".join(chr(c) for c in range(0x00, 0x250)) + "".join(chr(c) for c in range(0x1E00, 0x1F00))
+    corpus["synthetic:charset"] = "\n".join(symbols[i:i + 64] for i in range(0, len(symbols), 64))
+    corpus["synthetic:formfeed"] = "Page 1\x0c\n\x0c\nNguyễn Văn A\x0c Đà Nẵng\n\n\n•  Java • Python ★ ✓"
+    corpus["synthetic:long"] = "\n".join(corpus.values()) * 20
+    return corpus
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--repeat", type=int, default=20, help="timing iterations per document")
+    args = arg_parser.parse_args()
+
+    corpus = load_corpus()
+    mismatches = 0
+    for name, text in corpus.items():
+        if no_accent_vietnamese(text) != reference_no_accent_vietnamese(text):
+            print(f"MISMATCH no_accent_vietnamese: {name}")
+            mismatches += 1
+        if remove_special_character(text) != reference_remove_special_character(text):
+            print(f"MISMATCH remove_special_character: {name}")
+            mismatches += 1
+    print(f"equivalence: {len(corpus)} documents, {mismatches} mismatch(es)")
+
+    print(f"{'document':40} {'chars':>8} {'reference ms':>13} {'current ms':>11} {'speedup':>8}")
+    for name, text in corpus.items():
+        reference = min(timeit.repeat(lambda: reference_remove_special_character(text),
+                                      number=1, repeat=args.repeat))
+        current = min(timeit.repeat(lambda: remove_special_character(text),
+                                    number=1, repeat=args.repeat))
+        print(f"{name[:40]:40} {len(text):8d} {reference * 1000:13.3f} {current * 1000:11.3f} "
+              f"{reference / current:7.1f}x")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Local stand-in for the Gemini REST API
+
+Answers generateContent and streamGenerateContent (alt=sse, or the JSON
+array stream the REST client asks for) with a
+schema-shaped JSON extraction, with configurable latency, 429/503 error
+rate and hanging requests, so the scheduler, retries, timeouts and the
+full /upload route can be exercised without network access or quota.
+
+Point the service at it with, in configs/config.yaml:
+    gemini_transport: rest
+    gemini_api_endpoint: http://127.0.0.1:8765
+and any non-empty GEMINI_API_KEY.
+
+Usage:
+    python benchmarks/fake_gemini_server.py [--port 8765] [--latency 0.2]
+        [--error-rate 0.1] [--hang-rate 0.0]
+GET /stats returns request counters; POST /reset clears them.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PHONE = re.compile(r"(?:\+84|0)\d[\d .-]{7,12}\d")
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+def fake_extraction(text: str) -> dict:
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    phone = PHONE.search(text)
+    email = EMAIL.search(text)
+    return {
+        "context": lines[1] if len(lines) > 1 else "",
+        "profession": "",
+        "specialty": "",
+        "fullname": lines[0] if lines else "",
+        "phone": phone.group(0) if phone else "",
+        "abbreviation": [],
+        "skill": [],
+        "education": [],
+        "email": email.group(0) if email else "",
+    }
+
+
+def fake_answer(prompt: str) -> str:
+    """JSON text matching the single or grouped extraction schema"""
+    documents = re.split(r"=== Document (\d+) ===\n", prompt)
+    if len(documents) > 1:
+        items = []
+        for index, text in zip(documents[1::2], documents[2::2]):
+            items.append({"document_index": int(index), **fake_extraction(text)})
+        return json.dumps(items, ensure_ascii=False)
+    match = re.search(r"extract information from (.*) and return the information", prompt, re.S)
+    return json.dumps(fake_extraction(match.group(1) if match else prompt), ensure_ascii=False)
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeGemini/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith("/stats"):
+            with self.server.lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if self.path.startswith("/reset"):
+            with self.server.lock:
+                self.server.stats.clear()
+            return self._send_json(200, {})
+        streaming = ":streamGenerateContent" in self.path
+        if not streaming and ":generateContent" not in self.path:
+            return self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+        with self.server.lock:
+            self.server.stats["requests"] = self.server.stats.get("requests", 0) + 1
+            self.server.stats["in_flight"] = self.server.stats.get("in_flight", 0) + 1
+            self.server.stats["max_in_flight"] = max(self.server.stats.get("max_in_flight", 0),
+                                                     self.server.stats["in_flight"])
+        try:
+            self._generate(json.loads(body or b"{}"), streaming)
+        finally:
+            with self.server.lock:
+                self.server.stats["in_flight"] -= 1
+
+    def _generate(self, request: dict, streaming: bool):
+        roll = random.random()
+        if roll < self.server.hang_rate:
+            self._count("hung")
+            time.sleep(3600)
+            return
+        if roll < self.server.hang_rate + self.server.error_rate:
+            self._count("errors")
+            status, name = random.choice([(429, "RESOURCE_EXHAUSTED"), (503, "UNAVAILABLE")])
+            return self._send_json(status, {"error": {"code": status, "message": "Fake error", "status": name}})
+        time.sleep(self.server.latency)
+
+        prompt = "".join(part.get("text", "")
+                         for content in request.get("contents", [])
+                         for part in content.get("parts", []))
+        answer = fake_answer(prompt)
+        prompt_tokens = max(1, len(prompt) // 4)
+        output_tokens = max(1, len(answer) // 4)
+        self._count("responses")
+
+        def candidate(text, finish=True):
+            result = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+            if finish:
+                result["finishReason"] = "STOP"
+            return result
+
+        usage = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+                 "totalTokenCount": prompt_tokens + output_tokens}
+        if not streaming:
+            return self._send_json(200, {"candidates": [candidate(answer)], "usageMetadata": usage,
+                                         "modelVersion": "fake-gemini"})
+
+        # A few characters of the answer per chunk, as server-sent events
+        # (alt=sse) or as the elements of one JSON array written piece by piece
+        sse = "alt=sse" in self.path
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if sse else "application/json")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        size = max(1, len(answer) // 4)
+        chunks = [answer[i:i + size] for i in range(0, len(answer), size)]
+        if not sse:
+            self.wfile.write(b"[")
+        for i, chunk in enumerate(chunks):
+            last = i == len(chunks) - 1
+            event = {"candidates": [candidate(chunk, finish=last)], "modelVersion": "fake-gemini"}
+            if last:
+                event["usageMetadata"] = usage
+            if sse:
+                self.wfile.write(b"data: " + json.dumps(event).encode() + b"\r\n\r\n")
+            else:
+                self.wfile.write((b"," if i else b"") + json.dumps(event).encode())
+            self.wfile.flush()
+            time.sleep(self.server.latency / max(1, len(chunks)))
+        if not sse:
+            self.wfile.write(b"]")
+        self.close_connection = True
+
+    def _count(self, key: str):
+        with self.server.lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+
+def start_fake_server(port: int = 0, latency: float = 0.0, error_rate: float = 0.0,
+                      hang_rate: float = 0.0, verbose: bool = False):
+    """Start the server in a daemon thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGeminiHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.hang_rate = hang_rate
+    server.verbose = verbose
+    server.lock = threading.Lock()
+    server.stats = {}
+    threading.Thread(target=server.serve_forever, name="fake-gemini", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--latency", type=float, default=0.2, help="seconds per response")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="share of 429/503 answers")
+    arg_parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests never answered")
+    arg_parser.add_argument("--verbose", action="store_true")
+    args = arg_parser.parse_args()
+
+    server, url = start_fake_server(args.port, args.latency, args.error_rate, args.hang_rate, args.verbose)
+    print(f"Fake Gemini listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+End-to-end benchmark suite with per-stage timings
+
+Runs each stage over the documents in test_files/ plus the synthetic CVs
+from benchmarks/synthetic_documents.py (long, two-column, scanned, DOCX,
+RTF) and reports p50/p95 latency, throughput and peak RSS per stage:
+
+    pdf_extract   utils.extract_text.pdf_extract on every PDF
+    doc_extract   utils.extract_text.doc_extract on every other document
+    ocr           utils.ocr_processor.extract_text_with_ocr on every PDF (page
+                  routing, plus OCR of the pages that need it)
+    clean_text    utils.clear_text.remove_special_character on the raw text
+    upload        POST /upload end to end, with benchmarks/fake_gemini_server.py
+                  standing in for Gemini and the result cache disabled
+
+Results are written as JSON; --compare reports the change against an
+earlier run and exits with status 1 when a stage is slower than
+--threshold percent, so runs on two commits can be compared directly.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--stages pdf_extract,upload] [--repeat 5]
+        [--output results.json] [--compare baseline.json] [--threshold 10]
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.chdir(ROOT)
+
+from synthetic_documents import write_corpus  # noqa: E402
+
+STAGES = ("pdf_extract", "doc_extract", "ocr", "clean_text", "upload")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# ============= Measurement =============
+
+def _rss_bytes(pid: str = "self") -> int:
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def _child_pids(pid: str = "self") -> List[str]:
+    children = []
+    for task in glob.glob(f"/proc/{pid}/task/*/children"):
+        try:
+            with open(task) as f:
+                children.extend(f.read().split())
+        except OSError:
+            continue
+    return children
+
+
+def tree_rss_bytes() -> Optional[int]:
+    """RSS of this process and all its descendants (worker pools), or None off Linux"""
+    if not os.path.exists("/proc/self/statm"):
+        return None
+    total, pending = 0, ["self"]
+    while pending:
+        pid = pending.pop()
+        try:
+            total += _rss_bytes(pid)
+        except OSError:
+            # exited while we looked
+            continue
+        pending.extend(_child_pids(pid))
+    return total
+
+
+class RSSSampler:
+    """Peak RSS of the process tree while the block runs, sampled every interval seconds"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start = self.peak = tree_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = tree_rss_bytes()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if self.peak is None:
+            # no /proc: fall back to the lifetime peak of this process
+            import resource
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linearly interpolated percentile, q in [0, 100]"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "runs": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def run_stage(name: str, documents: Dict[str, str], func: Callable[[str, str], object],
+              repeat: int, warmup: int, verbose: bool = False) -> dict:
+    """Time func(name, path) for every document; errors are recorded, not raised"""
+    timings: Dict[str, List[float]] = {}
+    errors: Dict[str, str] = {}
+    # the pipeline prints progress on every call
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    t_stage = time.perf_counter()
+    with RSSSampler() as rss, quiet:
+        for doc_name, path in documents.items():
+            try:
+                for _ in range(warmup):
+                    func(doc_name, path)
+                samples = []
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    func(doc_name, path)
+                    samples.append(time.perf_counter() - t0)
+                timings[doc_name] = samples
+            except Exception as e:
+                errors[doc_name] = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - t_stage
+    samples = [sample for values in timings.values() for sample in values]
+    busy = sum(samples)
+    result = {
+        **summarize(samples),
+        "documents_per_second": round(len(samples) / busy, 3) if busy else 0.0,
+        "wall_seconds": round(wall, 3),
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1) if rss.peak else None,
+        "rss_growth_mb": round((rss.peak - rss.start) / 2 ** 20, 1) if rss.peak and rss.start else None,
+        "documents": {doc_name: summarize(values) for doc_name, values in timings.items()},
+    }
+    if errors:
+        result["errors"] = errors
+    print(f"{name:12} {result['runs']:5d} runs  p50 {result['p50_ms']:10.2f} ms  p95 {result['p95_ms']:10.2f} ms  "
+          f"{result['documents_per_second']:8.2f} docs/s  peak RSS {result['peak_rss_mb']} MB"
+          + (f"  ({len(errors)} error(s))" if errors else ""))
+    return result
+
+
+# ============= Stages =============
+
+def extraction_stages(pdfs: Dict[str, str], others: Dict[str, str]) -> Dict[str, tuple]:
+    from utils.clear_text import remove_special_character
+    from utils.document_formats import document_format, extract_native
+    from utils.extract_text import doc_extract, pdf_extract
+    from utils.pdf_document import open_analysis
+
+    raw_texts = {}
+    for name, path in pdfs.items():
+        with open_analysis(path) as pdf:
+            raw_texts[name] = "\n".join(text for text in pdf.page_texts() if text)
+    for name, path in others.items():
+        raw_texts[name] = extract_native(path, document_format(name))[0] or ""
+
+    def ocr(name, path):
+        from utils.ocr_processor import extract_text_with_ocr
+        return extract_text_with_ocr(path)
+
+    return {
+        "pdf_extract": (pdfs, lambda name, path: pdf_extract(path)),
+        "doc_extract": (others, lambda name, path: doc_extract(path, name)),
+        "ocr": (pdfs, ocr),
+        "clean_text": ({**pdfs, **others}, lambda name, path: remove_special_character(raw_texts[name])),
+    }
+
+
+def upload_stage(latency: float):
+    """(call, cleanup) for /upload against a fake Gemini server"""
+    from fake_gemini_server import start_fake_server
+    from utils.util import get_config
+
+    server, url = start_fake_server(latency=latency)
+    os.environ["GEMINI_API_KEY"] = "benchmark"
+    # Point the Gemini client at the fake server and lift the rate limit,
+    # which would otherwise dominate a long run
+    get_config().update(gemini_transport="rest", gemini_api_endpoint=url, gemini_requests_per_minute=0)
+
+    from fastapi.testclient import TestClient
+    import main
+    from utils.result_cache import ResultCache
+
+    # every run must do the full work
+    main.result_cache = ResultCache([])
+    client = TestClient(main.app)
+
+    def call(name, path):
+        with open(path, "rb") as f:
+            response = client.post("/upload", files={"file": (name, f)})
+        response.raise_for_status()
+        ai_extraction = response.json()["ai_extraction"]
+        if "error" in ai_extraction:
+            raise RuntimeError(ai_extraction.get("message") or ai_extraction["error"])
+
+    def cleanup():
+        main.worker_pools.shutdown()
+        server.shutdown()
+
+    return call, cleanup
+
+
+# ============= Reporting =============
+
+def git_revision() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=ROOT, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, cwd=ROOT).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> int:
+    """Print per-stage changes; returns the number of regressions beyond threshold percent"""
+    regressions = 0
+    print(f"\ncompared with {baseline.get('commit')} ({baseline.get('timestamp')})")
+    print(f"{'stage':12} {'metric':8} {'baseline':>12} {'current':>12} {'change':>9}")
+    for stage, result in current["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            print(f"{stage:12} (not in baseline)")
+            continue
+        for metric in ("p50_ms", "p95_ms", "peak_rss_mb"):
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            flag = ""
+            if metric != "peak_rss_mb" and change > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{stage:12} {metric:8} {old:12.2f} {new:12.2f} {change:+8.1f}%{flag}")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of " + ", ".join(STAGES))
+    arg_parser.add_argument("--repeat", type=int, default=5, help="timed runs per document")
+    arg_parser.add_argument("--warmup", type=int, default=1, help="untimed runs per document first")
+    arg_parser.add_argument("--pages", type=int, default=30, help="pages in the long synthetic PDF")
+    arg_parser.add_argument("--no-synthetic", action="store_true", help="only use test_files/")
+    arg_parser.add_argument("--gemini-latency", type=float, default=0.2, help="fake Gemini seconds per call")
+    arg_parser.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    arg_parser.add_argument("--compare", help="earlier results file to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    arg_parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+    args = arg_parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        arg_parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory(prefix="resume-bench-") as synthetic_dir:
+        paths = sorted(glob.glob(os.path.join(ROOT, "test_files", "*")))
+        if not args.no_synthetic:
+            paths += write_corpus(synthetic_dir, args.pages)
+        pdfs = {os.path.basename(path): path for path in paths if path.lower().endswith(".pdf")}
+        others = {os.path.basename(path): path for path in paths if not path.lower().endswith(".pdf")}
+
+        revision = git_revision()
+        results = {
+            **revision,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": {"repeat": args.repeat, "warmup": args.warmup, "pages": args.pages,
+                         "synthetic": not args.no_synthetic, "gemini_latency": args.gemini_latency},
+            "stages": {},
+        }
+        try:
+            from utils.ocr_processor import ocr_processor
+            results["ocr_status"] = ocr_processor.get_ocr_status()
+        except ImportError:
+            results["ocr_status"] = None
+
+        extraction = extraction_stages(pdfs, others)
+        for stage in stages:
+            if stage == "upload":
+                call, cleanup = upload_stage(args.gemini_latency)
+                try:
+                    results["stages"][stage] = run_stage(stage, {**pdfs, **others}, call, args.repeat, args.warmup,
+                                                         args.verbose)
+                finally:
+                    cleanup()
+            else:
+                documents, func = extraction[stage]
+                results["stages"][stage] = run_stage(stage, documents, func, args.repeat, args.warmup, args.verbose)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{revision['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
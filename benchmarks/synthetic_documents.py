@@ -0,0 +1,277 @@
+"""
+Synthetic CVs for the benchmark suite
+
+Writes deterministic documents that stress the extraction paths the
+test_files/ corpus does not: a long single-column PDF, a two-column PDF,
+a scanned (image-only) PDF, a mixed PDF (typed pages followed by scanned
+ones), a DOCX and an RTF. PDFs are written directly
+(no PDF library needed); the scanned pages are rendered with Pillow.
+
+Usage:
+    python benchmarks/synthetic_documents.py OUTPUT_DIR [--pages 30]
+"""
+import argparse
+import io
+import os
+import random
+import textwrap
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+# A4 in PDF points
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+FONT_SIZE = 10
+LEADING = 13
+MARGIN = 50
+
+FIRST_NAMES = ["Nguyen Van", "Tran Thi", "Le Minh", "Pham Quoc", "Hoang Anh", "Vu Thanh"]
+LAST_NAMES = ["An", "Binh", "Chau", "Dung", "Khang", "Thuan"]
+COMPANIES = ["BrightPath Technologies", "Saigon Software Solutions", "Hanoi Digital Labs",
+             "Mekong Data Systems", "Blue Ocean Consulting", "Red River Fintech"]
+TITLES = ["Software Engineer", "Senior Backend Developer", "Data Engineer", "QA Engineer",
+          "Frontend Developer", "DevOps Engineer"]
+SKILLS = ["Python", "Java", "JavaScript", "TypeScript", "React", "Node.js", "Spring Boot", "SQL",
+          "PostgreSQL", "MySQL", "Docker", "Kubernetes", "AWS", "Git", "FastAPI", "Redis"]
+DUTIES = [
+    "Designed and maintained REST services handling several million requests per day",
+    "Migrated the reporting pipeline to a streaming architecture and cut latency by half",
+    "Wrote integration tests and set up continuous delivery for four product teams",
+    "Mentored junior developers and ran weekly code review sessions",
+    "Profiled slow database queries and added indexes and caching where they paid off",
+    "Worked with product owners to turn customer feedback into a quarterly roadmap",
+]
+
+
+def cv_sections(rng: random.Random, jobs: int) -> Tuple[List[str], List[str]]:
+    """(sidebar lines, main lines) of one CV"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    phone = "09" + "".join(rng.choice("0123456789") for _ in range(8))
+    sidebar = [
+        name.upper(),
+        rng.choice(TITLES),
+        "",
+        "CONTACT",
+        f"Phone: {phone}",
+        f"Email: {name.lower().replace(' ', '.')}@example.com",
+        "github.com/" + name.lower().replace(" ", ""),
+        "Ho Chi Minh City, Vietnam",
+        "",
+        "SKILLS",
+        *rng.sample(SKILLS, 10),
+        "",
+        "LANGUAGES",
+        "English - IELTS 7.0",
+        "Vietnamese - Native",
+    ]
+    main = ["SUMMARY", "Engineer with experience building reliable backend systems and data pipelines.", ""]
+    main.append("WORK EXPERIENCE")
+    year = 2024
+    for _ in range(jobs):
+        start = year - rng.randint(1, 3)
+        main.append(f"{rng.choice(TITLES)} - {rng.choice(COMPANIES)} ({start} - {year})")
+        main.extend("- " + duty for duty in rng.sample(DUTIES, 4))
+        main.append("")
+        year = start
+    main.extend([
+        "EDUCATION",
+        f"Bachelor of Computer Science, University of Science ({year - 4} - {year})",
+        "",
+        "PROJECTS",
+        "Resume parser: PDF and OCR extraction with structured output",
+        "Inventory service: event-sourced stock tracking for 200 stores",
+    ])
+    return sidebar, main
+
+
+def wrap(lines: List[str], width: int) -> List[str]:
+    wrapped = []
+    for line in lines:
+        wrapped.extend(textwrap.wrap(line, width) or [""])
+    return wrapped
+
+
+def _escape(text: str) -> bytes:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace")
+
+
+def text_stream(columns: List[Tuple[int, List[str]]]) -> bytes:
+    """Content stream drawing each (x, lines) column from the top margin"""
+    out = [b"BT", b"/F1 %d Tf" % FONT_SIZE, b"%d TL" % LEADING]
+    for x, lines in columns:
+        out.append(b"1 0 0 1 %d %d Tm" % (x, PAGE_HEIGHT - MARGIN))
+        for line in lines:
+            out.append(b"(" + _escape(line) + b") '")
+    out.append(b"ET")
+    return b"\n".join(out)
+
+
+def paginate(lines: List[str]) -> List[List[str]]:
+    per_page = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+    return [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+
+
+def write_pdf(pages: List[Dict[str, bytes]]) -> bytes:
+    """
+    Minimal PDF: each page is {"content": stream} and optionally
+    {"image": jpeg bytes, "size": (w, h)} drawn full page as /Im1
+    """
+    objects: List[Optional[bytes]] = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+                                                  b"/Encoding /WinAnsiEncoding >>"]
+    page_ids = []
+    for page in pages:
+        resources = b"/Font << /F1 3 0 R >>"
+        if "image" in page:
+            width, height = page["size"]
+            objects.append(b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                           b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\nstream\n"
+                           % (width, height, len(page["image"])) + page["image"] + b"\nendstream")
+            resources += b" /XObject << /Im1 %d 0 R >>" % len(objects)
+        content = page["content"]
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << %s >> /Contents %d 0 R >>"
+                       % (PAGE_WIDTH, PAGE_HEIGHT, resources, content_id))
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def long_pdf(rng: random.Random, pages: int) -> bytes:
+    _, main = cv_sections(rng, jobs=max(1, pages * 10))
+    return write_pdf([{"content": text_stream([(MARGIN, lines)])}
+                      for lines in paginate(wrap(main, 95))[:pages]])
+
+
+def two_column_pdf(rng: random.Random, pages: int = 3) -> bytes:
+    sidebar, main = cv_sections(rng, jobs=pages * 5)
+    main_pages = paginate(wrap(main, 62))[:pages]
+    sidebar_pages = paginate(wrap(sidebar, 28))
+    return write_pdf([
+        {"content": text_stream([(MARGIN, sidebar_pages[i] if i < len(sidebar_pages) else []),
+                                 (MARGIN + 190, lines)])}
+        for i, lines in enumerate(main_pages)
+    ])
+
+
+def scanned_pdf(rng: random.Random, pages: int = 2, dpi: int = 150) -> bytes:
+    """Pages that are only a slightly rotated, noisy JPEG of the text"""
+    return write_pdf(scanned_pages(rng, pages, dpi))
+
+
+def mixed_pdf(rng: random.Random, text_pages: int = 2, scanned: int = 2) -> bytes:
+    """A typed CV followed by scanned pages (e.g. certificates)"""
+    _, main = cv_sections(rng, jobs=text_pages * 10)
+    typed = [{"content": text_stream([(MARGIN, lines)])} for lines in paginate(wrap(main, 95))[:text_pages]]
+    return write_pdf(typed + scanned_pages(rng, scanned))
+
+
+def scanned_pages(rng: random.Random, pages: int, dpi: int = 150) -> List[Dict[str, bytes]]:
+    from PIL import Image, ImageDraw, ImageFont
+
+    scale = dpi / 72
+    size = (int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale))
+    try:
+        font = ImageFont.load_default(size=int(FONT_SIZE * scale))
+    except TypeError:
+        # Pillow < 10.1 only has the fixed bitmap font
+        font = ImageFont.load_default()
+    sidebar, main = cv_sections(rng, jobs=pages * 3)
+    result = []
+    for lines in paginate(wrap(sidebar + [""] + main, 95))[:pages]:
+        image = Image.new("L", size, 255)
+        draw = ImageDraw.Draw(image)
+        for row, line in enumerate(lines):
+            draw.text((MARGIN * scale, (MARGIN + row * LEADING) * scale), line, fill=0, font=font)
+        for _ in range(size[0] * size[1] // 400):
+            draw.point((rng.randrange(size[0]), rng.randrange(size[1])), fill=rng.randint(120, 220))
+        image = image.rotate(rng.uniform(-1.0, 1.0), fillcolor=255)
+        jpeg = io.BytesIO()
+        image.save(jpeg, format="JPEG", quality=80)
+        result.append({
+            "content": b"q %d 0 0 %d 0 0 cm /Im1 Do Q" % (PAGE_WIDTH, PAGE_HEIGHT),
+            "image": jpeg.getvalue(),
+            "size": size,
+        })
+    return result
+
+
+def docx(rng: random.Random) -> bytes:
+    sidebar, main = cv_sections(rng, jobs=6)
+    paragraphs = "".join(
+        '<w:p><w:r><w:t xml:space="preserve">%s</w:t></w:r></w:p>'
+        % line.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        for line in sidebar + main
+    )
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml",
+                         '<?xml version="1.0" encoding="UTF-8"?>'
+                         '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                         '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                         '<Default Extension="xml" ContentType="application/xml"/>'
+                         '<Override PartName="/word/document.xml" ContentType="application/'
+                         'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+        archive.writestr("_rels/.rels",
+                         '<?xml version="1.0" encoding="UTF-8"?>'
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                         '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                         'relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+        archive.writestr("word/document.xml",
+                         '<?xml version="1.0" encoding="UTF-8"?>'
+                         '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                         f'<w:body>{paragraphs}</w:body></w:document>')
+    return out.getvalue()
+
+
+def rtf(rng: random.Random) -> bytes:
+    sidebar, main = cv_sections(rng, jobs=6)
+    body = "".join(line.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}") + "\\par\n"
+                   for line in sidebar + main)
+    return ("{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 Helvetica;}}\\f0\\fs20\n" + body + "}").encode("ascii")
+
+
+def write_corpus(directory: str, pages: int = 30, seed: int = 7) -> List[str]:
+    """Write the synthetic documents into directory; returns their paths"""
+    os.makedirs(directory, exist_ok=True)
+    documents = {
+        f"synthetic_long_{pages}p.pdf": lambda rng: long_pdf(rng, pages),
+        "synthetic_two_column.pdf": two_column_pdf,
+        "synthetic_scanned.pdf": scanned_pdf,
+        "synthetic_mixed.pdf": mixed_pdf,
+        "synthetic.docx": docx,
+        "synthetic.rtf": rtf,
+    }
+    paths = []
+    for name, build in documents.items():
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(build(random.Random(f"{seed}:{name}")))
+        paths.append(path)
+    return paths
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("output_dir")
+    arg_parser.add_argument("--pages", type=int, default=30, help="pages in the long PDF")
+    args = arg_parser.parse_args()
+    for path in write_corpus(args.output_dir, args.pages):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
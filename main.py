@@ -1,19 +1,45 @@
-import uvicorn 
-from fastapi import FastAPI, Form,File, UploadFile
+from fastapi import FastAPI, Form, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from utils.util import load_config
 from starlette.requests import Request
 import time
 import os
-from utils.extract_text import pdf_extract, doc_extract
-from utils.gemini_service import extract_feature_text
+import io
+import json
+import asyncio
+import zipfile
+import uuid
+from contextlib import nullcontext
+from queue import Empty
+from starlette.background import BackgroundTask
+from typing import Optional
+from utils.extract_text import extract_document, extract_document_events
+from utils.document_formats import document_format
+from utils.gemini_service import count_llm_calls, gemini_metrics
+from utils.ner_engine import engine_cache_key, extract_feature, extract_feature_stream, extract_features, get_ner_engine
+from utils.rule_extractor import get_rule_extractor, parse_fields, rules_cover, rules_result, select_fields
+from utils.result_cache import build_cache, content_hash, document_cache_key
+from utils.workers import WorkerPools
+from utils.job_queue import JobStore, JobWorkerPool
+from utils.metrics import (CACHE_LOOKUPS, DOCUMENTS, ERRORS, GEMINI_TOKENS, PDF_ROUTING, REGISTRY,
+                           REQUEST_SECONDS, SharedMetrics, file_type, observe_spans)
+from utils.tracing import SamplingProfiler, span, tracing
+from utils.prefork import ActivityMiddleware, PreforkServer, worker_slot
+from utils.upload import InvalidUpload, UploadTooLarge, spool_multipart
 
-# Check OCR availability
+# Check OCR availability (engines themselves are loaded lazily on first use)
 try:
     from utils.ocr_processor import ocr_processor
-    OCR_STATUS = ocr_processor.get_ocr_status()
 except ImportError:
-    OCR_STATUS = {"tesseract_available": False, "easyocr_available": False, "engines_count": 0}
+    ocr_processor = None
+
+def current_ocr_status():
+    if ocr_processor is None:
+        return {"tesseract_available": False, "easyocr_available": False, "engines_count": 0}
+    return ocr_processor.get_ocr_status()
+
+OCR_STATUS = current_ocr_status()
 
 origins = [
     "*"
@@ -30,9 +56,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# in-flight requests per worker, so the preforking server recycles idle workers only
+app.add_middleware(ActivityMiddleware)
 # ============= Define Config And Setting =============
 CONFIG_PATH = "configs/config.yaml"
 config = load_config(CONFIG_PATH)
+result_cache = build_cache(config)
+worker_pools = WorkerPools.from_config(config)
+job_store = JobStore(config.get("job_db_path", "./data/jobs.sqlite3"))
+job_workers = JobWorkerPool(config)
+MAX_UPLOAD_BYTES = config.get("max_upload_mb", 20) * 1024 * 1024
+UPLOAD_MEMORY_BYTES = config.get("upload_memory_mb", 8) * 1024 * 1024
+# allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+STREAM_POLL_SECONDS = config.get("stream_poll_ms", 50) / 1000
+METRICS_DIR = config.get("metrics_dir", "./data/metrics")
 # =====================================================
 
 # Print OCR status on startup
@@ -45,18 +83,50 @@ if OCR_STATUS['engines_count'] == 0:
 
 # ============= Define Routes =============
 
+@app.on_event("startup")
+def start_job_workers():
+    # With several HTTP workers only the first one runs the job queue workers
+    if worker_slot() in (None, 0):
+        job_workers.start()
+
+@app.on_event("startup")
+def share_metrics():
+    # With several HTTP workers /metrics reports the sum over all of them
+    if worker_slot() is not None:
+        REGISTRY.share(METRICS_DIR, worker_slot(), config.get("metrics_sync_seconds", 5))
+
+@app.on_event("startup")
+def warm_up_ocr():
+    # Optional: load OCR models in the background once the server is up
+    if ocr_processor is not None and config.get("ocr_warmup", False):
+        ocr_processor.warm_up(background=True)
+
+@app.on_event("startup")
+def warm_up_ner():
+    # Optional: load the local NER model when it is going to be used
+    if config.get("extraction_engine", "gemini") != "gemini" and config.get("ner_warmup", False):
+        get_ner_engine().warm_up(background=True)
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    job_workers.stop()
+    worker_pools.shutdown()
+
 @app.get("/")
 async def root():
     return {
         "message": "ResumeAI Parser API",
         "version": "2.0.0",
         "features": ["PDF text extraction", "DOC/DOCX processing", "OCR for image PDFs", "AI-powered data extraction"],
-        "ocr_status": OCR_STATUS
+        "ocr_status": current_ocr_status(),
+        "extraction_engine": config.get("extraction_engine", "gemini"),
+        "ner_status": get_ner_engine().status()
     }
 
 @app.get("/ocr-status")
 async def get_ocr_status():
-    """Get OCR engine availability status"""
+    """Get OCR engine availability and load status (not_loaded, loading, loaded, unavailable)"""
+    OCR_STATUS = current_ocr_status()
     return {
         "ocr_engines": OCR_STATUS,
         "supported_formats": {
@@ -72,8 +142,99 @@ async def get_ocr_status():
         ]
     }
 
-@app.post("/upload")
-async def upload(request: Request, file: UploadFile = File(...)):
+@app.get("/gemini-status")
+async def get_gemini_status():
+    """Get Gemini scheduler metrics: calls, retries, timeouts, deduplicated calls, throttling and latency"""
+    return gemini_metrics()
+
+@app.get("/queue-status")
+async def get_queue_status():
+    """Get worker pool sizes, in-flight uploads and queue depth"""
+    return {
+        **worker_pools.stats(),
+        "jobs": {**job_workers.stats(), **job_store.counts()}
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics (summed over all HTTP workers): stage and request latency histograms, routing, cache, Gemini and error counters"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def route_path(request):
+    # the route template, so /jobs/{job_id} is a single series
+    endpoint = request.scope.get("endpoint")
+    for route in app.routes:
+        if endpoint is not None and getattr(route, "endpoint", None) is endpoint:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Streaming responses are timed until their headers are sent
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - t0, method=request.method,
+                                route=route_path(request), status=status)
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse declared oversized bodies before reading any of them
+    content_length = request.headers.get("content-length")
+    if request.method == "POST" and request.url.path in ("/upload", "/upload/stream", "/jobs") and content_length \
+            and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+        return JSONResponse(status_code=413, content={"detail": str(UploadTooLarge(MAX_UPLOAD_BYTES))})
+    return await call_next(request)
+
+def pdf_routing(ocr_stats):
+    # text, ocr (every page) or mixed (only the scanned pages were OCRed)
+    if not ocr_stats:
+        return "text"
+    if len(ocr_stats.get("pages_ocr", ())) < ocr_stats.get("pages_total", 0):
+        return "mixed"
+    return "ocr"
+
+async def cache_get(layer, key):
+    # The SQLite layer reads (and refreshes LRU order) on disk, so lookups run in the thread pool
+    value = await worker_pools.run_io(result_cache.get, layer, key)
+    CACHE_LOOKUPS.inc(layer=layer, result="miss" if value is None else "hit")
+    return value
+
+async def cache_set(layer, key, value):
+    await worker_pools.run_io(result_cache.set, layer, key, value)
+
+def upload_body(field, multiple=False):
+    # OpenAPI request body for the endpoints that parse their multipart body themselves
+    schema = {"type": "string", "format": "binary"}
+    if multiple:
+        schema = {"type": "array", "items": schema}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": [field], "properties": {field: schema}}}}}}
+
+async def receive_uploads(request, field, max_bytes=None, max_files=None):
+    '''
+        Parse the multipart body as it arrives, writing each file into memory or a temp file
+        The size limits are enforced on the raw stream, so chunked bodies are capped as well
+    '''
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    try:
+        return await spool_multipart(request, field, max_bytes, UPLOAD_MEMORY_BYTES,
+                                     max_bytes + MULTIPART_OVERHEAD_BYTES, max_files)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def receive_upload(request):
+    files = await receive_uploads(request, "file", max_files=1)
+    return files[0]
+
+@app.post("/upload", openapi_extra=upload_body("file"))
+async def upload(request: Request, fields: Optional[str] = None, profile: bool = False):
     '''
         Upload and process documents (PDF, DOC, DOCX) with AI extraction
         
@@ -88,66 +249,474 @@ async def upload(request: Request, file: UploadFile = File(...)):
         - Multi-engine OCR for better accuracy
         - Vietnamese text processing and cleaning
         - AI-powered structured data extraction
+        - Rule-based phone, email, URL, date and skill fields merged into the result
+        
+        Query parameters:
+        - fields: comma-separated extraction fields to return, e.g. fields=phone,email.
+          When every field is rule-based (phone, phones, email, emails, urls, dates, skill)
+          the AI model is not called at all
+        - profile: profile=1 adds a sampled CPU profile of this request to the metadata
+          (extraction then runs in the API process; see profiling_enabled in the config)
         
         Returns:
         - Structured JSON with extracted information
         - Processing metadata and statistics
     '''
+    if profile and not config.get("profiling_enabled", True):
+        raise HTTPException(status_code=403, detail="Profiling is disabled")
+    # Small files stay in memory; large ones spill to a unique temp file
+    spooled = await receive_upload(request)
     try:
-        contents = file.file.read()
-        with open(file.filename, 'wb') as f:
-            f.write(contents)
-    except Exception:
-        return {"message": "There was an error uploading the file"}
+        return await process_upload(spooled, parse_fields(fields), profile)
     finally:
-        file.file.close()
-    
-    tmp_path = file.filename
-    t0 = time.time()
-    ImageBase64 = ''
-    
-    # Track processing method
-    processing_method = "unknown"
-    
-    if ".pdf" in str(tmp_path):
-        resume_text, ImageBase64 = pdf_extract(tmp_path)
-        processing_method = "pdf_extraction"
-    else:
-        resume_text = doc_extract(tmp_path)
-        processing_method = "document_extraction"
-    
-    resume_text = resume_text.replace("\t", " \t")
-    processing_time = time.time() - t0
-    
-    print("data", extract_feature_text(resume_text))
-    print("Processing time:", processing_time)
-    
-    # Safe file cleanup
+        spooled.cleanup()
+
+@app.post("/upload/stream", openapi_extra=upload_body("file"))
+async def upload_stream(request: Request, fields: Optional[str] = None):
+    '''
+        Same as /upload, but the response is a text/event-stream of server-sent events
+        
+        Events, in order:
+        - received: filename, size and content_hash once the upload is stored
+        - pdf_type: whether a PDF is text, scanned or mixed, its page count and the pages sent to OCR
+        - ocr_page: pages_done / pages_total as scanned pages are recognised
+        - text_ready: text_length and processing_method once the text is extracted
+        - gemini_chunk: pieces of the Gemini JSON answer as it is generated
+        - done: the full /upload response
+        - error: message, if processing fails
+        
+        Cached texts and AI results skip the stages they replace.
+    '''
+    spooled = await receive_upload(request)
+    return StreamingResponse(
+        stream_upload(spooled, parse_fields(fields)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # also runs when the client disconnects mid-stream
+        background=BackgroundTask(spooled.cleanup)
+    )
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_upload(spooled, fields=None):
     try:
-        os.unlink(file.filename)
-    except PermissionError:
-        print(f"Warning: Could not delete temporary file {file.filename} - it may be in use")
+        async for event, data in upload_events(spooled, fields, stream=True):
+            yield sse_event(event, data)
     except Exception as e:
-        print(f"Warning: Error deleting file {file.filename}: {e}")
-    
-    # Get AI extraction results
-    ai_result = extract_feature_text(resume_text)
+        yield sse_event("error", {"message": f"Processing failed: {e}"})
+
+async def process_upload(spooled, fields=None, profile=False):
+    response = None
+    async for event, data in upload_events(spooled, fields, profile=profile):
+        if event == "done":
+            response = data
+    return response
+
+def drain_events(queue):
+    events = []
+    while True:
+        try:
+            events.append(queue.get_nowait())
+        except Empty:
+            return events
+
+async def upload_events(spooled, fields=None, stream=False, profile=False):
+    '''
+        Process one upload, yielding (event, data) pairs as it goes and ("done", response) last
+        With stream=True, PDF type, OCR page progress and Gemini output are reported as they happen
+        With profile=True extraction runs in the thread pool instead of a worker process,
+        so the sampling profiler can see it, and the profile is added to the metadata
+    '''
+    yield "received", {"filename": spooled.filename, "size": spooled.size, "content_hash": spooled.content_hash}
+    profiler = SamplingProfiler(config.get("profile_interval_ms", 5) / 1000) if profile else None
+    doc_type = file_type(spooled.filename)
+    with tracing() as trace, (profiler.running() if profiler else nullcontext()):
+        # Wait for a processing slot; time spent here is reported as queue wait
+        t_queued = time.time()
+        async with worker_pools.slot():
+            queue_wait = time.time() - t_queued
+            trace.add("queue_wait", t_queued, queue_wait)
+            t0 = time.time()
+            
+            # Identical uploads share cached results, keyed by the file content and format
+            cache_key = document_cache_key(spooled.content_hash, spooled.filename)
+            cache_status = {"text": "miss", "ai": "miss"}
+            ocr_stats = None
+            extraction = None
+            
+            cached_text = await cache_get("text", cache_key)
+            if cached_text is not None:
+                cache_status["text"] = "hit"
+                resume_text = cached_text["text"]
+                processing_method = cached_text["processing_method"]
+            else:
+                with span("extract"):
+                    if profiler is not None:
+                        extracted = await worker_pools.run_io(profiler.watch(extract_document),
+                                                              spooled.source, spooled.filename)
+                    elif stream:
+                        # Worker processes put stage events on a manager queue while they run
+                        queue = await worker_pools.run_io(worker_pools.event_queue)
+                        task = asyncio.ensure_future(
+                            worker_pools.run_cpu(extract_document_events, spooled.source, spooled.filename, queue))
+                        while True:
+                            finished = task.done()
+                            for event in await worker_pools.run_io(drain_events, queue):
+                                yield event
+                            if finished:
+                                break
+                            await asyncio.wait({task}, timeout=STREAM_POLL_SECONDS)
+                        extracted = task.result()
+                    else:
+                        # Parsing and OCR are CPU-bound and run in the process pool
+                        extracted = await worker_pools.run_cpu(extract_document, spooled.source, spooled.filename)
+                # stage spans recorded inside the worker
+                trace.merge(extracted["spans"])
+                processing_method = extracted["processing_method"]
+                ocr_stats = extracted["ocr"]
+                extraction = extracted["extraction"]
+                resume_text = extracted["text"].replace("\t", " \t")
+                if doc_type == "pdf":
+                    PDF_ROUTING.inc(method=pdf_routing(ocr_stats))
+                
+                # Extraction failures come back as error text and must not be cached
+                if resume_text.startswith("Error "):
+                    ERRORS.inc(stage="extraction")
+                else:
+                    await cache_set("text", cache_key, {"text": resume_text, "processing_method": processing_method})
+            processing_time = time.time() - t0
+            yield "text_ready", {
+                "text_length": len(resume_text),
+                "processing_method": processing_method,
+                "cached": cached_text is not None
+            }
+            
+            # Get AI extraction results from Gemini and/or the local NER engine
+            # (see extraction_engine in the config); both block, so they run in the thread pool
+            llm_calls = None
+            ai_key = engine_cache_key(cache_key)
+            if rules_cover(fields):
+                # Only rule-based fields were asked for: no model call needed
+                with span("rules"):
+                    ai_result = rules_result(resume_text, fields)
+            elif (ai_result := await cache_get("ai", ai_key)) is not None:
+                cache_status["ai"] = "hit"
+            else:
+                with count_llm_calls() as llm_calls, span("ai_extraction") as labels:
+                    if stream:
+                        # Each chunk is pulled in the thread pool as Gemini sends it
+                        chunks = extract_feature_stream(resume_text)
+                        while True:
+                            kind, data = await worker_pools.run_io(next, chunks)
+                            if kind == "result":
+                                ai_result = data
+                                break
+                            yield "gemini_chunk", {"text": data}
+                    else:
+                        extract = profiler.watch(extract_feature) if profiler else extract_feature
+                        ai_result = await worker_pools.run_io(extract, resume_text)
+                    labels["engine"] = ai_result.get("engine", "")
+                GEMINI_TOKENS.inc(llm_calls.prompt_tokens, kind="prompt")
+                GEMINI_TOKENS.inc(llm_calls.output_tokens, kind="output")
+                # Only successful extractions are worth replaying
+                if "error" in ai_result:
+                    ERRORS.inc(stage="ai_extraction")
+                else:
+                    await cache_set("ai", ai_key, ai_result)
+    spans = trace.export()
+    observe_spans(spans, doc_type)
+    DOCUMENTS.inc(route="stream" if stream else "upload", file_type=doc_type, engine=ai_result.get("engine", ""))
     
     # Enhanced response with metadata
-    return {
+    metadata = {
+        "filename": spooled.filename,
+        "processing_method": processing_method,
+        "processing_time_seconds": round(processing_time, 2),
+        "text_length": len(resume_text),
+        "ocr_available": OCR_STATUS['engines_count'] > 0,
+        "file_type": "pdf" if document_format(spooled.filename) == "pdf" else "document",
+        "content_hash": spooled.content_hash,
+        "cache": cache_status,
+        "llm_calls": llm_calls.count if llm_calls else 0,
+        "llm_tokens": llm_calls.tokens() if llm_calls else None,
+        "extraction_engine": ai_result.get("engine"),
+        "queue_wait_seconds": round(queue_wait, 3),
+        "ocr": ocr_stats,
+        "extraction": extraction
+    }
+    if config.get("response_spans", True):
+        metadata["spans"] = spans
+    if profiler is not None:
+        metadata["profile"] = profiler.report()
+    yield "done", {
         "success": True,
-        "ai_extraction": ai_result,
+        "ai_extraction": select_fields(ai_result, fields),
+        "metadata": metadata
+    }
+
+
+# ============= Batch Upload =============
+
+def expand_batch_files(uploads):
+    '''
+        Turn uploaded files into (filename, contents) documents, unpacking zip archives
+    '''
+    max_files = config.get("batch_max_files", 500)
+    max_bytes = config.get("batch_max_uncompressed_mb", 500) * 1024 * 1024
+    documents = []
+    total_bytes = 0
+    for spooled in uploads:
+        filename = spooled.filename
+        if not filename.lower().endswith(".zip"):
+            documents.append((filename, spooled.read_bytes()))
+            total_bytes += spooled.size
+            continue
+        source = spooled.path or io.BytesIO(spooled.source)
+        with zipfile.ZipFile(source) as archive:
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                    continue
+                # Check the declared size before inflating anything
+                total_bytes += member.file_size
+                if total_bytes > max_bytes:
+                    raise ValueError(f"Batch exceeds {max_bytes // (1024 * 1024)} MB uncompressed")
+                documents.append((name, archive.read(member)))
+        if len(documents) > max_files:
+            raise ValueError(f"Batch exceeds {max_files} files")
+    if len(documents) > max_files:
+        raise ValueError(f"Batch exceeds {max_files} files")
+    if total_bytes > max_bytes:
+        raise ValueError(f"Batch exceeds {max_bytes // (1024 * 1024)} MB uncompressed")
+    return documents
+
+def extract_feature_group(texts):
+    with count_llm_calls() as llm_calls:
+        results = extract_features(texts)
+    return results, llm_calls
+
+async def extract_batch_item(index, filename, contents, fields=None):
+    t0 = time.time()
+    item = {
+        "index": index,
+        "filename": filename,
+        "content_hash": content_hash(contents),
+        "cache": {"text": "miss", "ai": "miss"}
+    }
+    cache_key = item["cache_key"] = document_cache_key(item["content_hash"], filename)
+    cached_text = await cache_get("text", cache_key)
+    if cached_text is not None:
+        item["cache"]["text"] = "hit"
+        item["text"] = cached_text["text"]
+        item["processing_method"] = cached_text["processing_method"]
+    else:
+        async with worker_pools.slot():
+            extracted = await worker_pools.run_cpu(extract_document, contents, filename)
+        item["processing_method"] = extracted["processing_method"]
+        item["ocr"] = extracted["ocr"]
+        item["extraction"] = extracted["extraction"]
+        item["text"] = extracted["text"].replace("\t", " \t")
+        if not item["text"].startswith("Error "):
+            await cache_set("text", cache_key, {"text": item["text"], "processing_method": item["processing_method"]})
+    item["processing_time_seconds"] = round(time.time() - t0, 2)
+    if rules_cover(fields):
+        item["ai_extraction"] = rules_result(item["text"], fields)
+        return item
+    ai_result = await cache_get("ai", engine_cache_key(cache_key))
+    if ai_result is not None:
+        item["cache"]["ai"] = "hit"
+        item["ai_extraction"] = ai_result
+    return item
+
+def batch_line(item, fields=None):
+    return json.dumps({
+        "index": item["index"],
+        "success": "error" not in item.get("ai_extraction", {}),
+        "ai_extraction": select_fields(item.get("ai_extraction"), fields),
         "metadata": {
-            "filename": file.filename,
-            "processing_method": processing_method,
-            "processing_time_seconds": round(processing_time, 2),
-            "text_length": len(resume_text),
-            "ocr_available": OCR_STATUS['engines_count'] > 0,
-            "file_type": "pdf" if ".pdf" in str(tmp_path) else "document"
+            "filename": item["filename"],
+            "processing_method": item.get("processing_method"),
+            "processing_time_seconds": item.get("processing_time_seconds"),
+            "text_length": len(item.get("text", "")),
+            "file_type": "pdf" if document_format(item["filename"]) == "pdf" else "document",
+            "content_hash": item["content_hash"],
+            "cache": item["cache"],
+            "ocr": item.get("ocr"),
+            "extraction": item.get("extraction")
         }
+    }, ensure_ascii=False) + "\n"
+
+async def stream_batch(documents, fields=None):
+    '''
+        Extract every document in parallel and yield one NDJSON line per file as it finishes
+        Documents waiting for AI extraction are grouped into shared Gemini calls
+    '''
+    group_size = config.get("batch_gemini_group_size", 5)
+    t0 = time.time()
+    extracting = set()
+    extracting_ai = {}  # Gemini group task -> the items it extracts
+    group = []
+    llm_calls = 0
+    llm_tokens = {"prompt": 0, "output": 0}
+    failed = 0
+    for index, (filename, contents) in enumerate(documents):
+        extracting.add(asyncio.ensure_future(extract_batch_item(index, filename, contents, fields)))
+    
+    while extracting or extracting_ai:
+        done, _ = await asyncio.wait(extracting | set(extracting_ai), return_when=asyncio.FIRST_COMPLETED)
+        finished = []
+        for task in done:
+            if task in extracting:
+                extracting.discard(task)
+                try:
+                    item = task.result()
+                except Exception as e:
+                    failed += 1
+                    yield json.dumps({"success": False, "error": f"Extraction failed: {e}"}) + "\n"
+                    continue
+                if "ai_extraction" in item:
+                    finished.append(item)
+                else:
+                    group.append(item)
+            else:
+                items = extracting_ai.pop(task)
+                try:
+                    _, results, calls = task.result()
+                except Exception as e:
+                    for item in items:
+                        failed += 1
+                        yield json.dumps({
+                            "index": item["index"],
+                            "success": False,
+                            "error": f"AI extraction failed: {e}",
+                            "metadata": {"filename": item["filename"]}
+                        }, ensure_ascii=False) + "\n"
+                    continue
+                llm_calls += calls.count
+                llm_tokens["prompt"] += calls.prompt_tokens
+                llm_tokens["output"] += calls.output_tokens
+                for item, ai_result in zip(items, results):
+                    item["ai_extraction"] = ai_result
+                    if "error" not in ai_result:
+                        await cache_set("ai", engine_cache_key(item["cache_key"]), ai_result)
+                    finished.append(item)
+        
+        # Flush a Gemini group when it is full or nothing else will join it
+        while group and (len(group) >= group_size or not extracting):
+            items, group = group[:group_size], group[group_size:]
+            
+            async def run_group(items=items):
+                results, calls = await worker_pools.run_io(extract_feature_group, [item["text"] for item in items])
+                return items, results, calls
+            
+            extracting_ai[asyncio.ensure_future(run_group())] = items
+        
+        for item in sorted(finished, key=lambda item: item["index"]):
+            if "error" in item["ai_extraction"]:
+                failed += 1
+            yield batch_line(item, fields)
+    
+    yield json.dumps({"summary": {
+        "files": len(documents),
+        "failed": failed,
+        "llm_calls": llm_calls,
+        "llm_tokens": llm_tokens,
+        "processing_time_seconds": round(time.time() - t0, 2)
+    }}) + "\n"
+
+@app.post("/upload/batch", openapi_extra=upload_body("files", multiple=True))
+async def upload_batch(request: Request, fields: Optional[str] = None):
+    '''
+        Upload many documents (or zip archives of documents) in one request
+        
+        Files are extracted in parallel across the worker processes and AI
+        extraction is grouped into shared Gemini calls. Results stream back as
+        NDJSON, one line per file in completion order, followed by a summary line.
+        The fields query parameter works as for /upload.
+    '''
+    max_bytes = config.get("batch_max_uncompressed_mb", 500) * 1024 * 1024
+    uploads = await receive_uploads(request, "files", max_bytes)
+    try:
+        documents = await worker_pools.run_io(expand_batch_files, uploads)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch: {e}")
+    finally:
+        for spooled in uploads:
+            spooled.cleanup()
+    return StreamingResponse(stream_batch(documents, parse_fields(fields)), media_type="application/x-ndjson")
+
+
+# ============= Background Jobs =============
+
+def save_job_file(job_id, spooled):
+    jobs_dir = config.get("job_files_dir", "./data/jobs")
+    os.makedirs(jobs_dir, exist_ok=True)
+    path = os.path.join(jobs_dir, job_id + os.path.splitext(spooled.filename)[1].lower())
+    spooled.save(path)
+    return path
+
+@app.post("/jobs", status_code=202, openapi_extra=upload_body("file"))
+async def create_job(request: Request):
+    '''
+        Queue a document for background processing and return its job id
+        
+        Use this for long documents (e.g. multi-page scanned PDFs) that would
+        exceed HTTP timeouts on /upload. Poll GET /jobs/{job_id} for progress
+        and the result, which has the same shape as the /upload response.
+    '''
+    spooled = await receive_upload(request)
+    job_id = uuid.uuid4().hex
+    try:
+        path = await worker_pools.run_io(save_job_file, job_id, spooled)
+    finally:
+        spooled.cleanup()
+    await worker_pools.run_io(job_store.create, spooled.filename, path, job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get status, per-page progress and (when done) the result of a job"""
+    job = await worker_pools.run_io(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "filename": job["filename"],
+        "progress": {
+            "stage": job["stage"],
+            "pages_done": job["pages_done"],
+            "pages_total": job["pages_total"]
+        },
+        "attempts": job["attempts"],
+        "result": job["result"],
+        "error": job["error"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"]
     }
 
 
+def preload_models():
+	'''
+		Load read-only state in the preforking master so every worker shares it
+		copy-on-write instead of loading its own copy on first use
+		torch-backed models (EasyOCR, the local NER engine) are not preloaded: torch
+		starts OpenMP thread pools that do not survive fork and can hang the workers,
+		so each worker still loads those itself (see ocr_warmup/ner_warmup)
+	'''
+	get_rule_extractor()
+	if ocr_processor is not None:
+		ocr_processor.warm_up(background=False, engines=("tesseract",))
+
+
 if __name__ == "__main__":
 	print("* Starting web service...")
-	uvicorn.run(app, host="127.0.0.1", port=9003)
\ No newline at end of file
+	server = PreforkServer.from_config(app, config)
+	if server.preforking:
+		SharedMetrics.clear(METRICS_DIR)
+	if server.preforking and not config.get("extraction_workers"):
+		# HTTP workers share the cores instead of each starting one extraction process per core
+		worker_pools.extraction_workers = max(1, (os.cpu_count() or 1) // server.workers)
+	server.run(preload=preload_models if config.get("PRELOAD_MODELS", True) else None)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import glob
+import os
+import re
+
+import pytest
+
+from utils.clear_text import no_accent_vietnamese, remove_special_character
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files")
+
+
+# the regex / character-by-character implementation str.translate replaced
+def baseline_no_accent_vietnamese(s):
+    s = re.sub(r'[àáạảãâầấậẩẫăằắặẳẵ]', 'a', s)
+    s = re.sub(r'[ÀÁẠẢÃĂẰẮẶẲẴÂẦẤẬẨẪ]', 'A', s)
+    s = re.sub(r'[èéẹẻẽêềếệểễ]', 'e', s)
+    s = re.sub(r'[ÈÉẸẺẼÊỀẾỆỂỄ]', 'E', s)
+    s = re.sub(r'[òóọỏõôồốộổỗơờớợởỡ]', 'o', s)
+    s = re.sub(r'[ÒÓỌỎÕÔỒỐỘỔỖƠỜỚỢỞỠ]', 'O', s)
+    s = re.sub(r'[ìíịỉĩ]', 'i', s)
+    s = re.sub(r'[ÌÍỊỈĨ]', 'I', s)
+    s = re.sub(r'[ùúụủũưừứựửữ]', 'u', s)
+    s = re.sub(r'[ƯỪỨỰỬỮÙÚỤỦŨ]', 'U', s)
+    s = re.sub(r'[ỳýỵỷỹ]', 'y', s)
+    s = re.sub(r'[ỲÝỴỶỸ]', 'Y', s)
+    s = re.sub(r'[Đ]', 'D', s)
+    s = re.sub(r'[đ]', 'd', s)
+    return s
+
+
+def baseline_remove_special_character(lines):
+    new_lines = ""
+    for line in lines.split("\n"):
+        clear_line = ""
+        for i, c in enumerate(baseline_no_accent_vietnamese(line)):
+            if len(c.encode("utf-8")) > 1:
+                clear_line += " "
+            elif '\x0c'.encode() is line[i].encode():
+                pass
+            else:
+                clear_line += line[i]
+        if len(clear_line) > 0:
+            new_lines += clear_line + "\n"
+    return new_lines
+
+
+def document_text(path):
+    if path.lower().endswith(".pdf"):
+        pdfplumber = pytest.importorskip("pdfplumber")
+        with pdfplumber.open(path) as pdf:
+            return "\n".join(page.extract_text() or "" for page in pdf.pages)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(TEST_FILES, "*"))), ids=os.path.basename)
+def test_matches_baseline_on_test_files(path):
+    text = document_text(path)
+    assert text.strip()
+    assert no_accent_vietnamese(text) == baseline_no_accent_vietnamese(text)
+    assert remove_special_character(text) == baseline_remove_special_character(text)
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "HỌ VÀ TÊN: Trần Thị Ánh\nEmail: anh@example.com\n\nKINH NGHIỆM\x0c\n– 2019–2021 · Công ty ABC ✓",
+    "日本語 テキスト\n\tTab\r\nCRLF line\xa0nbsp",
+    "combining: é ồ và emoji 😀\n",
+    "".join(chr(code) for code in range(0x20, 0x2000)),
+])
+def test_matches_baseline_on_edge_cases(text):
+    assert remove_special_character(text) == baseline_remove_special_character(text)
+
+
+def test_no_accent_vietnamese():
+    assert no_accent_vietnamese("Nguyễn Đức Thắng, Hồ Chí Minh") == "Nguyen Duc Thang, Ho Chi Minh"
+    assert no_accent_vietnamese("ƯỚC MƠ ỳ Ý") == "UOC MO y Y"
+
+
+def test_vietnamese_letters_are_kept():
+    assert remove_special_character("Kỹ năng: Lập trình") == "Kỹ năng: Lập trình\n"
+
+
+def test_other_multibyte_characters_become_spaces():
+    assert remove_special_character("• Python ★ → “Go”") == "  Python      Go \n"
+
+
+def test_form_feeds_and_empty_lines_are_dropped():
+    assert remove_special_character("page one\x0c\n\n\x0cpage two\n") == "page one\npage two\n"
+
+
+def test_line_of_only_form_feeds_is_dropped():
+    assert remove_special_character("a\n\x0c\x0c\nb") == "a\nb\n"
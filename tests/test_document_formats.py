@@ -0,0 +1,91 @@
+import io
+import zipfile
+
+import pytest
+
+from utils.document_formats import decode_text, docx_text, document_format, extract_native, rtf_text
+
+VIETNAMESE = "Kỹ năng: Lập trình viên Python, tiếng Việt"
+
+
+@pytest.mark.parametrize("filename, fmt", [
+    ("cv.PDF", "pdf"), ("dir.v2/cv.docx", "docx"), ("archive.tar.gz", "gz"), ("README", ""), ("dir.v2/cv", ""),
+])
+def test_document_format(filename, fmt):
+    assert document_format(filename) == fmt
+
+
+@pytest.mark.parametrize("encoding", ["utf-8-sig", "utf-16", "utf-32"])
+def test_decode_text_with_bom(encoding):
+    assert decode_text(VIETNAMESE.encode(encoding)) == VIETNAMESE
+
+
+def test_decode_text_utf8():
+    assert decode_text(VIETNAMESE.encode("utf-8")) == VIETNAMESE
+
+
+@pytest.mark.parametrize("encoding", ["utf-16-le", "utf-16-be"])
+def test_decode_text_utf16_without_bom(encoding):
+    assert decode_text(VIETNAMESE.encode(encoding)) == VIETNAMESE
+
+
+def test_decode_text_legacy_code_page():
+    # not UTF-8: falls back to detection or Windows-1258
+    text = "Văn Đăng Lương, Thư Hà, Trương Ngô, Phan Tâm. " * 4
+    data = text.encode("cp1258")
+    with pytest.raises(UnicodeDecodeError):
+        data.decode("utf-8")
+    assert decode_text(data) == text
+
+
+def test_rtf_body_text_and_paragraphs():
+    rtf = rb"{\rtf1\ansi{\fonttbl{\f0 Arial;}}{\colortbl;\red0\green0\blue0;}\f0 Hello\par World\tab end}"
+    assert rtf_text(rtf) == "Hello\nWorld\tend"
+
+
+def test_rtf_code_page_and_unicode_escapes():
+    rtf = rb"{\rtf1\ansi\ansicpg1252 caf\'e9 \u7871?p \uc2\u273??x}"
+    assert rtf_text(rtf) == "café ếp đx"
+
+
+def test_rtf_skips_ignorable_and_metadata_destinations():
+    rtf = (rb"{\rtf1{\info{\title Secret}{\author Someone}}{\*\generator Word;}"
+           rb"{\*\unknowndest hidden}Visible \{braces\} and \\ backslash}")
+    assert rtf_text(rtf) == "Visible {braces} and \\ backslash"
+
+
+def test_rtf_special_characters():
+    assert rtf_text(rb"{\rtf1 a\emdash b\~c\bullet}") == "a—b\xa0c•"
+
+
+def make_docx(body):
+    document = ('<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+                'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006">'
+                f"<w:body>{body}</w:body></w:document>")
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+def test_docx_paragraphs_tabs_and_fallbacks():
+    data = make_docx(
+        "<w:p><w:r><w:t>Name</w:t><w:tab/><w:t>An</w:t></w:r></w:p>"
+        "<w:p><w:r><w:t>Line</w:t><w:br/><w:t>break</w:t></w:r></w:p>"
+        "<mc:AlternateContent><mc:Choice><w:p><w:r><w:t>Box</w:t></w:r></w:p></mc:Choice>"
+        "<mc:Fallback><w:p><w:r><w:t>Box</w:t></w:r></w:p></mc:Fallback></mc:AlternateContent>"
+    )
+    assert docx_text(data) == "Name\tAn\nLine\nbreak\nBox\n"
+
+
+def test_extract_native_routes_by_format():
+    assert extract_native(VIETNAMESE.encode("utf-8"), "txt") == (VIETNAMESE, "native")
+    assert extract_native(rb"{\rtf1 Hi}", "rtf") == ("Hi", "native")
+    assert extract_native(make_docx("<w:p><w:r><w:t>Hi</w:t></w:r></w:p>"), "docx") == ("Hi\n", "native")
+
+
+def test_damaged_docx_falls_back_to_tika(monkeypatch, caplog):
+    import utils.document_formats as document_formats
+    monkeypatch.setattr(document_formats, "tika_text", lambda source: "from tika")
+    assert extract_native(b"not a zip file", "docx") == ("from tika", "tika")
+    assert "falling back to Tika" in caplog.text
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from utils.gemini_scheduler import GeminiScheduler
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStream:
+    """Streamed response yielding chunks with a delay before each"""
+
+    def __init__(self, texts, delay=0.0, release=None):
+        self.texts = texts
+        self.delay = delay
+        self.release = release
+        self.usage_metadata = None
+
+    def __iter__(self):
+        for text in self.texts:
+            if self.release is not None:
+                self.release.wait()
+            time.sleep(self.delay)
+            yield Chunk(text)
+        self.usage_metadata = "usage"
+
+
+class FakeModel:
+    def __init__(self, stream_factory):
+        self.stream_factory = stream_factory
+        self.calls = 0
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        self.calls += 1
+        return self.stream_factory()
+
+
+def scheduler(model, **kwargs):
+    return GeminiScheduler(model, requests_per_minute=0, **kwargs)
+
+
+def test_stream_holds_slot_until_last_chunk():
+    release = threading.Event()
+    gemini = scheduler(FakeModel(lambda: FakeStream(["a", "b"], release=release)), max_concurrency=1)
+    stream = gemini.generate("prompt", stream=True)
+    assert gemini.metrics()["active"] == 1
+    # a second call waits for the slot
+    assert not gemini._slots.acquire(blocking=False)
+    release.set()
+    assert [chunk.text for chunk in stream] == ["a", "b"]
+    assert stream.usage_metadata == "usage"
+    metrics = gemini.metrics()
+    assert metrics["active"] == 0
+    assert metrics["succeeded"] == 1
+    assert gemini._slots.acquire(blocking=False)
+
+
+def test_stream_chunk_timeout_releases_slot():
+    release = threading.Event()
+    gemini = scheduler(FakeModel(lambda: FakeStream(["a"], release=release)), timeout_seconds=0.1)
+    stream = gemini.generate("prompt", stream=True)
+    with pytest.raises(TimeoutError):
+        list(stream)
+    metrics = gemini.metrics()
+    assert metrics["active"] == 0
+    assert metrics["timeouts"] == 1
+    assert metrics["failed"] == 1
+    release.set()
+
+
+def test_identical_streams_share_one_call():
+    model = FakeModel(lambda: FakeStream(["a", "b", "c"], delay=0.05))
+    gemini = scheduler(model)
+    first = gemini.generate("prompt", stream=True)
+    second = gemini.generate("prompt", stream=True)
+    assert [chunk.text for chunk in first] == ["a", "b", "c"]
+    assert [chunk.text for chunk in second] == ["a", "b", "c"]
+    assert model.calls == 1
+    assert gemini.metrics()["deduplicated"] == 1
+    # finished streams are not shared any more
+    assert [chunk.text for chunk in gemini.generate("prompt", stream=True)] == ["a", "b", "c"]
+    assert model.calls == 2
+
+
+def test_stream_error_reaches_every_reader():
+    class Broken(FakeStream):
+        def __iter__(self):
+            yield Chunk("a")
+            raise ConnectionError("reset")
+
+    gemini = scheduler(FakeModel(lambda: Broken([])))
+    stream = gemini.generate("prompt", stream=True)
+    with pytest.raises(ConnectionError):
+        list(stream)
+    with pytest.raises(ConnectionError):
+        list(stream)
+    assert gemini.metrics()["active"] == 0
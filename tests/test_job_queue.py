@@ -0,0 +1,136 @@
+import os
+import threading
+
+import pytest
+
+from utils import job_queue
+from utils.job_queue import DONE, FAILED, QUEUED, RUNNING, JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+
+def job_file(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"resume")
+    return str(path)
+
+
+def test_claim_takes_oldest_queued_job(store):
+    first = store.create("a.pdf", "/tmp/a.pdf")
+    store.create("b.pdf", "/tmp/b.pdf")
+    job = store.claim(worker=7)
+    assert job["id"] == first
+    assert job["status"] == RUNNING
+    assert job["attempts"] == 1
+    assert job["worker"] == 7
+
+
+def test_claim_defaults_to_current_pid(store):
+    store.create("a.pdf", "/tmp/a.pdf")
+    assert store.claim()["worker"] == os.getpid()
+
+
+def test_claim_returns_none_when_queue_is_empty(store):
+    assert store.claim() is None
+    store.create("a.pdf", "/tmp/a.pdf")
+    store.claim()
+    assert store.claim() is None
+
+
+def test_concurrent_claims_never_share_a_job(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    setup = JobStore(path)
+    for i in range(40):
+        setup.create(f"{i}.pdf", f"/tmp/{i}.pdf")
+    claimed = []
+
+    def drain():
+        store = JobStore(path)
+        while (job := store.claim()) is not None:
+            claimed.append(job["id"])
+        store.close()
+
+    threads = [threading.Thread(target=drain) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(claimed) == 40
+    assert len(set(claimed)) == 40
+    assert setup.counts() == {RUNNING: 40}
+    setup.close()
+
+
+def test_retried_job_is_claimed_again(store):
+    job_id = store.create("a.pdf", "/tmp/a.pdf")
+    store.claim()
+    store.fail(job_id, "boom", retry=True)
+    job = store.claim()
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+
+
+def test_release_worker_requeues_or_fails_its_jobs(store):
+    retried = store.create("a.pdf", "/tmp/a.pdf")
+    exhausted = store.create("b.pdf", "/tmp/b.pdf")
+    other = store.create("c.pdf", "/tmp/c.pdf")
+    store.claim(worker=1)
+    store.claim(worker=1)
+    store.claim(worker=2)
+    store.fail(exhausted, "boom", retry=True)
+    store.claim(worker=1)
+
+    failed = store.release_worker(1, max_attempts=2)
+    assert [job["id"] for job in failed] == [exhausted]
+    assert store.get(retried)["status"] == QUEUED
+    assert store.get(exhausted)["status"] == FAILED
+    assert store.get(other)["status"] == RUNNING
+
+
+class StopAfter:
+    """Stop event that ends run_worker after a number of loop iterations"""
+
+    def __init__(self, iterations):
+        self.iterations = iterations
+
+    def is_set(self):
+        self.iterations -= 1
+        return self.iterations < 0
+
+    def wait(self, timeout):
+        return self.is_set()
+
+
+def run_jobs(tmp_path, monkeypatch, process_job, iterations=1, max_attempts=3):
+    monkeypatch.setattr(job_queue, "process_job", process_job)
+    config = {"job_db_path": str(tmp_path / "jobs.sqlite3"), "cache_backends": [],
+              "job_max_attempts": max_attempts}
+    job_queue.run_worker(config, 0, StopAfter(iterations))
+
+
+def test_completed_job_file_is_removed(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create("a.pdf", job_file(tmp_path, "a.pdf"))
+    run_jobs(tmp_path, monkeypatch, lambda job, store, cache: {"success": True})
+    assert store.get(job_id)["status"] == DONE
+    assert not os.path.exists(tmp_path / "a.pdf")
+
+
+def test_failed_job_file_is_kept_for_retry_and_removed_after_last_attempt(tmp_path, monkeypatch):
+    def fail(job, store, cache):
+        raise RuntimeError("boom")
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create("a.pdf", job_file(tmp_path, "a.pdf"))
+    run_jobs(tmp_path, monkeypatch, fail, max_attempts=2)
+    assert store.get(job_id)["status"] == QUEUED
+    assert os.path.exists(tmp_path / "a.pdf")
+
+    run_jobs(tmp_path, monkeypatch, fail, max_attempts=2)
+    assert store.get(job_id)["status"] == FAILED
+    assert not os.path.exists(tmp_path / "a.pdf")
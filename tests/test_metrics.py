@@ -0,0 +1,54 @@
+from utils.metrics import Counter, Histogram, Registry, SharedMetrics
+
+
+def worker_registry(directory, slot):
+    registry = Registry()
+    counter = registry.register(Counter("docs_total", "Documents", ("route",)))
+    histogram = registry.register(Histogram("stage_seconds", "Stage time", (), buckets=(1.0,)))
+    active = {"value": 0}
+    registry.add_collector(lambda: [("active", "gauge", "In flight", (), {(): active["value"]})])
+    registry._shared = SharedMetrics(str(directory), slot)
+    return registry, counter, histogram, active
+
+
+def test_render_sums_all_workers(tmp_path):
+    first, first_docs, first_stages, first_active = worker_registry(tmp_path, 0)
+    second, second_docs, second_stages, _ = worker_registry(tmp_path, 1)
+    first_docs.inc(route="upload")
+    first_stages.observe(0.5)
+    first_active["value"] = 2
+    first.render()
+    second_docs.inc(2, route="upload")
+    second_docs.inc(route="batch")
+    second_stages.observe(3.0)
+
+    text = second.render()
+    assert 'docs_total{route="upload"} 3' in text
+    assert 'docs_total{route="batch"} 1' in text
+    assert 'stage_seconds_bucket{le="1"} 1' in text
+    assert 'stage_seconds_bucket{le="+Inf"} 2' in text
+    assert "stage_seconds_count 2" in text
+    assert "active 2" in text
+
+
+def test_replacement_worker_continues_counters(tmp_path):
+    old, docs, _, active = worker_registry(tmp_path, 0)
+    docs.inc(5, route="upload")
+    active["value"] = 3
+    old.render()
+
+    new, docs, _, _ = worker_registry(tmp_path, 0)
+    docs.inc(route="upload")
+    text = new.render()
+    assert 'docs_total{route="upload"} 6' in text
+    # gauges describe the live process only
+    assert "active 0" in text
+
+
+def test_clear_drops_previous_run(tmp_path):
+    registry, docs, _, _ = worker_registry(tmp_path, 0)
+    docs.inc(route="upload")
+    registry.render()
+    SharedMetrics.clear(str(tmp_path))
+    registry, _, _, _ = worker_registry(tmp_path, 0)
+    assert 'docs_total{route="upload"}' not in registry.render()
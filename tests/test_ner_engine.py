@@ -0,0 +1,82 @@
+import numpy as np
+
+from utils.ner_engine import decode_windows, engine_cache_key, entities_to_extraction
+
+TAGS = ["O", "name", "phone", "education"]
+O, NAME, PHONE, EDUCATION = range(4)
+
+
+def words(text):
+    """(start, end) of every space-separated word"""
+    spans, start = [], 0
+    for word in text.split(" "):
+        spans.append((start, start + len(word)))
+        start += len(word) + 1
+    return spans
+
+
+def window(spans, labels, length):
+    """One tokenizer window: [CLS] tokens [SEP] then padding"""
+    offsets = np.zeros((length, 2), dtype=np.int64)
+    window_labels = np.zeros(length, dtype=np.int64)
+    mask = np.zeros(length, dtype=np.int64)
+    count = len(spans) + 2
+    offsets[1:count - 1] = spans
+    window_labels[1:count - 1] = labels
+    mask[:count] = 1
+    return offsets, window_labels, mask
+
+
+def decode(texts, windows, sample_mapping, length=12):
+    offsets, labels, masks = zip(*(window(spans, labels, length) for spans, labels in windows))
+    return decode_windows(texts, np.stack(labels), np.stack(offsets), np.stack(masks), sample_mapping,
+                          TAGS, {"O"})
+
+
+def test_single_window_entities():
+    text = "Nguyen Van An phone 0986056438"
+    spans = words(text)
+    result = decode([text], [(spans, [NAME, NAME, NAME, O, PHONE])], [0])
+    assert result == [{"name": ["Nguyen Van An"], "phone": ["0986056438"]}]
+
+
+def test_word_pieces_extend_the_entity():
+    text = "Lagerlof studied"
+    # "Lager" + "##lof" as two tokens of one word
+    result = decode([text], [([(0, 5), (5, 8), (9, 16)], [NAME, NAME, O])], [0])
+    assert result == [{"name": ["Lagerlof"]}]
+
+
+def test_separate_entities_of_same_tag():
+    text = "An and Binh"
+    result = decode([text], [(words(text), [NAME, O, NAME])], [0])
+    assert result == [{"name": ["An", "Binh"]}]
+
+
+def test_overlap_takes_label_with_most_context():
+    text = "a b c d e f"
+    spans = words(text)
+    # window 0 sees a..d, window 1 sees c..f; "d" is at the edge of window 0
+    # and in the middle of window 1, "c" the other way round
+    first = (spans[:4], [O, O, NAME, PHONE])
+    second = (spans[2:], [PHONE, NAME, O, O])
+    assert decode([text], [first, second], [0, 0]) == [{"name": ["c d"]}]
+
+
+def test_windows_are_mapped_back_to_their_text():
+    texts = ["An", "Dai hoc Bach Khoa"]
+    result = decode(texts, [(words(texts[0]), [NAME]), (words(texts[1]), [EDUCATION] * 4)], [0, 1])
+    assert result == [{"name": ["An"]}, {"education": ["Dai hoc Bach Khoa"]}]
+
+
+def test_entities_to_extraction():
+    extraction = entities_to_extraction({"name": [" An ", "Binh"], "education": ["BK", "BK ", "FTU"]})
+    assert extraction["fullname"] == "An"
+    assert extraction["education"] == ["BK", "FTU"]
+    assert extraction["phone"] == ""
+    assert extraction["skill"] == []
+
+
+def test_engine_cache_key():
+    assert engine_cache_key("pdf:abc", "gemini") == "pdf:abc"
+    assert engine_cache_key("pdf:abc", "local") == "pdf:abc:local"
@@ -0,0 +1,62 @@
+import glob
+import os
+
+import pytest
+
+pdfium = pytest.importorskip("pypdfium2")
+ocr_processor_module = pytest.importorskip("utils.ocr_processor")
+ocr_processor = ocr_processor_module.ocr_processor
+
+TEST_PDF = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                         "test_files", "*.pdf")))[0]
+
+
+@pytest.fixture
+def four_pages(tmp_path):
+    # four copies of a text CV page
+    source = pdfium.PdfDocument(TEST_PDF)
+    document = pdfium.PdfDocument.new()
+    document.import_pages(source, [0, 0, 0, 0])
+    path = str(tmp_path / "four.pdf")
+    document.save(path)
+    return path
+
+
+def route(monkeypatch, scanned):
+    from PIL import Image
+    from utils.pdf_document import PDFAnalysis
+    monkeypatch.setattr(ocr_processor, "page_needs_ocr", lambda pdf, index: index in scanned)
+    # rendering needs poppler; the OCR engines are faked anyway
+    monkeypatch.setattr(PDFAnalysis, "render_page", lambda self, index, **kwargs: Image.new("RGB", (8, 8)))
+
+
+def test_is_pdf_image_based_samples_the_first_pages(monkeypatch, four_pages):
+    route(monkeypatch, {0, 1})
+    assert ocr_processor.is_pdf_image_based(four_pages)
+    assert not ocr_processor.is_pdf_image_based(four_pages, sample_pages=4)
+    route(monkeypatch, {1, 2, 3})
+    assert not ocr_processor.is_pdf_image_based(four_pages)
+
+
+def test_mixed_text_pages_use_layout_extraction(monkeypatch, four_pages):
+    from utils.extract_text import page_layout_texts
+    route(monkeypatch, {1})
+    monkeypatch.setattr(ocr_processor, "ocr_image", lambda image: ("scanned page", {"engines": {}}))
+    text, used_ocr = ocr_processor_module.extract_text_with_ocr(four_pages)
+    assert used_ocr
+    pages = text.split("--- Page ")
+    assert pages[2] == "2 ---\nscanned page\n\n"
+    assert pages[1] == f"1 ---\n{page_layout_texts(four_pages, [0])[0]}\n\n"
+
+
+def test_failed_mixed_ocr_still_reports_routing(monkeypatch, four_pages):
+    route(monkeypatch, {1})
+
+    def crash(image):
+        raise RuntimeError("engine crashed")
+
+    monkeypatch.setattr(ocr_processor, "ocr_image", crash)
+    stats = {}
+    text, used_ocr = ocr_processor_module.extract_text_with_ocr(four_pages, stats=stats)
+    assert used_ocr and "--- Page 4 ---" in text
+    assert stats == {"pages_total": 4, "pages_ocr": [], "error": "engine crashed"}
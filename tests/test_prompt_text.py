@@ -0,0 +1,74 @@
+from utils.prompt_text import compact_text, estimate_tokens, fit_to_budget, prepare_prompt_text
+
+
+def words(count, word="experience"):
+    return " ".join(f"{word}{i}" for i in range(count))
+
+
+def test_short_text_is_unchanged():
+    assert fit_to_budget("Nguyen Van An\nSKILLS\nPython", 100) == ("Nguyen Van An\nSKILLS\nPython", False)
+
+
+def test_single_long_line_is_cut_within_budget():
+    # EasyOCR output: one long space-joined line per page
+    text = words(10000)
+    result, truncated = fit_to_budget(text, 500)
+    assert truncated
+    assert result
+    assert estimate_tokens(result) <= 500
+    assert text.startswith(result)
+    # cut at a word boundary
+    assert text[len(result)] == " "
+
+
+def test_few_long_lines_are_cut_within_budget():
+    text = "\n".join(words(3000, f"page{page}_") for page in range(4))
+    result, truncated = fit_to_budget(text, 300)
+    assert truncated
+    assert result
+    assert estimate_tokens(result) <= 300
+
+
+def test_low_priority_sections_are_dropped_first():
+    text = "\n".join([
+        "Nguyen Van An", "0912345678",
+        "SKILLS", words(50, "skill"),
+        "HOBBIES", words(400, "hobby"),
+    ])
+    result, truncated = fit_to_budget(text, estimate_tokens(text) - 100)
+    assert truncated
+    assert "HOBBIES" not in result
+    assert "SKILLS" in result and "Nguyen Van An" in result
+
+
+def test_header_is_kept_when_sections_are_trimmed():
+    text = "\n".join(["Nguyen Van An", "SKILLS", words(5000, "skill"),
+                      "EXPERIENCE", words(5000)])
+    result, _ = fit_to_budget(text, 200)
+    assert result.startswith("Nguyen Van An")
+    assert estimate_tokens(result) <= 200
+
+
+def test_prepare_prompt_text_never_empties_a_large_document():
+    text = "\n".join(f"--- Page {page} ---\n{words(2000, f'p{page}w')}" for page in range(1, 6))
+    result, stats = prepare_prompt_text(text, max_tokens=1000)
+    assert result
+    assert 0 < stats["text_tokens"] <= 1000
+    assert stats["truncated"]
+
+
+def test_budget_applies_without_compaction(monkeypatch):
+    import utils.prompt_text as prompt_text
+    monkeypatch.setattr(prompt_text, "get_config", lambda: {"prompt_compaction": False})
+    text = "--- Page 1 ---\n" + words(5000)
+    result, stats = prepare_prompt_text(text, max_tokens=500)
+    # not compacted, but still cut to the budget
+    assert result.startswith("--- Page 1 ---")
+    assert 0 < stats["text_tokens"] <= 500
+    assert stats["truncated"]
+
+
+def test_compact_text_drops_markers_and_repeated_lines():
+    text = "--- Page 1 ---\nNguyen Van An\nPage 1 of 2\nA long repeated footer line\n" \
+           "--- Page 2 ---\nA long repeated footer line\nSKILLS"
+    assert compact_text(text) == "Nguyen Van An\nA long repeated footer line\nSKILLS"
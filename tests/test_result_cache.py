@@ -0,0 +1,84 @@
+import sqlite3
+import time
+
+from utils.result_cache import MemoryCache, ResultCache, SQLiteCache, build_cache, document_cache_key
+
+
+def accessed(path, key):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT accessed FROM cache WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("text", "a", 1)
+    cache.set("text", "b", 2)
+    assert cache.get("text", "a") == 1
+    cache.set("text", "c", 3)
+    assert cache.get("text", "b") is None
+    assert cache.get("text", "a") == 1
+    assert cache.get("text", "c") == 3
+
+
+def test_memory_cache_expires_entries():
+    cache = MemoryCache(ttl_seconds=60)
+    cache.set("text", "a", 1)
+    cache._entries[("text", "a")] = (time.time() - 120, 1)
+    assert cache.get("text", "a") is None
+
+
+def test_layers_are_separate():
+    cache = MemoryCache()
+    cache.set("text", "a", {"text": "x"})
+    assert cache.get("ai", "a") is None
+
+
+def test_sqlite_cache_round_trip(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCache(path).set("ai", "a", {"name": "Nguyễn Văn An", "skills": ["Python"]})
+    assert SQLiteCache(path).get("ai", "a") == {"name": "Nguyễn Văn An", "skills": ["Python"]}
+
+
+def test_sqlite_cache_evicts_past_max_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    for key in "abc":
+        cache.set("text", key, key)
+    assert cache.get("text", "a") is None
+    assert cache.get("text", "c") == "c"
+
+
+def test_sqlite_cache_touch_is_throttled(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path, touch_seconds=300)
+    cache.set("text", "a", "x")
+    stored = accessed(path, "a")
+    assert cache.get("text", "a") == "x"
+    assert accessed(path, "a") == stored
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (stored - 600, "a"))
+    assert cache.get("text", "a") == "x"
+    assert accessed(path, "a") > stored - 600
+
+
+def test_sqlite_hit_is_promoted_to_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCache(path).set("text", "a", "x")
+    memory = MemoryCache()
+    cache = ResultCache([memory, SQLiteCache(path)])
+    assert cache.get("text", "a") == "x"
+    assert memory.get("text", "a") == "x"
+
+
+def test_build_cache_from_config(tmp_path):
+    cache = build_cache({"cache_backends": ["memory", "sqlite"],
+                         "cache_path": str(tmp_path / "cache.sqlite3"), "cache_touch_seconds": 60})
+    assert [type(backend) for backend in cache.backends] == [MemoryCache, SQLiteCache]
+    assert cache.backends[1].touch_seconds == 60
+
+
+def test_document_key_depends_on_format():
+    digest = "0" * 64
+    assert document_cache_key(digest, "cv.txt") != document_cache_key(digest, "cv.rtf")
+    assert document_cache_key(digest, "cv.PDF") == document_cache_key(digest, "other.pdf")
+    assert document_cache_key(digest, "cv") != document_cache_key(digest, "cv.docx")
@@ -0,0 +1,90 @@
+import pytest
+
+from utils.rule_extractor import (RuleExtractor, _trie_pattern, merge_rules, parse_fields, rules_cover,
+                                  select_fields)
+
+SKILLS = ["Java", "JavaScript", "Spring", "Spring Boot", "C", "C++", "C#", "R", "Go", "AWS", "Node.js"]
+
+
+@pytest.fixture
+def rules():
+    return RuleExtractor(SKILLS)
+
+
+@pytest.mark.parametrize("text, phone", [
+    ("SĐT: 0986 056 438", "0986 056 438"),
+    ("Phone: 0986.056.438", "0986.056.438"),
+    ("Mobile +84 986 056 438", "+84 986 056 438"),
+    ("Call (415) 555-1234", "(415) 555-1234"),
+    ("Phone +1 415 555 1234", "+1 415 555 1234"),
+    ("Zalo 84986056438", "84986056438"),
+])
+def test_phone_formats(rules, text, phone):
+    assert rules.extract(text)["phone"] == phone
+
+
+def test_dates_and_short_numbers_are_not_phones(rules):
+    result = rules.extract("Born 12/05/1998, worked 2019 - 2021, id 12345")
+    assert result["phones"] == []
+    assert "12/05/1998" in result["dates"]
+
+
+def test_vietnam_country_code_needs_nine_digits(rules):
+    assert rules.extract("Mobile +84 98605643, +84 9860564381")["phones"] == []
+
+
+def test_same_phone_in_two_formats_is_listed_once(rules):
+    assert rules.extract("0986056438 / +84 986 056 438")["phones"] == ["0986056438"]
+
+
+def test_emails_and_urls(rules):
+    result = rules.extract("Mail an.nguyen@example.com.vn, see github.com/annguyen and https://an.dev/cv.")
+    assert result["email"] == "an.nguyen@example.com.vn"
+    assert result["urls"] == ["github.com/annguyen", "https://an.dev/cv"]
+
+
+def test_vietnamese_and_english_dates(rules):
+    result = rules.extract("Tháng 9/2019 - 03/2021, Jan 2022, 2023-06")
+    assert result["dates"] == ["Tháng 9/2019", "03/2021", "Jan 2022", "2023-06"]
+
+
+def test_skills_in_text_order_with_dictionary_casing(rules):
+    assert rules.find_skills("Used spring boot, javascript and AWS; some Go") == \
+        ["Spring Boot", "JavaScript", "AWS", "Go"]
+
+
+def test_short_skills_need_exact_case_and_boundaries(rules):
+    assert rules.find_skills("go to the r&d team, c level") == []
+    assert rules.find_skills("C++, C# and C") == ["C++", "C#", "C"]
+    assert rules.find_skills("Node.js developer") == ["Node.js"]
+
+
+def test_trie_pattern_prefers_longest_word():
+    import re
+    pattern = re.compile(_trie_pattern(["java", "javascript", "jav"]))
+    assert pattern.fullmatch("javascript")
+    assert pattern.match("javascripts").group(0) == "javascript"
+    assert pattern.match("javax").group(0) == "java"
+
+
+def test_fields_helpers():
+    assert parse_fields(" Phone, EMAIL ,") == ["phone", "email"]
+    assert parse_fields("") is None
+    assert rules_cover(["phone", "skill"])
+    assert not rules_cover(["phone", "education"])
+    assert not rules_cover(None)
+
+
+def test_merge_rules_fills_and_unions(rules):
+    result = {"status": "success", "extraction": {"phone": "", "skill": ["java", "Docker"]}}
+    merged = merge_rules(result, rules.extract("0986056438 Java, AWS"))
+    extraction = merged["extraction"]
+    assert extraction["phone"] == "0986056438"
+    assert extraction["skill"] == ["java", "Docker", "AWS"]
+    assert extraction["phones"] == ["0986056438"]
+
+
+def test_select_fields_keeps_requested_fields():
+    result = {"status": "success", "extraction": {"phone": "1", "email": "a@b.co"}}
+    assert select_fields(result, ["email"])["extraction"] == {"email": "a@b.co"}
+    assert select_fields({"error": "x"}, ["email"]) == {"error": "x"}
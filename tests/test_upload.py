@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from utils.upload import InvalidUpload, UploadTooLarge, spool_multipart
+
+MAX_BYTES = 64 * 1024
+MEMORY_BYTES = 16 * 1024
+BOUNDARY = "test-boundary"
+
+app = FastAPI()
+spooled_files = []
+
+
+@app.post("/upload")
+async def upload(request: Request):
+    try:
+        files = await spool_multipart(request, "files", MAX_BYTES, MEMORY_BYTES, MAX_BYTES + 1024)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    spooled_files.extend(files)
+    return [{"filename": f.filename, "size": f.size, "hash": f.content_hash, "on_disk": f.path is not None,
+             "contents": f.read_bytes().decode("latin-1")} for f in files]
+
+
+@pytest.fixture
+def client():
+    yield TestClient(app)
+    for spooled in spooled_files:
+        spooled.cleanup()
+    spooled_files.clear()
+
+
+def part(name, contents, filename=None):
+    disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+    return f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + contents + b"\r\n"
+
+
+def body(*parts):
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+HEADERS = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+
+def chunked(data, size=4096):
+    # a generator body makes the client send Transfer-Encoding: chunked without a Content-Length
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_files_are_spooled_with_hash_and_other_fields_are_skipped(client):
+    large = os.urandom(MEMORY_BYTES + 1)
+    data = body(part("note", b"not a file"), part("files", b"small", "a.txt"), part("files", large, "b.pdf"))
+    result = client.post("/upload", content=data, headers=HEADERS).json()
+    assert [(f["filename"], f["size"], f["on_disk"]) for f in result] == \
+        [("a.txt", 5, False), ("b.pdf", len(large), True)]
+    assert result[0]["contents"] == "small"
+    assert result[1]["hash"] == hashlib.sha256(large).hexdigest()
+
+
+def test_file_over_the_limit_is_rejected(client):
+    data = body(part("files", b"x" * (MAX_BYTES + 1), "a.pdf"))
+    assert client.post("/upload", content=data, headers=HEADERS).status_code == 413
+
+
+def test_chunked_upload_over_the_limit_is_rejected(client):
+    data = body(part("files", b"x" * (MAX_BYTES * 4), "a.pdf"))
+    response = client.post("/upload", content=chunked(data), headers=HEADERS)
+    assert response.status_code == 413
+    assert "content-length" not in response.request.headers
+
+
+@pytest.mark.parametrize("body_bytes", [MAX_BYTES * 8, MAX_BYTES // 2])
+def test_limits_stop_reading_the_stream(body_bytes):
+    chunks = list(chunked(body(part("files", b"x" * (MAX_BYTES * 4), "a.pdf"))))
+    received = []
+
+    async def receive():
+        received.append(chunks[len(received)])
+        return {"type": "http.request", "body": received[-1], "more_body": len(received) < len(chunks)}
+
+    scope = {"type": "http", "method": "POST", "headers": [(b"content-type", HEADERS["Content-Type"].encode())]}
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(spool_multipart(Request(scope, receive), "files", MAX_BYTES, MEMORY_BYTES, body_bytes))
+    # the file or raw body limit is hit before the rest of the body is read
+    assert len(received) * 4096 <= min(MAX_BYTES, body_bytes) + 4096 * 2
+
+
+def test_missing_file_field_and_non_multipart_bodies(client):
+    assert client.post("/upload", content=body(part("file", b"x", "a.pdf")), headers=HEADERS).status_code == 400
+    assert client.post("/upload", json={"files": "x"}).status_code == 400
@@ -1,34 +1,52 @@
-import re
+_VIETNAMESE_ACCENTS = {
+    'a': 'àáạảãâầấậẩẫăằắặẳẵ',
+    'A': 'ÀÁẠẢÃĂẰẮẶẲẴÂẦẤẬẨẪ',
+    'e': 'èéẹẻẽêềếệểễ',
+    'E': 'ÈÉẸẺẼÊỀẾỆỂỄ',
+    'o': 'òóọỏõôồốộổỗơờớợởỡ',
+    'O': 'ÒÓỌỎÕÔỒỐỘỔỖƠỜỚỢỞỠ',
+    'i': 'ìíịỉĩ',
+    'I': 'ÌÍỊỈĨ',
+    'u': 'ùúụủũưừứựửữ',
+    'U': 'ƯỪỨỰỬỮÙÚỤỦŨ',
+    'y': 'ỳýỵỷỹ',
+    'Y': 'ỲÝỴỶỸ',
+    'D': 'Đ',
+    'd': 'đ',
+}
+
+# accented character -> its base letter, used with str.translate
+_NO_ACCENT_TABLE = str.maketrans({
+    accented: base for base, chars in _VIETNAMESE_ACCENTS.items() for accented in chars
+})
+
+
+class _CleanTable(dict):
+    '''
+        Translation table for remove_special_character
+        Vietnamese letters are kept, form feeds dropped and any other
+        multi-byte character becomes a space. Entries are filled on first
+        lookup, so repeated characters are resolved in C
+    '''
+    def __missing__(self, key):
+        value = ' ' if len(chr(key).encode("utf-8")) > 1 else key
+        self[key] = value
+        return value
+
+
+_CLEAN_TABLE = _CleanTable({key: key for key in _NO_ACCENT_TABLE})
+_CLEAN_TABLE[ord('\x0c')] = None
+
 
 def no_accent_vietnamese(s):
-    s = re.sub(r'[àáạảãâầấậẩẫăằắặẳẵ]', 'a', s)
-    s = re.sub(r'[ÀÁẠẢÃĂẰẮẶẲẴÂẦẤẬẨẪ]', 'A', s)
-    s = re.sub(r'[èéẹẻẽêềếệểễ]', 'e', s)
-    s = re.sub(r'[ÈÉẸẺẼÊỀẾỆỂỄ]', 'E', s)
-    s = re.sub(r'[òóọỏõôồốộổỗơờớợởỡ]', 'o', s)
-    s = re.sub(r'[ÒÓỌỎÕÔỒỐỘỔỖƠỜỚỢỞỠ]', 'O', s)
-    s = re.sub(r'[ìíịỉĩ]', 'i', s)
-    s = re.sub(r'[ÌÍỊỈĨ]', 'I', s)
-    s = re.sub(r'[ùúụủũưừứựửữ]', 'u', s)
-    s = re.sub(r'[ƯỪỨỰỬỮÙÚỤỦŨ]', 'U', s)
-    s = re.sub(r'[ỳýỵỷỹ]', 'y', s)
-    s = re.sub(r'[ỲÝỴỶỸ]', 'Y', s)
-    s = re.sub(r'[Đ]', 'D', s)
-    s = re.sub(r'[đ]', 'd', s)
-    return s
+    return s.translate(_NO_ACCENT_TABLE)
 
 # clear special character in texts
 def remove_special_character(lines):
-    new_lines = ""
+    new_lines = []
     for line in lines.split("\n"):
-        clear_line = ""
-        for i,c in enumerate(no_accent_vietnamese(line)):
-            if len(c.encode("utf-8"))>1:
-                clear_line+=" "
-            elif '\x0c'.encode() is line[i].encode():
-                pass
-            else:
-                clear_line+=line[i]
-        if len(clear_line) >0:
-            new_lines += clear_line+"\n"
-    return new_lines
\ No newline at end of file
+        clear_line = line.translate(_CLEAN_TABLE)
+        if len(clear_line) > 0:
+            new_lines.append(clear_line)
+            new_lines.append("\n")
+    return "".join(new_lines)
@@ -0,0 +1,300 @@
+"""
+In-process extractors for non-PDF documents
+TXT, DOCX and RTF are decoded directly; legacy .doc and anything else goes
+to a Tika server over a pooled HTTP session
+"""
+import codecs
+import io
+import logging
+import re
+import zipfile
+from xml.etree import ElementTree
+from typing import Optional, Tuple, Union
+
+from utils.util import get_config
+
+try:
+    from charset_normalizer import from_bytes as detect_charset
+except ImportError:
+    detect_charset = None
+
+logger = logging.getLogger(__name__)
+
+NATIVE_FORMATS = ("txt", "docx", "rtf")
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def document_format(filename: str) -> str:
+    """Lower-case extension without the dot ("" when there is none)"""
+    name = filename.lower().rsplit("/", 1)[-1]
+    return name.rsplit(".", 1)[1] if "." in name else ""
+
+
+def read_source(source: Union[bytes, str]) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    with open(source, "rb") as f:
+        return f.read()
+
+
+# ============= TXT =============
+
+def decode_text(data: bytes) -> str:
+    """
+    Decode plain text: BOM, then strict UTF-8, then UTF-16 without BOM,
+    then charset detection, with Windows-1258 (Vietnamese) as the last resort
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return data.decode(encoding, errors="replace")
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    # UTF-16 text without a BOM has a NUL in every other byte for ASCII
+    sample = data[:4096]
+    if len(sample) >= 2 and sample.count(0) * 4 > len(sample):
+        encoding = "utf-16-le" if sample[1::2].count(0) > sample[0::2].count(0) else "utf-16-be"
+        return data.decode(encoding, errors="replace")
+    if detect_charset is not None:
+        match = detect_charset(data).best()
+        if match is not None:
+            return str(match)
+    return data.decode("cp1258", errors="replace")
+
+
+# ============= DOCX =============
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+
+def docx_text(source: Union[bytes, str]) -> str:
+    """
+    Stream word/document.xml out of the archive; paragraphs become lines,
+    tabs and breaks are kept. mc:Fallback copies of text boxes are skipped
+    """
+    archive_source = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    parts = []
+    with zipfile.ZipFile(archive_source) as archive:
+        with archive.open("word/document.xml") as xml:
+            fallback_depth = 0
+            for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+                tag = element.tag
+                if tag == _MC_FALLBACK:
+                    fallback_depth += 1 if event == "start" else -1
+                    continue
+                if event == "start" or fallback_depth:
+                    continue
+                if tag == _W + "t":
+                    parts.append(element.text or "")
+                elif tag == _W + "tab":
+                    parts.append("\t")
+                elif tag in (_W + "br", _W + "cr"):
+                    parts.append("\n")
+                elif tag == _W + "p":
+                    parts.append("\n")
+                    # paragraphs are done with, keep memory flat on large files
+                    element.clear()
+    return "".join(parts)
+
+
+# ============= RTF =============
+
+_RTF_TOKEN = re.compile(
+    r"\\([a-z]{1,32})(-?\d{1,10})?[ ]?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|[\r\n]+|(.)",
+    re.IGNORECASE,
+)
+
+# destinations whose text is not part of the document body
+_RTF_SKIP_DESTINATIONS = frozenset((
+    "aftncn", "aftnsep", "aftnsepc", "annotation", "atnauthor", "atndate", "atnicn", "atnid",
+    "atnparent", "atnref", "atntime", "atrfend", "atrfstart", "author", "background",
+    "bkmkend", "bkmkstart", "blipuid", "buptim", "category", "colorschememapping",
+    "colortbl", "comment", "company", "creatim", "datafield", "datastore", "defchp", "defpap",
+    "do", "doccomm", "docvar", "dptxbxtext", "ebcend", "ebcstart", "factoidname", "falt",
+    "fchars", "ffdeftext", "ffentrymcr", "ffexitmcr", "ffformat", "ffhelptext", "ffl",
+    "ffname", "ffstattext", "fldinst", "fldtype", "fname", "fontemb", "fontfile", "fonttbl",
+    "footer", "footerf", "footerl", "footerr", "footnote", "formfield", "ftncn", "ftnsep",
+    "ftnsepc", "g", "generator", "gridtbl", "header", "headerf", "headerl", "headerr", "hl",
+    "hlfr", "hlinkbase", "hlloc", "hlsrc", "hsv", "htmltag", "info", "keycode", "keywords",
+    "latentstyles", "lchars", "levelnumbers", "leveltext", "lfolevel", "linkval", "list",
+    "listlevel", "listname", "listoverride", "listoverridetable", "listpicture", "liststylename",
+    "listtable", "listtext", "lsdlockedexcept", "macc", "maccPr", "mailmerge", "maln", "malnScr",
+    "manager", "margPr", "mbar", "mbarPr", "mbaseJc", "mbegChr", "mborderBox", "mborderBoxPr",
+    "mbox", "mboxPr", "mchr", "mcount", "mctrlPr", "md", "mdeg", "mdegHide", "mden", "mdiff",
+    "mdPr", "me", "mendChr", "meqArr", "meqArrPr", "mf", "mfName", "mfPr", "mfunc", "mfuncPr",
+    "mgroupChr", "mgroupChrPr", "mgrow", "mhideBot", "mhideLeft", "mhideRight", "mhideTop",
+    "mhtmltag", "mlim", "mlimloc", "mlimlow", "mlimlowPr", "mlimupp", "mlimuppPr", "mm",
+    "mmaddfieldname", "mmath", "mmathPict", "mmathPr", "mmaxdist", "mmc", "mmcJc", "mmconnectstr",
+    "mmconnectstrdata", "mmcPr", "mmcs", "mmdatasource", "mmheadersource", "mmmailsubject",
+    "mmodso", "mmodsofilter", "mmodsofldmpdata", "mmodsomappedname", "mmodsoname",
+    "mmodsorecipdata", "mmodsosort", "mmodsosrc", "mmodsotable", "mmodsoudl",
+    "mmodsoudldata", "mmodsouniquetag", "mmPr", "mmquery", "mmr", "mnary", "mnaryPr",
+    "mnoBreak", "mnum", "mobjDist", "moMath", "moMathPara", "moMathParaPr", "mopEmu",
+    "mphant", "mphantPr", "mplcHide", "mpos", "mr", "mrad", "mradPr", "mrPr", "msepChr",
+    "mshow", "mshp", "msPre", "msPrePr", "msSub", "msSubPr", "msSubSup", "msSubSupPr", "msSup",
+    "msSupPr", "mstrikeBLTR", "mstrikeH", "mstrikeTLBR", "mstrikeV", "msub", "msubHide",
+    "msup", "msupHide", "mtransp", "mtype", "mvertJc", "mvfmf", "mvfml", "mvtof", "mvtol",
+    "mzeroAsc", "mzeroDesc", "mzeroWid", "nesttableprops", "nextfile", "nonesttables",
+    "objalias", "objclass", "objdata", "object", "objname", "objsect", "objtime", "oldcprops",
+    "oldpprops", "oldsprops", "oldtprops", "oleclsid", "operator", "panose", "password",
+    "passwordhash", "pgp", "pgptbl", "picprop", "pict", "pn", "pnseclvl", "pntext", "pntxta",
+    "pntxtb", "printim", "private", "propname", "protend", "protstart", "protusertbl", "pxe",
+    "result", "revtbl", "revtim", "rsidtbl", "rxe", "shp", "shpgrp", "shpinst", "shppict",
+    "shprslt", "shptxt", "sn", "sp", "staticval", "stylesheet", "subject", "sv", "svb", "tc",
+    "template", "themedata", "title", "txe", "ud", "upr", "userprops", "wgrffmtfilter",
+    "windowcaption", "writereservation", "writereservhash", "xe", "xform", "xmlattrname",
+    "xmlattrvalue", "xmlclose", "xmlname", "xmlnstbl", "xmlopen",
+))
+
+_RTF_SPECIAL_CHARACTERS = {
+    "par": "\n", "sect": "\n\n", "page": "\n\n", "line": "\n", "tab": "\t",
+    "emdash": "\u2014", "endash": "\u2013", "emspace": "\u2003", "enspace": "\u2002",
+    "qmspace": "\u2005", "bullet": "\u2022", "lquote": "\u2018", "rquote": "\u2019",
+    "ldblquote": "\u201c", "rdblquote": "\u201d", "row": "\n", "cell": "\t", "nestcell": "\t",
+}
+
+
+def rtf_text(source: Union[bytes, str]) -> str:
+    """
+    Single-pass RTF tokenizer: keeps body text, decodes \\'hh with the
+    document code page and \\uN escapes, and drops non-text destinations
+    """
+    data = read_source(source).decode("latin-1")
+    codepage = "cp1252"
+    match = re.search(r"\\ansicpg(\d+)", data[:4096])
+    if match:
+        try:
+            codepage = codecs.lookup("cp" + match.group(1)).name
+        except LookupError:
+            pass
+
+    stack = []
+    ignorable = False
+    skip_fallback = 1      # \ucN: characters to skip after a \uN escape
+    pending_skip = 0
+    out = []
+    pending_bytes = bytearray()
+
+    def flush_bytes():
+        if pending_bytes:
+            out.append(pending_bytes.decode(codepage, errors="replace"))
+            pending_bytes.clear()
+
+    for match in _RTF_TOKEN.finditer(data):
+        word, arg, hex_code, symbol, brace, char = match.groups()
+        if hex_code is None:
+            flush_bytes()
+        if brace:
+            pending_skip = 0
+            if brace == "{":
+                stack.append((skip_fallback, ignorable))
+            elif stack:
+                skip_fallback, ignorable = stack.pop()
+        elif symbol:
+            pending_skip = 0
+            if symbol == "~":
+                if not ignorable:
+                    out.append("\xa0")
+            elif symbol in "{}\\":
+                if not ignorable:
+                    out.append(symbol)
+            elif symbol == "*":
+                ignorable = True
+            elif symbol in "\r\n" and not ignorable:
+                out.append("\n")
+        elif word:
+            pending_skip = 0
+            if word in _RTF_SKIP_DESTINATIONS:
+                ignorable = True
+            elif ignorable:
+                pass
+            elif word in _RTF_SPECIAL_CHARACTERS:
+                out.append(_RTF_SPECIAL_CHARACTERS[word])
+            elif word == "uc":
+                skip_fallback = int(arg or 1)
+            elif word == "u":
+                code = int(arg or 0)
+                out.append(chr(code + 0x10000 if code < 0 else code))
+                pending_skip = skip_fallback
+        elif hex_code:
+            if pending_skip > 0:
+                pending_skip -= 1
+            elif not ignorable:
+                pending_bytes.append(int(hex_code, 16))
+        elif char:
+            if pending_skip > 0:
+                pending_skip -= 1
+            elif not ignorable:
+                out.append(char)
+    flush_bytes()
+    return "".join(out)
+
+
+# ============= Tika fallback =============
+
+_tika_session = None
+
+
+def _get_tika_session():
+    """One keep-alive session per process, so repeated calls reuse connections"""
+    global _tika_session
+    if _tika_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        pool_size = get_config().get("tika_pool_size", 4)
+        _tika_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        _tika_session.mount("http://", adapter)
+        _tika_session.mount("https://", adapter)
+    return _tika_session
+
+
+def tika_text(source: Union[bytes, str]) -> Optional[str]:
+    """
+    Plain text from Tika. With tika_server_endpoint configured the document is
+    PUT to a running server over the pooled session; otherwise the tika
+    package manages (and if needed starts) its own local server
+    """
+    config = get_config()
+    endpoint = config.get("tika_server_endpoint")
+    if endpoint:
+        response = _get_tika_session().put(
+            endpoint.rstrip("/") + "/tika",
+            data=read_source(source),
+            headers={"Accept": "text/plain; charset=UTF-8"},
+            timeout=config.get("tika_timeout_seconds", 60),
+        )
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        return response.text
+    from tika import parser
+    if isinstance(source, (bytes, bytearray)):
+        parsed = parser.from_buffer(bytes(source))
+    else:
+        parsed = parser.from_file(source)
+    return parsed["content"]
+
+
+def extract_native(source: Union[bytes, str], fmt: str) -> Tuple[Optional[str], str]:
+    """Return (text, extractor) using the native path for fmt, else Tika"""
+    if fmt == "txt":
+        return decode_text(read_source(source)), "native"
+    if fmt == "docx":
+        try:
+            return docx_text(source), "native"
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+            # mislabelled or damaged files still get a chance with Tika
+            logger.warning(f"Native DOCX extraction failed, falling back to Tika: {e}")
+    elif fmt == "rtf":
+        return rtf_text(source), "native"
+    return tika_text(source), "tika"
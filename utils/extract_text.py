@@ -1,22 +1,15 @@
 # -*- coding: utf8 -*-
-from pdfminer.pdfparser import PDFParser
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdfpage import PDFPage
-from pdfminer.pdfpage import PDFTextExtractionNotAllowed
-from pdfminer.pdfinterp import PDFResourceManager
-from pdfminer.pdfinterp import PDFPageInterpreter
-from pdfminer.pdfdevice import PDFDevice
-from pdfminer.layout import LAParams
-from pdfminer.converter import PDFPageAggregator
-from pdf2image import convert_from_path
 # from utils.extract_face_image import face_image_extract
-import pdfminer
+import pdfminer.layout
 import cv2
 import numpy as np
 from utils.clear_text import remove_special_character
-import pdfplumber
+from utils.pdf_document import PDFAnalysis, open_analysis
 # import itertools
-from tika import parser
+import time
+from utils.document_formats import document_format, extract_native
+from utils.tracing import span, tracing
+from utils.util import get_config
 
 # Import OCR functionality
 try:
@@ -26,126 +19,141 @@ except ImportError as e:
     print(f"⚠️ OCR functionality not available: {e}")
     OCR_AVAILABLE = False
 
-def pdfminer_extract(path,param):
+# columns: gutters found on the first page split every page; xy_cut: each page
+# is ordered on its own by recursive XY-cut
+READING_ORDER = get_config().get("pdf_reading_order", "columns")
+
+# text boxes of one page: coordinates plus the text, in a structured array
+# (one allocation per page instead of a Python list per box)
+BOX_DTYPE = np.dtype([("x0", np.float64), ("y0", np.float64), ("x1", np.float64),
+                      ("y1", np.float64), ("text", object)])
+
+def box_coords(boxes):
+    # (n, 4) array of x0, y0, x1, y1
+    return np.stack([boxes["x0"], boxes["y0"], boxes["x1"], boxes["y1"]], axis=1)
+
+def pdfminer_extract(pdf, param, pages=None):
     if "LTTextBox" in param:
         param = pdfminer.layout.LTTextBox
     elif "LTTextLine" in param:
         param = pdfminer.layout.LTTextLine
     else:
         assert False,"False"
-    fp = open(path, 'rb')
-
-    # Create a PDF parser object associated with the file object.
-    parser = PDFParser(fp)
-
-    # Create a PDF document object that stores the document structure.
-    # Password for initialization as 2nd parameter
-    document = PDFDocument(parser)
-
-    # Check if the document allows text extraction. If not, abort.
-    if not document.is_extractable:
-        raise PDFTextExtractionNotAllowed
-
-    # Create a PDF resource manager object that stores shared resources.
-    rsrcmgr = PDFResourceManager()
-
-    # Create a PDF device object.
-    device = PDFDevice(rsrcmgr)
-
-    # BEGIN LAYOUT ANALYSIS
-    # Set parameters for analysis.
-    laparams = LAParams()
-
-    # Create a PDF page aggregator object.
-    device = PDFPageAggregator(rsrcmgr, laparams=laparams)
-
-    # Create a PDF interpreter object.
-    interpreter = PDFPageInterpreter(rsrcmgr, device)
 
+    # boxes of one layout tree in PDF coordinates (y up, as in pdfminer's bbox),
+    # narrowed to the text without its surrounding whitespace
     def parse_obj(lt_objs):
-        arr = []
-        # loop over the object list
-        for obj in lt_objs:
-            # if it's a textbox, print text and location
-            if isinstance(obj, param):
-                text = obj.get_text().replace('\n', ' ')
-                text_clean = text.strip()
-
-                start_index = text.find(text_clean)
+        bboxes = []
+        spans = []
+        texts = []
+        # depth first without recursion: containers (figures, or text boxes
+        # when collecting lines) are walked, other objects hold no text boxes
+        stack = [iter(lt_objs)]
+        while stack:
+            obj = next(stack[-1], None)
+            if obj is None:
+                stack.pop()
+            elif isinstance(obj, param):
+                text = obj.get_text()
+                line = text.replace('\n', ' ')
+                if not line:
+                    continue
+                text_clean = line.strip()
+                start_index = line.find(text_clean)
                 end_index = start_index + len(text_clean)
                 if start_index > 0:
                     start_index-=1
-                left, upper, right,lower = obj.bbox
-
-                step = (right-left) / len(text)
-                right = left + step*end_index
-                left = left + step*start_index
-                arr.append([left, upper, right,lower, obj.get_text()])
+                bboxes.append(obj.bbox)
+                spans.append((start_index, end_index, len(line)))
+                texts.append(text)
+            elif isinstance(obj, pdfminer.layout.LTContainer):
+                stack.append(iter(obj))
 
-            # if it's a container, recurse
-            else:
-                try:
-                    tmp_arr = parse_obj(obj._objs)
-                    arr.extend(tmp_arr)
-                except:
-                    pass
-        return arr
+        boxes = np.empty(len(texts), dtype=BOX_DTYPE)
+        if len(texts) == 0:
+            return boxes
+        bboxes = np.asarray(bboxes, dtype=np.float64)
+        spans = np.asarray(spans, dtype=np.float64)
+        left, right = bboxes[:, 0], bboxes[:, 2]
+        # characters are assumed evenly spaced across the box
+        step = (right - left) / spans[:, 2]
+        boxes["x0"] = left + step*spans[:, 0]
+        boxes["x1"] = left + step*spans[:, 1]
+        boxes["y0"] = bboxes[:, 1]
+        boxes["y1"] = bboxes[:, 3]
+        boxes["text"] = texts
+        return boxes
     result = []
-    # loop over all pages in the document
-    sizes = None
-    for page in PDFPage.create_pages(document):
-        if sizes is None:
-            sizes = page.mediabox
-           
-        # read the page into a layout object
-        interpreter.process_page(page)
-        layout = device.get_result()
-        # extract text from this object
-        result.append(parse_obj(layout._objs))
+    # layouts come from the shared analysis, which raises
+    # PDFTextExtractionNotAllowed if the document forbids extraction
+    with open_analysis(pdf) as analysis:
+        sizes = analysis.mediabox
+        # pages: indices to parse (default: every page), one result per index
+        for index in range(analysis.page_count) if pages is None else pages:
+            layout = analysis.layout(index)
+            # extract text from this object
+            result.append(parse_obj(layout._objs))
         
     return result,sizes
 
-def extract_box(path, param):
+# boxes of one page (from pdfminer_extract) that hold text, flipped to
+# top-down, truncated to whole points and widened by 5 each side
+def page_layout_boxes(page_boxes, sizes):
+    texts = [text.replace("\xa0","") for text in page_boxes["text"]]
+    keep = np.fromiter((len(text.strip()) > 0 for text in texts), dtype=bool, count=len(texts))
+    page_boxes = page_boxes[keep]
+    boxs_perI = np.empty(len(page_boxes), dtype=BOX_DTYPE)
+    boxs_perI["x0"] = np.trunc(page_boxes["x0"]) - 5
+    boxs_perI["y0"] = np.trunc(sizes[3] - page_boxes["y1"])
+    boxs_perI["x1"] = np.trunc(page_boxes["x1"]) + 5
+    boxs_perI["y1"] = np.trunc(sizes[3] - page_boxes["y0"])
+    boxs_perI["text"] = [text for text, kept in zip(texts, keep) if kept]
+    return boxs_perI
+
+# text boxes per page in whole PDF points, top-down (BOX_DTYPE arrays, y0 is
+# the top edge); returns (pred_boxes, page_sizes) with one (width, height) per
+# returned page; no page is rasterized, the mediabox gives the page geometry
+def extract_box(pdf, param):
     pred_boxes = []
+    page_sizes = []
+    path = pdf.path if isinstance(pdf, PDFAnalysis) else pdf
     try:
-        boxes,sizes = pdfminer_extract(path, param)
-        images = convert_from_path(path)
-        
-        if len(images)!= len(boxes):
-            return None
-        for i, img in enumerate(images):
-            boxs_perI = []
-            image = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-            results = []
-            for box in boxes[i]:
-                if len(box[4].replace("\xa0","").strip())<1:
+        with open_analysis(pdf) as analysis:
+            boxes,_ = pdfminer_extract(analysis, param)
+            for i, page_boxes in enumerate(boxes):
+                sizes = analysis.page_mediabox(i)
+                boxs_perI = page_layout_boxes(page_boxes, sizes)
+                # pages without text are left out
+                if len(boxs_perI) == 0:
                     continue
-                results.append([box[0],sizes[3] - box[1],box[2],sizes[3] - box[3],box[4].replace("\xa0","")])
 
-            if len(results) == 0:
-                continue
-            for box in results:
-                left, lower, right, upper, text  = int(box[0]), int(box[1]), int(box[2]), int(box[3]), box[4]
-                left -=5
-                right +=5
-                
-                left,right = (left/sizes[2])*image.shape[1] ,(right/sizes[2])*image.shape[1] 
-                upper,lower = (upper/sizes[3])*image.shape[0] ,(lower/sizes[3])*image.shape[0] 
-                boxs_perI.append((left, upper, right, lower, text))
-
-            pred_boxes.append(boxs_perI)
+                pred_boxes.append(boxs_perI)
+                page_sizes.append((sizes[2], sizes[3]))
         
     except Exception as e:
         print(e,path)
         return None
-    return pred_boxes, images
+    return pred_boxes, page_sizes
+
+# debug helper: render one page and draw its text boxes on it
+# (the only layout code path that rasterizes a text PDF)
+def draw_layout_overlay(pdf, index, dpi=100):
+    with open_analysis(pdf) as analysis:
+        image = cv2.cvtColor(np.array(analysis.render_page(index, dpi=dpi)), cv2.COLOR_RGB2BGR)
+        # boxes of this page only: extract_box drops pages without text, so
+        # its list index is not the page number
+        boxes,_ = pdfminer_extract(analysis, "LTTextBox")
+        page_boxes = page_layout_boxes(boxes[index], analysis.page_mediabox(index))
+    scale = dpi / 72
+    for left, upper, right, lower, _ in page_boxes:
+        cv2.rectangle(image, (int(left*scale), int(upper*scale)), (int(right*scale), int(lower*scale)), (0, 0, 255), 1)
+    return image
 
 # use pdfplumber for CV 1 column
-def pdfplumber_extract(path):
+def pdfplumber_extract(pdf):
     result_texts = ""
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
+    with open_analysis(pdf) as analysis:
+        for text in analysis.page_texts():
             if text is None:
                 continue
             ''' loai bo cac ky tu lien tiep trung nhau do thu vien
@@ -154,114 +162,165 @@ def pdfplumber_extract(path):
             text = [t for t in text.split("\n") if len(t.strip())>0]
             text = " \n".join(text)
             result_texts += "\n" + text
-    result_texts = remove_special_character(result_texts)
+    with span("clean_text"):
+        result_texts = remove_special_character(result_texts)
     return result_texts
 
-# sort box, text follow box output from pdfminer
-def sort(boundings, texts):
-    arr_bounds = np.asarray(boundings)
-    arr_bounds[:,2] = arr_bounds[:,2]-arr_bounds[:,0]
-    arr_bounds[:,3] = arr_bounds[:,3]-arr_bounds[:,1]
-    ind_list = np.lexsort((arr_bounds[:, 0], arr_bounds[:, 1]))
-    y_box = arr_bounds[ind_list]
-    texts = texts[ind_list]
-    idx = 0
-    sort = []
-    for i, cnt in enumerate(y_box):
-        x, y, w, h = y_box[i-1]
-        x1, y1, w1, h1 = y_box[i]
-        if((y1-(y+h))>0):
-            idx += 1
-        sort.append((idx, x1, y1, w1, h1))
-    arr_sort= np.asarray(sort)
-    ind_sort= np.lexsort((arr_sort[:, 1], arr_sort[:, 0]))
-    x_box = arr_sort[ind_sort]
-    texts = texts[ind_sort]
-    return x_box, texts
+# cleaned text of the given pages ({index: text}), each ordered from its own
+# layout: the text pages of a mixed (partly scanned) PDF, where the first
+# page's gutters and the document-wide column order do not apply
+def page_layout_texts(pdf, pages):
+    texts = {}
+    with open_analysis(pdf) as analysis:
+        boxes,_ = pdfminer_extract(analysis, "LTTextBox", pages)
+        for index, page_boxes in zip(pages, boxes):
+            sizes = analysis.page_mediabox(index)
+            page_boxes = page_layout_boxes(page_boxes, sizes)
+            gutters = None
+            if len(page_boxes) and READING_ORDER == "columns":
+                gutters = column_gutters(page_boxes, sizes[2], sizes[3])
+            if len(page_boxes) and READING_ORDER == "xy_cut":
+                text = " ".join(page_boxes["text"][xy_cut(box_coords(page_boxes))])
+            elif gutters:
+                text = "\n".join(" ".join(column) for column in detect_line(page_boxes, sizes[2], gutters))
+            else:
+                # one column: the page text, as pdfplumber_extract reads it
+                text = analysis.page_text(index) or ""
+                text = " \n".join(t for t in text.split("\n") if len(t.strip())>0)
+            texts[index] = remove_special_character(text)
+    return texts
 
-# ratio of column
-def ratio_(boxes, image):
-    copy_image = np.zeros([image.shape[0],image.shape[1],3],dtype=np.uint8)
-    copy_image.fill(255)
-    Y_cor = image.shape[0]*0.2
-    min_left = 1e6
-    max_right = -1
-    for box in boxes:
-        left, upper, right, lower, text = int(box[0]), int(box[1]), int(box[2]), int(box[3]), str(box[4])
-        if lower<Y_cor:
-            continue
-        if min_left > left:
-            min_left = left
-        if max_right < right:
-            max_right = right
-        cv2.rectangle(copy_image, (left, 0), (right, copy_image.shape[0]), (0, 0, 0), -1)
-   
-    # draw black all of two offset column
-    cv2.rectangle(copy_image, (0, 0), (int(min_left), copy_image.shape[0]), (0, 0, 0), -1)
-    cv2.rectangle(copy_image, (int(max_right), 0), (copy_image.shape[1], copy_image.shape[0]), (0, 0, 0), -1)
-    imgray = cv2.cvtColor(copy_image, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(imgray, 127, 255, 0)
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    if len(contours)==0:
-        ratio = 1.0
-    else:
-        for cnt in contours:
-            x, y, w, h = cv2.boundingRect(cnt)
-            x_center = int(x+w/2)
-            if x_center/copy_image.shape[1] < 0.15 or x_center/copy_image.shape[1] > 0.85:
-                ratio = 1.0
-                continue
-            ratio = x_center/copy_image.shape[1]
+# reading order line by line: indices of coords (x0, y0, x1, y1 rows, top-down)
+# sorted by group (e.g. column), line, then left edge. A box starts a new line
+# when its top is below the bottom of the box before it in top-down order
+def line_order(coords, groups=None):
+    if groups is None:
+        groups = np.zeros(len(coords), dtype=np.int64)
+    by_top = np.lexsort((coords[:, 0], coords[:, 1], groups))
+    tops = coords[by_top, 1]
+    bottoms = coords[by_top, 3]
+    new_line = np.zeros(len(by_top), dtype=bool)
+    new_line[1:] = (tops[1:] - bottoms[:-1]) > 0
+    lines = np.cumsum(new_line)
+    return by_top[np.lexsort((coords[by_top, 0], lines, groups[by_top]))]
 
-    return ratio
+# whole positions between min(starts) and max(ends) covered by at least one
+# [start, end] interval, as a coverage histogram built in one pass
+def covered_positions(starts, ends, origin, size):
+    starts = np.clip(starts.astype(int) - origin, 0, size)
+    ends = np.clip(ends.astype(int) - origin, 0, size)
+    coverage = np.bincount(starts, minlength=size + 2) - np.bincount(ends + 1, minlength=size + 2)
+    return np.cumsum(coverage[:size]) > 0
 
-# get text follow column
-def detect_line(boxes, image_, ratio_column):
-    pred_boxes = []
-    columns = []
-    texts = []
+# (starts, ends) of the runs of uncovered positions strictly inside the span of the intervals
+def coverage_gaps(starts, ends):
+    origin = int(starts.min())
+    size = int(ends.max()) - origin + 1
+    covered = covered_positions(starts, ends, origin, size)
+    edges = np.diff(covered.astype(np.int8))
+    return np.flatnonzero(edges == -1) + 1 + origin, np.flatnonzero(edges == 1) + 1 + origin
 
-    for box in boxes:
-        if (int(box[0])==int(box[2])) or (int(box[1])==int(box[2])):
-            continue
-        left, upper, right, lower = int(box[0]), int(box[1]), int(box[2]), int(box[3])
-        
-        texts.append(box[4])
-        pred_boxes.append([left, upper, right, lower])
-        if ratio_column*image_.shape[1] < left:
-            columns.append(1)
-        elif ratio_column*image_.shape[1] > right:
-            columns.append(0)
-        else:
-            if (ratio_column*image_.shape[1]-left)/(right-left)>0.3:
-                columns.append(0)
-            else:
-                columns.append(1)
-   
-    pred_boxes = np.array(pred_boxes)
-    columns = np.array(columns)
-    texts = np.array(texts)
-   
-    boxes_left = pred_boxes[columns==0]
-    boxes_right = pred_boxes[columns==1]
-    texts_left = texts[columns==0]
-    texts_right = texts[columns==1]
-    
-    if len(boxes_left)>0:
-        boxes_left, texts_left = sort(boxes_left, texts_left)
-    if len(boxes_right)>0:
-        boxes_right, texts_right = sort(boxes_right, texts_right)
+# x positions of the vertical gutters between text columns, as fractions
+# of the page width; boxes and page size share one coordinate space
+def column_gutters(boxes, page_width, page_height):
+    if len(boxes) == 0:
+        return []
+    # ignore the header band (top 20% of the page), which often spans columns
+    boxes = boxes[boxes["y1"] >= page_height*0.2]
+    width = int(page_width)
+    if len(boxes) == 0 or width <= 0:
+        return []
+
+    lefts = np.clip(boxes["x0"].astype(int), 0, width)
+    rights = np.clip(boxes["x1"].astype(int), 0, width)
+    covered = covered_positions(lefts, rights, 0, width)
+    # the margins outside the text area are not gutters
+    covered[:lefts.min() + 1] = True
+    covered[rights.max():] = True
+
+    # runs of uncovered x positions are the gutters
+    edges = np.diff(np.concatenate(([1], covered.astype(np.int8), [1])))
+    starts = np.flatnonzero(edges == -1)
+    ends = np.flatnonzero(edges == 1)
+    centers = ((starts + ends) // 2) / width
+    return [float(c) for c in centers if 0.15 <= c <= 0.85]
+
+# ratio of column: the widest gutter, or 1.0 for a single column page
+def ratio_(boxes, page_width, page_height):
+    gutters = column_gutters(boxes, page_width, page_height)
+    if not gutters:
+        return 1.0
+    return gutters[len(gutters) // 2] if len(gutters) > 2 else gutters[-1]
+
+# get text follow column: one array of sorted texts per column
+def detect_line(boxes, page_width, gutters):
+    if not isinstance(gutters, (list, tuple)):
+        gutters = [gutters]
+    coords = box_coords(boxes)
+    # drop boxes with no width or no height
+    keep = (coords[:, 0] != coords[:, 2]) & (coords[:, 1] != coords[:, 3])
+    coords = coords[keep]
+    texts = boxes["text"][keep]
 
-    return texts_left, texts_right
+    positions = np.asarray(gutters)[None, :]*page_width
+    left = coords[:, 0:1]
+    right = coords[:, 2:3]
+    # a box is right of a gutter if it starts after it, or straddles it
+    # with at most 30% of its width on the left side
+    with np.errstate(divide="ignore", invalid="ignore"):
+        straddle_left = (positions - left) / (right - left)
+    right_of = (positions < left) | ((positions <= right) & (straddle_left <= 0.3))
+    columns = right_of.sum(axis=1)
 
-# read file pdf
-def pdf_extract(path):
-    print ('-------path------------',path)
+    # one sort for all columns, then split where the column changes
+    texts = texts[line_order(coords, columns)]
+    counts = np.bincount(columns, minlength=len(gutters) + 1)
+    return np.split(texts, np.cumsum(counts)[:-1])
+
+# recursive XY-cut reading order: indices of coords (x0, y0, x1, y1 rows, top-down).
+# Each region is cut at its widest whitespace gaps, across columns (x) or rows
+# (y) whichever gap is wider, until no gap of min_gap points is left; the boxes
+# of such a region are read line by line. Regions are kept on an explicit stack
+def xy_cut(coords, min_gap=1):
+    order = []
+    stack = [np.arange(len(coords))]
+    while stack:
+        region = stack.pop()
+        best = None
+        for axis in (0, 1):
+            starts, ends = coverage_gaps(coords[region, axis], coords[region, axis + 2])
+            widths = ends - starts
+            if len(widths) and widths.max() >= min_gap and (best is None or widths.max() > best[0]):
+                best = (widths.max(), axis, starts[widths*2 >= widths.max()])
+        if best is None:
+            order.append(region[line_order(coords[region])])
+            continue
+        _, axis, cuts = best
+        # a gap is covered by no box, so every box lies wholly on one side of each cut
+        parts = np.searchsorted(cuts, coords[region, axis], side="right")
+        region = region[np.argsort(parts, kind="stable")]
+        counts = np.bincount(parts, minlength=len(cuts) + 1)
+        stack.extend(reversed(np.split(region, np.cumsum(counts)[:-1])))
+    return np.concatenate(order) if order else np.arange(0)
+
+# read file pdf (path, bytes or binary file object)
+def pdf_extract(path, progress=None, ocr_stats=None, events=None):
+    print ('-------path------------',path if isinstance(path, str) else "<memory>")
     
+    # Parse the document once; every stage below reuses this analysis
+    try:
+        analysis = PDFAnalysis(path)
+    except Exception as e:
+        print(f"Error opening PDF: {e}")
+        return f"Error extracting PDF content: {str(e)}", ""
+    with analysis:
+        return _pdf_extract(analysis, progress, ocr_stats, events)
+
+def _pdf_extract(analysis, progress=None, ocr_stats=None, events=None):
     # First, try OCR-based extraction if available
     if OCR_AVAILABLE:
         try:
-            texts, used_ocr = extract_text_with_ocr(path)
+            texts, used_ocr = extract_text_with_ocr(analysis, progress, ocr_stats, events)
             if used_ocr:
                 print("✅ Successfully extracted text using OCR")
                 return texts, ""
@@ -269,53 +328,69 @@ def pdf_extract(path):
                 print("📄 Text-based PDF, continuing with standard extraction")
         except Exception as e:
             print(f"⚠️ OCR extraction failed, falling back to standard method: {e}")
+    elif events:
+        events("pdf_type", pdf_type="text", pages=analysis.page_count)
     
     # Standard extraction method (existing logic)
     try:
-        result = extract_box(path, "LTTextBox")
+        with span("layout_boxes"):
+            result = extract_box(analysis, "LTTextBox")
         if result is None:
             # Fallback to simpler PDF text extraction
             print("Falling back to simple PDF text extraction...")
-            texts = pdfplumber_extract(path)
+            texts = pdfplumber_extract(analysis)
             return texts, ""
         
-        pred_boxes, images = result
+        pred_boxes, page_sizes = result
         base64 = "" 
         # face_image_extract(convert_from_path(path, fmt='jpeg'),None)
-        ratio = ratio_(pred_boxes[0], np.asarray(images[0]))
-        if ratio==1.0:
-            texts = pdfplumber_extract(path)
+        if len(pred_boxes) == 0:
+            texts = pdfplumber_extract(analysis)
+            return texts, base64
+        if READING_ORDER == "xy_cut":
+            with span("column_detection", method="xy_cut"):
+                pages = [" ".join(page["text"][xy_cut(box_coords(page))]) for page in pred_boxes]
+            with span("clean_text"):
+                texts = remove_special_character("\n".join(pages))
+            return texts, base64
+        width, height = page_sizes[0]
+        with span("column_detection"):
+            gutters = column_gutters(pred_boxes[0], width, height)
+        if not gutters:
+            texts = pdfplumber_extract(analysis)
             return texts,base64
             
         else:
-            texts_left = ""
-            texts_right = ""
-            for pred_box, image in zip(pred_boxes, images):
-                image = np.asarray(image)
-                text_left, text_right = detect_line(pred_box, image, ratio)
-                texts_left = texts_left+"\n"+" ".join(text for text in text_left)
-                texts_right = texts_right+"\n"+" ".join(text for text in text_right)
-            texts_left = remove_special_character(texts_left)
-            texts_right = remove_special_character(texts_right)
-            texts = texts_left+"\n"+texts_right
+            columns = [""] * (len(gutters) + 1)
+            with span("column_detection"):
+                for pred_box, (page_width, _) in zip(pred_boxes, page_sizes):
+                    for i, column_texts in enumerate(detect_line(pred_box, page_width, gutters)):
+                        columns[i] = columns[i]+"\n"+" ".join(text for text in column_texts)
+            with span("clean_text"):
+                texts = "\n".join(remove_special_character(column) for column in columns)
             return texts,base64
     except Exception as e:
         print(f"Error processing PDF: {e}")
         # Fallback to simple extraction
         try:
-            texts = pdfplumber_extract(path)
+            texts = pdfplumber_extract(analysis)
             return texts, ""
         except Exception as e2:
             print(f"Error in fallback PDF extraction: {e2}")
             return f"Error extracting PDF content: {str(e)}", ""
 
-# read file docx
-def doc_extract(path):
+# read non-PDF documents (path or bytes)
+# TXT, DOCX and RTF are extracted in-process; .doc and other formats use Tika
+def doc_extract(path, filename=None, stats=None):
     texts = ""
     print ("-------Document extraction started-----------")
+    fmt = document_format(filename or str(path if isinstance(path, str) else ""))
+    t0 = time.time()
+    extractor = "tika"
     try:
-        parsed = parser.from_file(path)
-        contents = parsed["content"]
+        with span("document_extract", format=fmt or "unknown") as labels:
+            contents, extractor = extract_native(path, fmt)
+            labels["engine"] = extractor
         if contents:
             for text in contents.split("\n"):
                 text = text.strip()
@@ -326,4 +401,49 @@ def doc_extract(path):
     except Exception as e:
         print(f"Error extracting document: {e}")
         texts = f"Error extracting document content: {str(e)}"
+    if stats is not None:
+        stats.update({
+            "format": fmt or "unknown",
+            "extractor": extractor,
+            "seconds": round(time.time() - t0, 4)
+        })
     return texts
+
+# entry point for worker processes: extract any supported upload
+# source is a path or the file contents; filename decides the type when given
+# progress(pages_done, pages_total) is called as OCR pages complete
+# events(stage, **data) is told about intermediate stages (e.g. the PDF type)
+# the stage spans recorded here are returned for the caller's trace
+def extract_document(source, filename=None, progress=None, events=None):
+    ocr_stats = {}
+    name = filename or str(source if isinstance(source, str) else "")
+    t0 = time.time()
+    with tracing() as trace:
+        if ".pdf" in name.lower():
+            resume_text, image_base64 = pdf_extract(source, progress, ocr_stats, events)
+            processing_method = "pdf_extraction"
+            extraction = {"format": "pdf", "extractor": "pdf", "seconds": round(time.time() - t0, 4)}
+        else:
+            extraction = {}
+            resume_text = doc_extract(source, name, extraction)
+            image_base64 = ""
+            processing_method = "document_extraction"
+    return {
+        "text": resume_text,
+        "image_base64": image_base64,
+        "processing_method": processing_method,
+        "ocr": ocr_stats or None,
+        "extraction": extraction,
+        "spans": trace.spans
+    }
+
+# process pool entry point for streaming uploads: stage events are put on a
+# (multiprocessing manager) queue as (stage, data) while extraction runs
+def extract_document_events(source, filename, queue):
+    def events(stage, **data):
+        queue.put((stage, data))
+    
+    def progress(pages_done, pages_total):
+        events("ocr_page", pages_done=pages_done, pages_total=pages_total)
+    
+    return extract_document(source, filename, progress, events)
@@ -0,0 +1,305 @@
+"""
+Scheduling for Gemini calls
+A token bucket keeps the request rate under quota, a semaphore bounds
+concurrent calls, every call has a timeout, retryable failures (429, 5xx,
+timeouts) back off exponentially with jitter, and identical in-flight
+prompts share one call. Streamed calls keep their concurrency slot until
+the last chunk, and each chunk must arrive within the timeout. Calls are
+blocking and thread-safe; they run in the API thread pool and in job
+worker processes.
+"""
+import hashlib
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average and bursts of `capacity`
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns seconds waited"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def status_code(error: Exception) -> Optional[int]:
+    """HTTP status behind a google.api_core / requests error, if any"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if status_code(error) in RETRYABLE_STATUS:
+        return True
+    # DeadlineExceeded, ServiceUnavailable and requests timeouts by name, so
+    # neither google.api_core nor requests has to be importable here
+    name = type(error).__name__
+    return name in ("DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted", "TooManyRequests",
+                    "InternalServerError", "Timeout", "ReadTimeout", "ConnectTimeout", "RetryError")
+
+
+class ScheduledStream:
+    """
+    Streamed generate_content response read by a background thread, so the
+    caller can wait for each chunk with a timeout and several callers can
+    read the same stream (each from its first chunk). on_finish(error) runs
+    once, when the stream ends, fails or a chunk times out; attributes such
+    as usage_metadata come from the underlying response
+    """
+
+    def __init__(self, response, chunk_timeout: float, on_finish: Callable[[Optional[Exception]], None]):
+        self._response = response
+        self.chunk_timeout = chunk_timeout
+        self._on_finish = on_finish
+        self._chunks: List = []
+        self._done = False
+        self._error: Optional[Exception] = None
+        self._condition = threading.Condition()
+        threading.Thread(target=self._read, name="gemini-stream", daemon=True).start()
+
+    def _read(self):
+        try:
+            for chunk in self._response:
+                with self._condition:
+                    if self._done:
+                        return  # timed out: nobody reads the rest
+                    self._chunks.append(chunk)
+                    self._condition.notify_all()
+        except Exception as e:
+            self._finish(e)
+        else:
+            self._finish(None)
+
+    def _finish(self, error: Optional[Exception]):
+        with self._condition:
+            if self._done:
+                return
+            self._done = True
+            self._error = error
+            self._condition.notify_all()
+        self._on_finish(error)
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: index < len(self._chunks) or self._done, self.chunk_timeout)
+                if index < len(self._chunks):
+                    chunk = self._chunks[index]
+                elif self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                else:
+                    chunk = None
+            if chunk is None:
+                self._finish(TimeoutError(f"No Gemini stream chunk within {self.chunk_timeout}s"))
+                raise self._error
+            index += 1
+            yield chunk
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._response, name)
+
+
+class GeminiScheduler:
+    """
+    Runs model.generate_content under rate, concurrency and retry policy
+    """
+
+    def __init__(self, model, requests_per_minute: float = 60, burst: int = 10, max_concurrency: int = 4,
+                 timeout_seconds: float = 60.0, max_retries: int = 4, backoff_base: float = 1.0,
+                 backoff_max: float = 30.0, deduplicate: bool = True):
+        self.model = model
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deduplicate = deduplicate
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._metrics = {
+            "calls": 0, "attempts": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0,
+            "deduplicated": 0, "active": 0, "throttled_seconds": 0.0, "backoff_seconds": 0.0,
+            "latency_seconds_total": 0.0, "latency_seconds_max": 0.0,
+        }
+        self._errors: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, model, config: dict) -> "GeminiScheduler":
+        return cls(
+            model,
+            requests_per_minute=config.get("gemini_requests_per_minute", 60),
+            burst=config.get("gemini_burst", 10),
+            max_concurrency=config.get("gemini_max_concurrency", 4),
+            timeout_seconds=config.get("gemini_timeout_seconds", 60),
+            max_retries=config.get("gemini_max_retries", 4),
+            backoff_base=config.get("gemini_backoff_base_seconds", 1.0),
+            backoff_max=config.get("gemini_backoff_max_seconds", 30.0),
+            deduplicate=config.get("gemini_deduplicate", True),
+        )
+
+    @staticmethod
+    def request_key(prompt: str, kwargs: dict) -> str:
+        options = repr(sorted((name, repr(value)) for name, value in kwargs.items()))
+        return hashlib.sha256((options + "\0" + prompt).encode("utf-8")).hexdigest()
+
+    def generate(self, prompt: str, **kwargs):
+        """
+        generate_content with scheduling. Identical prompts (and options)
+        issued while one is in flight wait for it and get the same response;
+        for stream=True that is a ScheduledStream, in flight until its last
+        chunk, which every caller iterates from the start
+        """
+        if not self.deduplicate:
+            return self._generate_with_retries(prompt, kwargs)
+
+        key = self.request_key(prompt, kwargs)
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self._metrics["deduplicated"] += 1
+        if not owner:
+            return future.result()
+
+        def forget():
+            with self._lock:
+                self._inflight.pop(key, None)
+
+        streaming = False
+        try:
+            response = self._generate_with_retries(prompt, kwargs, on_stream_end=forget)
+            streaming = isinstance(response, ScheduledStream)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            # a stream stays shareable until it ends (forget runs then)
+            if not streaming:
+                forget()
+
+    def _generate_with_retries(self, prompt: str, kwargs: dict, on_stream_end: Optional[Callable[[], None]] = None):
+        request_options = dict(kwargs.pop("request_options", None) or {})
+        request_options.setdefault("timeout", self.timeout_seconds)
+        # retries are ours; the client library must not add its own on top
+        request_options.setdefault("retry", None)
+        with self._lock:
+            self._metrics["calls"] += 1
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self._slots.acquire()
+            with self._lock:
+                self._metrics["attempts"] += 1
+                self._metrics["active"] += 1
+                self._metrics["throttled_seconds"] += waited
+            t0 = time.monotonic()
+            try:
+                response = self.model.generate_content(prompt, request_options=request_options, **kwargs)
+                error = None
+            except Exception as e:
+                error = e
+            if error is None and kwargs.get("stream"):
+                # the slot is released when the stream ends; failures after
+                # the first chunks cannot be retried
+                def on_finish(error, t0=t0):
+                    self._release(t0)
+                    self._record(error)
+                    if on_stream_end is not None:
+                        on_stream_end()
+                return ScheduledStream(response, self.timeout_seconds, on_finish)
+            self._release(t0)
+            retry = error is not None and attempt < self.max_retries and is_retryable(error)
+            self._record(error, final=not retry)
+            if error is None:
+                return response
+            if not retry:
+                raise error
+            label = str(status_code(error) or type(error).__name__)
+            # full jitter: anywhere between 0 and the exponential ceiling
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            logger.warning(f"Gemini call failed ({label}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            with self._lock:
+                self._metrics["retries"] += 1
+                self._metrics["backoff_seconds"] += delay
+            time.sleep(delay)
+            attempt += 1
+
+    def _release(self, t0: float):
+        """Free the concurrency slot of an attempt started at t0"""
+        elapsed = time.monotonic() - t0
+        self._slots.release()
+        with self._lock:
+            self._metrics["active"] -= 1
+            self._metrics["latency_seconds_total"] += elapsed
+            self._metrics["latency_seconds_max"] = max(self._metrics["latency_seconds_max"], elapsed)
+
+    def _record(self, error: Optional[Exception], final: bool = True):
+        """Count an attempt's outcome; final when no retry follows"""
+        with self._lock:
+            if error is None:
+                self._metrics["succeeded"] += 1
+                return
+            label = str(status_code(error) or type(error).__name__)
+            self._errors[label] = self._errors.get(label, 0) + 1
+            if "timeout" in type(error).__name__.lower() or type(error).__name__ == "DeadlineExceeded":
+                self._metrics["timeouts"] += 1
+            if final:
+                self._metrics["failed"] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["errors"] = dict(self._errors)
+            metrics["in_flight_keys"] = len(self._inflight)
+        attempts = metrics["attempts"]
+        metrics["latency_seconds_mean"] = round(metrics["latency_seconds_total"] / attempts, 4) if attempts else 0.0
+        for name in ("throttled_seconds", "backoff_seconds", "latency_seconds_total", "latency_seconds_max"):
+            metrics[name] = round(metrics[name], 4)
+        metrics["max_concurrency"] = self.max_concurrency
+        metrics["requests_per_minute"] = round(self.bucket.rate * 60, 2)
+        return metrics
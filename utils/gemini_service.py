@@ -1,21 +1,38 @@
 import google.generativeai as gemini
+import json
 import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
 from dotenv import load_dotenv
+from utils.gemini_scheduler import GeminiScheduler
+from utils.metrics import REGISTRY
+from utils.prompt_text import estimate_tokens, prepare_prompt_text
+from utils.tracing import span
+from utils.util import get_config
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Cấu hình GenAI với API Key trực tiếp
 api_key = os.getenv("GEMINI_API_KEY", "")  # API Key từ environment variable
+config = get_config()
 if api_key:
-    gemini.configure(api_key=api_key)
+    # gemini_transport: rest and gemini_api_endpoint point the client at
+    # another server, e.g. benchmarks/fake_gemini_server.py
+    client_options = {"api_endpoint": config["gemini_api_endpoint"]} if config.get("gemini_api_endpoint") else None
+    gemini.configure(api_key=api_key, transport=config.get("gemini_transport") or None,
+                     client_options=client_options)
     # Khởi tạo mô hình Gemini
-    model = gemini.GenerativeModel('gemini-1.5-flash')
+    model = gemini.GenerativeModel(config.get("gemini_model", "gemini-1.5-flash"))
     print("✅ Gemini API configured successfully!")
 else:
     model = None
     print("Warning: GEMINI_API_KEY not found. Gemini features will be disabled.")
 
+# Rate limit, concurrency bound, timeout, retries and in-flight deduplication
+scheduler = GeminiScheduler.from_config(model, config)
+
 features = '''
 context, Abbreviation, profession, specialty
 '''
@@ -23,6 +40,181 @@ context, Abbreviation, profession, specialty
 '''
 fullname, phone, skill, học vấn
 '''
+
+# Structured output schema: Gemini returns JSON matching it in a single call
+STRING_FIELDS = ["context", "profession", "specialty", "fullname", "phone"]
+LIST_FIELDS = ["abbreviation", "skill", "education"]
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{field: {"type": "string"} for field in STRING_FIELDS},
+        **{field: {"type": "array", "items": {"type": "string"}} for field in LIST_FIELDS},
+    },
+    "required": STRING_FIELDS + LIST_FIELDS,
+}
+GENERATION_CONFIG = gemini.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=EXTRACTION_SCHEMA,
+)
+# Grouped extraction: one array item per document, matched back by index
+BATCH_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"document_index": {"type": "integer"}, **EXTRACTION_SCHEMA["properties"]},
+        "required": ["document_index"] + EXTRACTION_SCHEMA["required"],
+    },
+}
+BATCH_GENERATION_CONFIG = gemini.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=BATCH_SCHEMA,
+)
+
+
+class LLMCallCounter:
+    """Number of Gemini round-trips (and tokens they used) while the counter is active"""
+
+    def __init__(self):
+        self.count = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def tokens(self) -> dict:
+        return {"prompt": self.prompt_tokens, "output": self.output_tokens}
+
+
+_call_counter: ContextVar[Optional[LLMCallCounter]] = ContextVar("llm_call_counter", default=None)
+
+
+@contextmanager
+def count_llm_calls():
+    '''
+        Count the Gemini calls made inside the block (e.g. per request)
+    '''
+    counter = LLMCallCounter()
+    token = _call_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _call_counter.reset(token)
+
+
+def usage_tokens(response) -> dict:
+    """Token counts Gemini reports for a response (empty if it reports none)"""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return {}
+    return {
+        "prompt_tokens": usage.prompt_token_count,
+        "output_tokens": usage.candidates_token_count,
+        "total_tokens": usage.total_token_count
+    }
+
+
+def _generate(prompt: str, **kwargs):
+    counter = _call_counter.get()
+    if counter is not None:
+        counter.count += 1
+    with span("gemini_call", engine="gemini"):
+        response = scheduler.generate(prompt, **kwargs)
+    # streamed responses only carry usage once consumed; callers add it
+    if not kwargs.get("stream"):
+        _count_tokens(usage_tokens(response))
+    return response
+
+
+def gemini_metrics() -> dict:
+    """Scheduler metrics for this process (see GeminiScheduler.metrics)"""
+    return {"configured": model is not None, **scheduler.metrics()}
+
+
+def _scheduler_samples():
+    """Scheduler metrics for GET /metrics"""
+    metrics = scheduler.metrics()
+    for name, documentation in (
+        ("calls", "Gemini calls (identical in-flight prompts count once)"),
+        ("attempts", "Gemini requests including retries"),
+        ("retries", "Gemini retries after 429, 5xx or timeouts"),
+        ("failed", "Gemini calls that failed after retries"),
+        ("timeouts", "Gemini requests that timed out"),
+        ("deduplicated", "Gemini calls answered by an identical in-flight call"),
+    ):
+        yield f"resume_gemini_{name}_total", "counter", documentation, (), {(): metrics[name]}
+    yield "resume_gemini_errors_total", "counter", "Gemini request errors by status", ("status",), \
+        {(status,): count for status, count in metrics["errors"].items()}
+    yield "resume_gemini_active", "gauge", "Gemini requests in flight", (), {(): metrics["active"]}
+    yield "resume_gemini_throttled_seconds_total", "counter", "Time spent waiting for the rate limit", (), \
+        {(): metrics["throttled_seconds"]}
+
+
+REGISTRY.add_collector(_scheduler_samples)
+
+
+def validate_extraction(data) -> dict:
+    '''
+        Check a decoded Gemini response against EXTRACTION_SCHEMA
+        Missing fields are filled with empty values, wrong types raise ValueError
+    '''
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+    result = {}
+    for field in STRING_FIELDS:
+        value = data.get(field) or ""
+        if not isinstance(value, str):
+            raise ValueError(f"Field '{field}' must be a string")
+        result[field] = value.strip()
+    for field in LIST_FIELDS:
+        value = data.get(field) or []
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"Field '{field}' must be a list of strings")
+        result[field] = [item.strip() for item in value if item.strip()]
+    return result
+
+
+def _count_tokens(usage: dict):
+    counter = _call_counter.get()
+    if counter is not None:
+        counter.prompt_tokens += usage.get("prompt_tokens") or 0
+        counter.output_tokens += usage.get("output_tokens") or 0
+
+
+def _extraction_prompt(texts: str):
+    """(prompt, token stats) for one document"""
+    # Page markers, repeated lines and whitespace runs are dropped and the
+    # text is trimmed to prompt_token_budget before it goes in the prompt
+    all_text, tokens = prepare_prompt_text(texts)
+    # One structured-output call: the schema replaces the old
+    # "read and store it" warm-up prompt and free-form answer
+    question = f"I want to extract information from {all_text} and return the information: {features} together with fullname, phone, skill, education"
+    tokens["prompt_tokens_estimated"] = estimate_tokens(question)
+    return question, tokens
+
+
+def _extraction_result(response_text: str, texts: str, tokens: dict) -> dict:
+    if response_text:
+        try:
+            extraction = validate_extraction(json.loads(response_text))
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too
+            return {
+                "error": "Invalid Gemini response",
+                "message": str(e),
+                "raw_response": response_text
+            }
+        return {
+            "status": "success",
+            "extraction": extraction,
+            "extracted_text_length": len(texts),
+            "tokens": tokens
+        }
+    return {
+        "error": "No response from Gemini",
+        "extracted_text": texts[:500] + "..." if len(texts) > 500 else texts
+    }
+
+
 def extract_feature_text(texts:str):
     if not model:
         # Return a fallback response when Gemini is not available
@@ -31,36 +223,99 @@ def extract_feature_text(texts:str):
             "message": "Please set GEMINI_API_KEY environment variable",
             "extracted_text": texts[:500] + "..." if len(texts) > 500 else texts
         }
-    
+
     try:
-        all_text = texts
-        # First, let the model read and understand the content
-        response = model.generate_content(f"Read the content of {all_text} and store it no need to respond")
-        
-        # Then extract specific features
-        question = f"I want to extract information from {all_text} and return the information: {features} format it as JSON with keys: context, abbreviation, profession, specialty, fullname, phone, skill, education"
-        response1 = model.generate_content(question)
+        question, tokens = _extraction_prompt(texts)
+        response = _generate(question, generation_config=GENERATION_CONFIG)
+        tokens.update(usage_tokens(response))
         # # Reccommend the CV content and suggest improvements
         # question = f"Based on the content of {all_text}, please suggest improvements to make the CV more appealing to recruiters."
         # response2 = model.generate_content(question)
+        return _extraction_result(response.text, texts, tokens)
 
-        response = response1# + "\n\nSuggestions for improvement:\n" + response2
-        
-        if response.text:
-            return {
-                "status": "success",
-                "gemini_response": response.text,
-                "extracted_text_length": len(texts)
-            }
-        else:
-            return {
-                "error": "No response from Gemini",
-                "extracted_text": texts[:500] + "..." if len(texts) > 500 else texts
-            }
-            
     except Exception as e:
         return {
-            "error": "Gemini API error", 
+            "error": "Gemini API error",
             "message": str(e),
             "extracted_text": texts[:500] + "..." if len(texts) > 500 else texts
-        }
\ No newline at end of file
+        }
+
+
+def extract_feature_text_stream(texts: str):
+    '''
+        Streaming form of extract_feature_text
+        Yields ("chunk", text) for each piece of Gemini output as it arrives,
+        then ("result", result) with the same result as extract_feature_text
+    '''
+    if not model:
+        yield "result", extract_feature_text(texts)
+        return
+    try:
+        question, tokens = _extraction_prompt(texts)
+        response = _generate(question, generation_config=GENERATION_CONFIG, stream=True)
+        parts = []
+        for chunk in response:
+            if chunk.text:
+                parts.append(chunk.text)
+                yield "chunk", chunk.text
+        usage = usage_tokens(response)
+        _count_tokens(usage)
+        tokens.update(usage)
+    except Exception as e:
+        yield "result", {
+            "error": "Gemini API error",
+            "message": str(e),
+            "extracted_text": texts[:500] + "..." if len(texts) > 500 else texts
+        }
+        return
+    yield "result", _extraction_result("".join(parts), texts, tokens)
+
+
+def extract_feature_texts(texts_list):
+    '''
+        Extract features for several documents with a single Gemini call
+        Returns one result per input, in the same format as extract_feature_text
+    '''
+    if len(texts_list) == 1:
+        return [extract_feature_text(texts_list[0])]
+    if not model:
+        return [extract_feature_text(texts) for texts in texts_list]
+
+    prepared = [prepare_prompt_text(texts) for texts in texts_list]
+    documents = "\n\n".join(
+        f"=== Document {index} ===\n{text}" for index, (text, _) in enumerate(prepared)
+    )
+    question = f"I want to extract information from each of the following documents and return, for every document, its document_index and the information: {features} together with fullname, phone, skill, education\n\n{documents}"
+    try:
+        response = _generate(question, generation_config=BATCH_GENERATION_CONFIG)
+        # usage is reported for the whole grouped call
+        call_tokens = {**usage_tokens(response), "shared_by": len(texts_list)}
+        items = json.loads(response.text)
+        if not isinstance(items, list):
+            raise ValueError("Expected a JSON array")
+    except Exception as e:
+        return [{
+            "error": "Gemini API error",
+            "message": str(e),
+            "extracted_text": texts[:500] + "..." if len(texts) > 500 else texts
+        } for texts in texts_list]
+
+    by_index = {item.get("document_index"): item for item in items if isinstance(item, dict)}
+    results = []
+    for index, texts in enumerate(texts_list):
+        try:
+            if index not in by_index:
+                raise ValueError("Document missing from the Gemini response")
+            results.append({
+                "status": "success",
+                "extraction": validate_extraction(by_index[index]),
+                "extracted_text_length": len(texts),
+                "tokens": {**prepared[index][1], "call": call_tokens}
+            })
+        except ValueError as e:
+            results.append({
+                "error": "Invalid Gemini response",
+                "message": str(e),
+                "extracted_text": texts[:500] + "..." if len(texts) > 500 else texts
+            })
+    return results
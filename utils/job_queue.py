@@ -0,0 +1,363 @@
+"""
+Persistent background job queue for long-running documents
+Jobs live in SQLite so they survive restarts; worker processes claim them,
+report per-page progress and store the result for GET /jobs/{id}
+"""
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobStore:
+    """
+    SQLite-backed job table shared by the API and every worker process
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = self._connect()
+        self._pid = os.getpid()
+        self._inherited = []
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, filename TEXT NOT NULL, file_path TEXT NOT NULL,"
+            " status TEXT NOT NULL, stage TEXT, pages_done INTEGER DEFAULT 0,"
+            " pages_total INTEGER, attempts INTEGER DEFAULT 0, result TEXT, error TEXT,"
+            " created REAL NOT NULL, started REAL, finished REAL, worker INTEGER)"
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "worker" not in columns:
+            # pid of the process running the job, added after the first release
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN worker INTEGER")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # autocommit mode; claims use explicit BEGIN IMMEDIATE transactions
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Each process uses its own connection (see SQLiteCache._conn): the
+        # store is created before preforked server workers are forked
+        if self._pid != os.getpid():
+            self._inherited.append(self._connection)
+            self._connection = self._connect()
+            self._pid = os.getpid()
+        return self._connection
+
+    def create(self, filename: str, file_path: str, job_id: Optional[str] = None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        self._conn.execute(
+            "INSERT INTO jobs (id, filename, file_path, status, created) VALUES (?, ?, ?, ?, ?)",
+            (job_id, filename, file_path, QUEUED, time.time()),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim(self, worker: Optional[int] = None) -> Optional[dict]:
+        """
+        Atomically move the oldest queued job to running, recording the
+        claiming process (its pid by default) so its jobs can be requeued
+        if it dies
+        """
+        worker = os.getpid() if worker is None else worker
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, attempts = attempts + 1, started = ?,"
+                    " worker = ? WHERE id = ?",
+                    (RUNNING, "starting", time.time(), worker, row["id"]),
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"]) if row is not None else None
+
+    def update_progress(self, job_id: str, stage: str, pages_done: Optional[int] = None,
+                        pages_total: Optional[int] = None):
+        self._conn.execute(
+            "UPDATE jobs SET stage = ?, pages_done = COALESCE(?, pages_done),"
+            " pages_total = COALESCE(?, pages_total) WHERE id = ?",
+            (stage, pages_done, pages_total, job_id),
+        )
+
+    def complete(self, job_id: str, result: dict):
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, stage = ?, result = ?, finished = ? WHERE id = ?",
+            (DONE, "done", json.dumps(result, ensure_ascii=False), time.time(), job_id),
+        )
+
+    def fail(self, job_id: str, error: str, retry: bool = False):
+        if retry:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ? WHERE id = ?",
+                (QUEUED, "retrying", error, job_id),
+            )
+        else:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ?, finished = ? WHERE id = ?",
+                (FAILED, "failed", error, time.time(), job_id),
+            )
+
+    def release_worker(self, worker: int, max_attempts: int) -> List[dict]:
+        """
+        Handle the jobs of a worker process that died mid-job: requeue them,
+        or fail them once they used all their attempts (a document that
+        crashes its worker every time). Returns the failed jobs
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            failed = [self._to_dict(row) for row in self._conn.execute(
+                "SELECT * FROM jobs WHERE status = ? AND worker = ? AND attempts >= ?",
+                (RUNNING, worker, max_attempts),
+            ).fetchall()]
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ?, finished = ?"
+                " WHERE status = ? AND worker = ? AND attempts >= ?",
+                (FAILED, "failed", "Worker process died", time.time(), RUNNING, worker, max_attempts),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ? WHERE status = ? AND worker = ?",
+                (QUEUED, "requeued", RUNNING, worker),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return failed
+
+    def requeue_running(self) -> int:
+        """Put jobs interrupted by a shutdown or crash back in the queue"""
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = ?, stage = ? WHERE status = ?", (QUEUED, "requeued", RUNNING)
+        )
+        return cursor.rowcount
+
+    def counts(self) -> dict:
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job = dict(row)
+        if job["result"]:
+            job["result"] = json.loads(job["result"])
+        return job
+
+
+def process_job(job: dict, store: JobStore, cache):
+    """Run extraction and AI extraction for one claimed job"""
+    # imported here so the API process never loads the extraction stack for jobs
+    from utils.document_formats import document_format
+    from utils.extract_text import extract_document
+    from utils.gemini_service import count_llm_calls
+    from utils.ner_engine import engine_cache_key, extract_feature
+    from utils.result_cache import content_hash, document_cache_key
+
+    job_id = job["id"]
+    t0 = time.time()
+    with open(job["file_path"], "rb") as f:
+        digest = content_hash(f.read())
+    cache_key = document_cache_key(digest, job["filename"])
+    cache_status = {"text": "miss", "ai": "miss"}
+    ocr_stats = None
+    extraction = None
+
+    def on_page(pages_done, pages_total):
+        store.update_progress(job_id, "ocr", pages_done, pages_total)
+
+    store.update_progress(job_id, "extracting")
+    cached_text = cache.get("text", cache_key)
+    if cached_text is not None:
+        cache_status["text"] = "hit"
+        resume_text = cached_text["text"]
+        processing_method = cached_text["processing_method"]
+    else:
+        extracted = extract_document(job["file_path"], progress=on_page)
+        processing_method = extracted["processing_method"]
+        ocr_stats = extracted["ocr"]
+        extraction = extracted["extraction"]
+        resume_text = extracted["text"].replace("\t", " \t")
+        if not resume_text.startswith("Error "):
+            cache.set("text", cache_key, {"text": resume_text, "processing_method": processing_method})
+    processing_time = time.time() - t0
+
+    store.update_progress(job_id, "ai_extraction")
+    llm_calls = None
+    ai_key = engine_cache_key(cache_key)
+    ai_result = cache.get("ai", ai_key)
+    if ai_result is not None:
+        cache_status["ai"] = "hit"
+    else:
+        with count_llm_calls() as llm_calls:
+            ai_result = extract_feature(resume_text)
+        if "error" not in ai_result:
+            cache.set("ai", ai_key, ai_result)
+
+    return {
+        "success": True,
+        "ai_extraction": ai_result,
+        "metadata": {
+            "filename": job["filename"],
+            "processing_method": processing_method,
+            "processing_time_seconds": round(processing_time, 2),
+            "text_length": len(resume_text),
+            "file_type": "pdf" if document_format(job["filename"]) == "pdf" else "document",
+            "content_hash": digest,
+            "cache": cache_status,
+            "llm_calls": llm_calls.count if llm_calls else 0,
+            "llm_tokens": llm_calls.tokens() if llm_calls else None,
+            "ocr": ocr_stats,
+            "extraction": extraction
+        }
+    }
+
+
+def remove_job_file(job: dict):
+    """Delete the uploaded file of a job that will not run again"""
+    try:
+        os.unlink(job["file_path"])
+    except OSError as e:
+        logger.warning(f"Could not delete job file {job['file_path']}: {e}")
+
+
+def run_worker(config: dict, worker_id: int, stop_event):
+    """Worker process loop: claim, process and record jobs until stopped"""
+    from utils.result_cache import build_cache
+
+    store = JobStore(config.get("job_db_path", "./data/jobs.sqlite3"))
+    cache = build_cache(config)
+    poll_seconds = config.get("job_poll_seconds", 1.0)
+    max_attempts = config.get("job_max_attempts", 3)
+    logger.info(f"Job worker {worker_id} started")
+    while not stop_event.is_set():
+        try:
+            job = store.claim()
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Job worker {worker_id} could not claim a job: {e}")
+            job = None
+        if job is None:
+            stop_event.wait(poll_seconds)
+            continue
+
+        logger.info(f"Job worker {worker_id} processing {job['id']} ({job['filename']})")
+        try:
+            result = process_job(job, store, cache)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            retry = job["attempts"] < max_attempts
+            store.fail(job["id"], str(e), retry=retry)
+            if not retry:
+                remove_job_file(job)
+            continue
+        store.complete(job["id"], result)
+        remove_job_file(job)
+    store.close()
+
+
+class JobWorkerPool:
+    """
+    Local pool of worker processes draining the persistent queue. A
+    supervisor thread restarts workers that die (e.g. killed by the OOM
+    killer) and requeues the job each one was running
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.size = config.get("job_workers", 2)
+        self.check_seconds = config.get("job_worker_check_seconds", 5.0)
+        self.max_attempts = config.get("job_max_attempts", 3)
+        self.restarts = 0
+        self._stop_event = None
+        self._processes: List[multiprocessing.Process] = []
+        self._supervisor: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._processes or self.size <= 0:
+            return
+        store = JobStore(self.config.get("job_db_path", "./data/jobs.sqlite3"))
+        requeued = store.requeue_running()
+        store.close()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted job(s)")
+        self._stop_event = multiprocessing.Event()
+        self._processes = [self._spawn(worker_id) for worker_id in range(self.size)]
+        self._supervisor = threading.Thread(target=self._supervise, name="job-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def _spawn(self, worker_id: int) -> multiprocessing.Process:
+        process = multiprocessing.Process(
+            target=run_worker, args=(self.config, worker_id, self._stop_event),
+            name=f"job-worker-{worker_id}", daemon=True,
+        )
+        process.start()
+        return process
+
+    def _supervise(self):
+        store = JobStore(self.config.get("job_db_path", "./data/jobs.sqlite3"))
+        while not self._stop_event.wait(self.check_seconds):
+            for worker_id, process in enumerate(self._processes):
+                if process.is_alive() or self._stop_event.is_set():
+                    continue
+                logger.warning(f"Job worker {worker_id} (pid {process.pid}) exited with code "
+                               f"{process.exitcode}, restarting")
+                try:
+                    for job in store.release_worker(process.pid, self.max_attempts):
+                        logger.error(f"Job {job['id']} failed: its worker died {job['attempts']} time(s)")
+                        remove_job_file(job)
+                except sqlite3.OperationalError as e:
+                    # retried on the next check, before the worker is replaced
+                    logger.warning(f"Could not requeue the jobs of job worker {worker_id}: {e}")
+                    continue
+                process.join()
+                self._processes[worker_id] = self._spawn(worker_id)
+                self.restarts += 1
+        store.close()
+
+    def stop(self, timeout: float = 10.0):
+        if not self._processes:
+            return
+        self._stop_event.set()
+        self._supervisor.join(timeout)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "alive": sum(process.is_alive() for process in self._processes),
+            "restarts": self.restarts,
+        }
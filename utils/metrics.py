@@ -0,0 +1,270 @@
+"""
+Prometheus metrics for the service
+A small in-process registry (counters and histograms with labels) rendered
+in the Prometheus text format by GET /metrics, so no client library is
+needed. Values are recorded per process: extraction processes report their
+stage timings back as spans and the API process records them here. With
+several preforked HTTP workers, each one shares snapshots of its values
+(see SharedMetrics) and /metrics reports their sum.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# seconds; pipeline stages range from sub-millisecond cleanup to minutes of OCR
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def values(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+
+def _histogram_samples(name: str, buckets: Tuple[float, ...], labelnames: Tuple[str, ...],
+                       values: Dict[Tuple[str, ...], list]) -> List[str]:
+    lines = []
+    for key, state in sorted(values.items()):
+        for bound, count in zip(buckets, state):
+            le = 'le="%s"' % _number(bound)
+            lines.append(f"{name}_bucket{_labels(labelnames, key, le)} {count}")
+        lines.append(f"{name}_sum{_labels(labelnames, key)} {_number(round(state[-2], 6))}")
+        lines.append(f"{name}_count{_labels(labelnames, key)} {state[-1]}")
+    return lines
+
+
+def _add_values(total: dict, values: dict):
+    """Add label tuple -> value (or histogram state) maps into total"""
+    for key, value in values.items():
+        if key not in total:
+            total[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            total[key] = [a + b for a, b in zip(total[key], value)]
+        else:
+            total[key] += value
+
+
+class SharedMetrics:
+    """
+    Metrics shared by preforked HTTP workers. Each worker writes a snapshot
+    of its values to <directory>/worker-<slot>.json every interval seconds
+    and whenever it is scraped; the scraped worker adds up every snapshot,
+    so /metrics describes the whole server whichever worker answers. A
+    worker replacing a dead or recycled one starts from its slot's last
+    snapshot, so counters don't go backwards (gauges start from zero)
+    """
+
+    def __init__(self, directory: str, slot: int, interval: float = 5.0):
+        self.directory = directory
+        self.slot = slot
+        self.interval = interval
+        self.path = os.path.join(directory, f"worker-{slot}.json")
+        os.makedirs(directory, exist_ok=True)
+        self._baseline = [family for family in self._read(self.path) if family[1] != "gauge"]
+
+    @staticmethod
+    def clear(directory: str):
+        """Drop the snapshots of a previous run (called by the master before forking)"""
+        for path in glob.glob(os.path.join(directory, "worker-*.json")):
+            os.remove(path)
+
+    @staticmethod
+    def _read(path: str) -> List[tuple]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                families = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return [(name, kind, documentation, tuple(labelnames), {tuple(key): value for key, value in values})
+                for name, kind, documentation, labelnames, values in families]
+
+    def _write(self, families: List[tuple]):
+        data = [(name, kind, documentation, labelnames, [(list(key), value) for key, value in values.items()])
+                for name, kind, documentation, labelnames, values in families]
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+    def publish(self, families: List[tuple]) -> List[tuple]:
+        """Write this worker's snapshot (values since the slot first started); returns it"""
+        families = _merge_families([families, self._baseline])
+        self._write(families)
+        return families
+
+    def aggregate(self, families: List[tuple]) -> List[tuple]:
+        """Publish this worker's values and add the latest snapshots of the other workers"""
+        snapshots = [self.publish(families)]
+        for path in sorted(glob.glob(os.path.join(self.directory, "worker-*.json"))):
+            if path != self.path:
+                snapshots.append(self._read(path))
+        return _merge_families(snapshots)
+
+    def run(self, collect: Callable[[], List[tuple]]):
+        """Publish snapshots periodically (daemon thread) so idle workers stay current"""
+        def loop():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.publish(collect())
+                except Exception as e:
+                    logger.warning(f"Could not write metrics snapshot {self.path}: {e}")
+        threading.Thread(target=loop, name="metrics-snapshot", daemon=True).start()
+
+
+def _merge_families(snapshots: Iterable[List[tuple]]) -> List[tuple]:
+    """Sum families with the same name across snapshots, keeping first-seen order"""
+    merged: Dict[str, tuple] = {}
+    for families in snapshots:
+        for name, kind, documentation, labelnames, values in families:
+            if name not in merged:
+                merged[name] = (name, kind, documentation, labelnames, {})
+            _add_values(merged[name][4], values)
+    return list(merged.values())
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[object] = []
+        # callables returning (name, kind, documentation, labelnames, {label tuple: value})
+        # for values that already live elsewhere (e.g. the Gemini scheduler)
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+        self._shared: Optional[SharedMetrics] = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[tuple]]):
+        self._collectors.append(collector)
+
+    def share(self, directory: str, slot: int, interval: float = 5.0):
+        """Report the sum over all preforked workers from now on (see SharedMetrics)"""
+        self._shared = SharedMetrics(directory, slot, interval)
+        self._shared.run(self.collect)
+
+    def collect(self) -> List[tuple]:
+        """(name, kind, documentation, labelnames, values) of every metric in this process"""
+        families = [(metric.name, metric.kind, metric.documentation, metric.labelnames, metric.values())
+                    for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def render(self) -> str:
+        families = self.collect()
+        if self._shared is not None:
+            families = self._shared.aggregate(families)
+        buckets = {metric.name: metric.buckets for metric in self._metrics if metric.kind == "histogram"}
+        lines = []
+        for name, kind, documentation, labelnames, values in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                lines.extend(_histogram_samples(name, buckets[name], labelnames, values))
+            else:
+                lines.extend(f"{name}{_labels(labelnames, key)} {_number(value)}"
+                             for key, value in sorted(values.items()))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "resume_stage_seconds", "Time spent in each pipeline stage",
+    ("stage", "engine", "file_type")))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "resume_request_seconds", "HTTP request latency", ("method", "route", "status")))
+DOCUMENTS = REGISTRY.register(Counter(
+    "resume_documents_total", "Documents processed", ("route", "file_type", "engine")))
+PDF_ROUTING = REGISTRY.register(Counter(
+    "resume_pdf_routing_total", "PDFs by page routing: text, ocr (every page) or mixed", ("method",)))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "resume_cache_lookups_total", "Result cache lookups", ("layer", "result")))
+GEMINI_TOKENS = REGISTRY.register(Counter(
+    "resume_gemini_tokens_total", "Gemini tokens reported for uploads", ("kind",)))
+ERRORS = REGISTRY.register(Counter(
+    "resume_errors_total", "Failures by pipeline stage", ("stage",)))
+
+
+def file_type(filename: Optional[str]) -> str:
+    """Low-cardinality file type label from a filename"""
+    extension = (filename or "").rsplit(".", 1)[-1].lower() if "." in (filename or "") else ""
+    return extension if extension in ("pdf", "docx", "doc", "txt", "rtf", "odt", "zip") else "other"
+
+
+def observe_spans(spans: Iterable[dict], file_type_label: str):
+    """Record exported request spans (see utils.tracing) in the stage histogram"""
+    for span in spans:
+        STAGE_SECONDS.observe(span["duration_ms"] / 1000, stage=span["name"],
+                              engine=span.get("engine", ""), file_type=file_type_label)
@@ -0,0 +1,407 @@
+"""
+Local token-classification (NER) extraction engine
+Runs the BERT model declared in configs/config.yaml (pretrain, model,
+tags_vals, max_len) on CPU, so common fields are extracted without a
+network call. torch/transformers (and onnxruntime for the ONNX backend)
+are optional and only imported when the model is first used.
+"""
+import importlib.util
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.tracing import span
+from utils.util import get_config
+
+logger = logging.getLogger(__name__)
+
+# Model load states, same vocabulary as the OCR engines
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+LOADED = "loaded"
+UNAVAILABLE = "unavailable"
+
+ENGINES = ("gemini", "local", "local_first")
+
+# tags_vals label -> extraction field (first entity for strings, all for lists)
+STRING_TAGS = {"name": "fullname", "phone": "phone", "job title": "profession"}
+LIST_TAGS = {"education": "education"}
+
+
+class NEREngine:
+    """
+    Batched BERT token classification with a sliding window over long texts
+    """
+
+    BACKENDS = ("torch", "onnx")
+
+    def __init__(self, pretrain: str, weights_path: str, tags_vals: List[str], max_len: int = 500,
+                 stride: int = 64, batch_size: int = 8, backend: str = "torch", quantize: bool = False,
+                 onnx_path: Optional[str] = None, vocab_path: Optional[str] = None,
+                 ignored_tags: Optional[List[str]] = None, threads: int = 0):
+        self.pretrain = pretrain
+        self.weights_path = weights_path
+        self.tags_vals = list(tags_vals)
+        # BERT positions are capped at 512 tokens
+        self.max_len = min(max_len, 512)
+        self.stride = max(0, min(stride, self.max_len // 2))
+        self.batch_size = max(1, batch_size)
+        if backend not in self.BACKENDS:
+            logger.warning(f"Unknown NER backend '{backend}', using torch")
+            backend = "torch"
+        self.backend = backend
+        self.quantize = quantize
+        self.onnx_path = onnx_path or os.path.splitext(weights_path)[0] + ".onnx"
+        self.vocab_path = vocab_path
+        self.ignored_tags = set(ignored_tags or ["UNKNOWN", "O"])
+        self.threads = threads
+        self.tokenizer = None
+        self._model = None
+        self._session = None
+        self._lock = threading.Lock()
+        self._state = NOT_LOADED if self._probe() else UNAVAILABLE
+
+    @classmethod
+    def from_config(cls, config: dict) -> "NEREngine":
+        return cls(
+            pretrain=config.get("pretrain", "bert-base-multilingual-uncased"),
+            weights_path=config.get("model", "./weights/model-state.bin"),
+            tags_vals=config.get("tags_vals", []),
+            max_len=config.get("max_len", 500),
+            stride=config.get("ner_stride", 64),
+            batch_size=config.get("ner_batch_size", 8),
+            backend=config.get("ner_backend", "torch"),
+            quantize=config.get("ner_quantize", False),
+            onnx_path=config.get("ner_onnx_path"),
+            vocab_path=config.get("vocab"),
+            ignored_tags=config.get("resticted_lables"),
+            threads=config.get("ner_threads", 0),
+        )
+
+    def _probe(self) -> bool:
+        """Check packages and weights without importing torch"""
+        modules = ["torch", "transformers"]
+        if self.backend == "onnx":
+            modules.append("onnxruntime")
+        missing = [name for name in modules if importlib.util.find_spec(name) is None]
+        if missing:
+            logger.info(f"Local NER engine disabled: {', '.join(missing)} not installed")
+            return False
+        if not os.path.exists(self.weights_path) and not (self.backend == "onnx" and os.path.exists(self.onnx_path)):
+            logger.info(f"Local NER engine disabled: no weights at {self.weights_path}")
+            return False
+        return True
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def available(self) -> bool:
+        return self._load()
+
+    def _load(self) -> bool:
+        """Load tokenizer and model once; returns whether the engine is usable"""
+        if self._state in (LOADED, UNAVAILABLE):
+            return self._state == LOADED
+        with self._lock:
+            if self._state == NOT_LOADED:
+                self._state = LOADING
+                try:
+                    t0 = time.time()
+                    self.tokenizer = self._load_tokenizer()
+                    if self.backend == "onnx":
+                        self._session = self._load_onnx()
+                    else:
+                        self._model = self._load_torch()
+                    logger.info(f"✅ Local NER engine loaded ({self.backend}"
+                                f"{', int8' if self.quantize else ''}) in {time.time() - t0:.1f}s")
+                    self._state = LOADED
+                except Exception as e:
+                    logger.warning(f"⚠️ Local NER engine not available: {e}")
+                    self._state = UNAVAILABLE
+        return self._state == LOADED
+
+    def warm_up(self, background: bool = True):
+        if background:
+            threading.Thread(target=self._load, name="ner-warmup", daemon=True).start()
+        else:
+            self._load()
+
+    def _load_tokenizer(self):
+        from transformers import AutoTokenizer, BertTokenizerFast
+
+        # Offsets and overflowing windows need a fast tokenizer
+        if self.vocab_path and os.path.exists(self.vocab_path):
+            return BertTokenizerFast(vocab_file=self.vocab_path, do_lower_case="uncased" in self.pretrain)
+        return AutoTokenizer.from_pretrained(self.pretrain, use_fast=True)
+
+    def _build_torch_model(self):
+        import torch
+        from transformers import BertForTokenClassification
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        model = BertForTokenClassification.from_pretrained(self.pretrain, num_labels=len(self.tags_vals))
+        state = torch.load(self.weights_path, map_location="cpu")
+        model.load_state_dict(state.get("state_dict", state) if isinstance(state, dict) else state)
+        model.eval()
+        return model
+
+    def _load_torch(self):
+        import torch
+
+        model = self._build_torch_model()
+        if self.quantize:
+            # int8 weights for every Linear layer; activations stay float
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def _load_onnx(self):
+        import onnxruntime
+
+        path = self.onnx_path
+        if not os.path.exists(path):
+            self._export_onnx(path)
+        if self.quantize:
+            quantized = os.path.splitext(path)[0] + ".int8.onnx"
+            if not os.path.exists(quantized):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantize_dynamic(path, quantized, weight_type=QuantType.QInt8)
+            path = quantized
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def _export_onnx(self, path: str):
+        import torch
+
+        model = self._build_torch_model()
+        dummy = self.tokenizer(["export"], return_tensors="pt")
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ("input_ids", "attention_mask", "logits")}
+        torch.onnx.export(
+            model, (dummy["input_ids"], dummy["attention_mask"]), path,
+            input_names=["input_ids", "attention_mask"], output_names=["logits"],
+            dynamic_axes=dynamic_axes, opset_version=14,
+        )
+        logger.info(f"Exported NER model to {path}")
+
+    def _logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self._session is not None:
+            return self._session.run(["logits"], {
+                "input_ids": input_ids.astype(np.int64),
+                "attention_mask": attention_mask.astype(np.int64),
+            })[0]
+        import torch
+
+        with torch.inference_mode():
+            return self._model(
+                input_ids=torch.from_numpy(input_ids.astype(np.int64)),
+                attention_mask=torch.from_numpy(attention_mask.astype(np.int64)),
+            ).logits.numpy()
+
+    def predict(self, texts: List[str]) -> List[Dict[str, List[str]]]:
+        """
+        Entities per text as {tag: [entity text, ...]}
+        Every text is split into max_len windows overlapping by `stride`
+        tokens, and windows from all texts are run together in batches
+        """
+        if not self._load():
+            raise RuntimeError("Local NER engine is not available")
+        encoding = self.tokenizer(
+            texts, truncation=True, max_length=self.max_len, stride=self.stride,
+            return_overflowing_tokens=True, return_offsets_mapping=True,
+            padding="max_length", return_tensors="np",
+        )
+        input_ids = encoding["input_ids"]
+        attention_mask = encoding["attention_mask"]
+        labels = np.empty(input_ids.shape, dtype=np.int64)
+        for start in range(0, len(input_ids), self.batch_size):
+            end = start + self.batch_size
+            labels[start:end] = self._logits(input_ids[start:end], attention_mask[start:end]).argmax(-1)
+        return decode_windows(
+            texts, labels, encoding["offset_mapping"], attention_mask,
+            encoding["overflow_to_sample_mapping"], self.tags_vals, self.ignored_tags,
+        )
+
+    def status(self) -> dict:
+        return {"state": self._state, "backend": self.backend, "quantize": self.quantize}
+
+
+def decode_windows(texts, labels, offsets, attention_mask, sample_mapping, tags_vals, ignored_tags):
+    """
+    Merge per-window token labels back into entities for each text
+    A token seen by two overlapping windows takes the label from the window
+    where it sits furthest from the edge, i.e. with the most context
+    """
+    best = [{} for _ in texts]   # per text: (char start, char end) -> (context, label)
+    for window, sample in enumerate(sample_mapping):
+        mask = attention_mask[window].astype(bool)
+        spans = offsets[window][mask]
+        window_labels = labels[window][mask]
+        count = len(spans)
+        for position in range(count):
+            start, end = int(spans[position][0]), int(spans[position][1])
+            if start == end:
+                continue    # [CLS], [SEP] and padding
+            context = min(position, count - 1 - position)
+            key = (start, end)
+            current = best[sample].get(key)
+            if current is None or context > current[0]:
+                best[sample][key] = (context, int(window_labels[position]))
+
+    results = []
+    for text, tokens in zip(texts, best):
+        entities: Dict[str, List[str]] = {}
+        span_tag, span_start, span_end = None, 0, 0
+        for (start, end), (_, label) in sorted(tokens.items()):
+            tag = tags_vals[label] if label < len(tags_vals) else "UNKNOWN"
+            # word pieces and words separated only by spaces extend the entity
+            if tag == span_tag and not text[span_end:start].strip():
+                span_end = end
+                continue
+            if span_tag is not None and span_tag not in ignored_tags:
+                entities.setdefault(span_tag, []).append(text[span_start:span_end])
+            span_tag, span_start, span_end = tag, start, end
+        if span_tag is not None and span_tag not in ignored_tags:
+            entities.setdefault(span_tag, []).append(text[span_start:span_end])
+        results.append(entities)
+    return results
+
+
+def entities_to_extraction(entities: Dict[str, List[str]]) -> dict:
+    """Map NER tags onto the Gemini extraction schema"""
+    from utils.gemini_service import LIST_FIELDS, STRING_FIELDS
+
+    extraction = {field: "" for field in STRING_FIELDS}
+    extraction.update({field: [] for field in LIST_FIELDS})
+    for tag, field in STRING_TAGS.items():
+        values = entities.get(tag)
+        if values:
+            extraction[field] = values[0].strip()
+    for tag, field in LIST_TAGS.items():
+        seen = []
+        for value in entities.get(tag, []):
+            value = value.strip()
+            if value and value not in seen:
+                seen.append(value)
+        extraction[field] = seen
+    return extraction
+
+
+_ner_engine = None
+_ner_engine_lock = threading.Lock()
+
+
+def get_ner_engine() -> NEREngine:
+    """Process-wide engine built from the service configuration"""
+    global _ner_engine
+    if _ner_engine is None:
+        with _ner_engine_lock:
+            if _ner_engine is None:
+                _ner_engine = NEREngine.from_config(get_config())
+    return _ner_engine
+
+
+def extract_local_texts(texts_list: List[str]) -> List[dict]:
+    """Local counterpart of extract_feature_texts (one batched model run)"""
+    try:
+        with span("ner_inference", engine="local"):
+            entities = get_ner_engine().predict(texts_list)
+    except Exception as e:
+        return [{
+            "error": "Local NER error",
+            "message": str(e),
+            "extracted_text": texts[:500] + "..." if len(texts) > 500 else texts
+        } for texts in texts_list]
+    return [{
+        "status": "success",
+        "extraction": entities_to_extraction(found),
+        "entities": found,
+        "extracted_text_length": len(texts)
+    } for texts, found in zip(texts_list, entities)]
+
+
+def _is_complete(result: dict, required_fields: List[str]) -> bool:
+    return "error" not in result and all(result["extraction"].get(field) for field in required_fields)
+
+
+def extract_features(texts_list: List[str], engine: Optional[str] = None) -> List[dict]:
+    """
+    Run the configured extraction engine over several documents
+    gemini:      Gemini only (grouped call)
+    local:       local NER only
+    local_first: local NER, then Gemini for documents where it is unavailable,
+                 failed or missed any of local_required_fields
+    Each result records the engine that produced it and is merged with the
+    rule-based fields (see utils.rule_extractor)
+    """
+    from utils.gemini_service import extract_feature_texts
+    from utils.rule_extractor import get_rule_extractor, merge_rules
+
+    config = get_config()
+    engine = engine or config.get("extraction_engine", "gemini")
+    if engine not in ENGINES:
+        logger.warning(f"Unknown extraction engine '{engine}', using gemini")
+        engine = "gemini"
+
+    results = [None] * len(texts_list)
+    pending = list(range(len(texts_list)))
+    if engine != "gemini" and texts_list:
+        t0 = time.time()
+        local_results = extract_local_texts(texts_list)
+        seconds = round(time.time() - t0, 4)
+        required = config.get("local_required_fields", ["fullname", "phone"])
+        pending = []
+        for index, result in enumerate(local_results):
+            result["engine"] = "local"
+            result["engine_seconds"] = seconds
+            if engine == "local" or _is_complete(result, required):
+                results[index] = result
+            else:
+                pending.append(index)
+
+    if pending:
+        gemini_results = extract_feature_texts([texts_list[index] for index in pending])
+        for index, result in zip(pending, gemini_results):
+            result["engine"] = "gemini"
+            results[index] = result
+
+    rules = get_rule_extractor()
+    return [merge_rules(result, rules.extract(texts)) for texts, result in zip(texts_list, results)]
+
+
+def extract_feature(texts: str, engine: Optional[str] = None) -> dict:
+    """Single-document form of extract_features (used by /upload and jobs)"""
+    return extract_features([texts], engine)[0]
+
+
+def engine_cache_key(cache_key: str, engine: Optional[str] = None) -> str:
+    """AI results depend on the engine; Gemini keeps the plain document key"""
+    engine = engine or get_config().get("extraction_engine", "gemini")
+    return cache_key if engine == "gemini" else f"{cache_key}:{engine}"
+
+
+def extract_feature_stream(texts: str, engine: Optional[str] = None):
+    """
+    Streaming form of extract_feature: yields ("chunk", text) while Gemini
+    generates its answer, then ("result", result). Other engines have
+    nothing to stream and only yield the result
+    """
+    from utils.gemini_service import extract_feature_text_stream
+    from utils.rule_extractor import get_rule_extractor, merge_rules
+
+    engine = engine or get_config().get("extraction_engine", "gemini")
+    if engine != "gemini":
+        yield "result", extract_feature(texts, engine)
+        return
+    for kind, data in extract_feature_text_stream(texts):
+        if kind == "result":
+            data["engine"] = "gemini"
+            data = merge_rules(data, get_rule_extractor().extract(texts))
+        yield kind, data
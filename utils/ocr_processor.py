@@ -7,199 +7,405 @@ import numpy as np
 from PIL import Image
 import io
 import logging
-from typing import List, Tuple, Optional
-from pdf2image import convert_from_path
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Sequence
 import os
+from utils.pdf_document import open_analysis
+from utils.tracing import span
+from utils.util import get_config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# OCR engine load states reported by /ocr-status
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+LOADED = "loaded"
+UNAVAILABLE = "unavailable"
+
 class OCRProcessor:
     """
     Multi-engine OCR processor for extracting text from images and image-based PDFs
     """
     
-    def __init__(self):
-        self.tesseract_available = False
-        self.easyocr_available = False
-        self._initialize_ocr_engines()
+    STRATEGIES = ("fast_first", "tesseract", "easyocr", "both")
+    ENGINES = ("tesseract", "easyocr")
+    
+    def __init__(self, workers: int = 2, max_pages_in_memory: int = 4, dpi: int = 300,
+                 strategy: str = "fast_first", min_confidence: float = 60.0, min_chars: int = 50,
+                 preprocess: Optional[dict] = None, page_min_chars: int = 50,
+                 page_image_coverage: float = 0.5, page_min_density: float = 5.0):
+        # Pages are OCRed by `workers` threads; at most `max_pages_in_memory`
+        # rendered bitmaps exist at any time, whatever the page count
+        self.workers = max(1, workers)
+        self.max_pages_in_memory = max(self.workers, max_pages_in_memory)
+        self.dpi = dpi
+        if strategy not in self.STRATEGIES:
+            logger.warning(f"Unknown OCR strategy '{strategy}', using fast_first")
+            strategy = "fast_first"
+        self.strategy = strategy
+        # fast_first escalates to EasyOCR below these Tesseract thresholds
+        self.min_confidence = min_confidence
+        self.min_chars = min_chars
+        # Per-page routing thresholds (see page_needs_ocr)
+        self.page_min_chars = page_min_chars
+        self.page_image_coverage = page_image_coverage
+        self.page_min_density = page_min_density
+        # Preprocessing pipeline shared by all engines (see preprocess_image)
+        self.preprocess = {"denoise": "nlmeans", "threshold": "adaptive", "max_width": 0}
+        self.preprocess.update(preprocess or {})
+        # Engines are loaded on first use (or by warm_up); until then only a
+        # cheap installation probe is done, so importing this module is fast
+        self.easyocr_reader = None
+        self._engine_state = {}
+        self._load_locks = {engine: threading.Lock() for engine in self.ENGINES}
+        self._probe_ocr_engines()
     
-    def _initialize_ocr_engines(self):
-        """Initialize available OCR engines"""
+    def _probe_ocr_engines(self):
+        """Check which engines are installed without loading any model"""
+        import importlib.util
+        import shutil
         
-        # Try to initialize Tesseract
-        try:
+        tesseract_installed = False
+        if importlib.util.find_spec("pytesseract") is not None:
             import pytesseract
-            # Try to run tesseract to check if it's installed
-            pytesseract.get_tesseract_version()
-            self.tesseract_available = True
-            logger.info("✅ Tesseract OCR initialized successfully")
-        except Exception as e:
-            logger.warning(f"⚠️ Tesseract not available: {e}")
+            tesseract_installed = shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+        self._engine_state["tesseract"] = NOT_LOADED if tesseract_installed else UNAVAILABLE
+        if not tesseract_installed:
+            logger.warning("⚠️ Tesseract not available")
             logger.info("💡 Install Tesseract: https://github.com/tesseract-ocr/tesseract")
         
-        # Try to initialize EasyOCR
-        try:
-            import easyocr
-            self.easyocr_reader = easyocr.Reader(['en', 'vi'])  # English and Vietnamese
-            self.easyocr_available = True
-            logger.info("✅ EasyOCR initialized successfully")
-        except Exception as e:
-            logger.warning(f"⚠️ EasyOCR not available: {e}")
+        easyocr_installed = importlib.util.find_spec("easyocr") is not None
+        self._engine_state["easyocr"] = NOT_LOADED if easyocr_installed else UNAVAILABLE
+        if not easyocr_installed:
+            logger.warning("⚠️ EasyOCR not available")
+    
+    def _load_engine(self, engine: str) -> bool:
+        """Initialize an OCR engine once; returns whether it is usable"""
+        if self._engine_state[engine] in (LOADED, UNAVAILABLE):
+            return self._engine_state[engine] == LOADED
+        
+        with self._load_locks[engine]:
+            if self._engine_state[engine] == NOT_LOADED:
+                self._engine_state[engine] = LOADING
+                try:
+                    if engine == "tesseract":
+                        import pytesseract
+                        # Try to run tesseract to check if it's installed
+                        pytesseract.get_tesseract_version()
+                        logger.info("✅ Tesseract OCR initialized successfully")
+                    else:
+                        import easyocr
+                        self.easyocr_reader = easyocr.Reader(['en', 'vi'])  # English and Vietnamese
+                        logger.info("✅ EasyOCR initialized successfully")
+                    self._engine_state[engine] = LOADED
+                except Exception as e:
+                    logger.warning(f"⚠️ {engine} not available: {e}")
+                    self._engine_state[engine] = UNAVAILABLE
+        return self._engine_state[engine] == LOADED
     
-    def is_pdf_image_based(self, pdf_path: str, sample_pages: int = 2) -> bool:
+    def is_installed(self, engine: str) -> bool:
+        """Whether an engine can be used, without loading it"""
+        return self._engine_state[engine] != UNAVAILABLE
+    
+    @property
+    def tesseract_available(self) -> bool:
+        return self._load_engine("tesseract")
+    
+    @property
+    def easyocr_available(self) -> bool:
+        return self._load_engine("easyocr")
+    
+    def warm_up(self, background: bool = True, engines: Optional[Sequence[str]] = None):
+        """Load every installed engine (or only the given ones) now instead of on first use"""
+        def load_all():
+            for engine in engines or self.ENGINES:
+                self._load_engine(engine)
+        
+        if background:
+            threading.Thread(target=load_all, name="ocr-warmup", daemon=True).start()
+        else:
+            load_all()
+    
+    def page_needs_ocr(self, pdf, index: int) -> bool:
+        """
+        Whether one page of a PDFAnalysis has to be OCRed: its text layer has
+        at most page_min_chars characters, or images cover page_image_coverage
+        of it while its text density stays below page_min_density characters
+        per square inch (a scan with a caption, not a typed page with a photo)
+        Blank pages have nothing to OCR
         """
-        Detect if a PDF is primarily image-based by checking text extractability
+        chars = pdf.page_char_count(index)
+        if chars <= self.page_min_chars:
+            return not pdf.page_is_blank(index)
+        if pdf.page_image_coverage(index) < self.page_image_coverage:
+            return False
+        # 72 x 72 points per square inch
+        square_inches = pdf.page_area(index) / 5184
+        return square_inches > 0 and chars / square_inches < self.page_min_density
+
+    def classify_pages(self, pdf_source, max_pages: Optional[int] = None) -> List[bool]:
+        """
+        Per-page routing: True for each page whose text must come from OCR
+        Accepts either a file path or a shared PDFAnalysis; max_pages limits
+        the check to the first pages
         """
         try:
-            import pdfplumber
-            
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                pages_to_check = min(sample_pages, total_pages)
-                
-                text_found = 0
-                for i in range(pages_to_check):
-                    page = pdf.pages[i]
-                    text = page.extract_text()
-                    if text and len(text.strip()) > 50:  # Meaningful text threshold
-                        text_found += 1
-                
-                # If less than 50% of sampled pages have meaningful text, consider it image-based
-                is_image_based = (text_found / pages_to_check) < 0.5
-                
-                logger.info(f"PDF Analysis: {text_found}/{pages_to_check} pages have extractable text")
-                logger.info(f"PDF Type: {'Image-based' if is_image_based else 'Text-based'}")
-                
-                return is_image_based
-                
+            with open_analysis(pdf_source) as pdf:
+                needs_ocr = []
+                for index in range(min(pdf.page_count, max_pages or pdf.page_count)):
+                    try:
+                        needs_ocr.append(self.page_needs_ocr(pdf, index))
+                    except Exception as e:
+                        logger.warning(f"Could not analyze page {index + 1}: {e}")
+                        needs_ocr.append(True)
         except Exception as e:
             logger.warning(f"Could not analyze PDF type: {e}")
-            return True  # Default to image-based processing
+            return [True]  # Default to image-based processing
+        
+        logger.info(f"PDF Analysis: {needs_ocr.count(False)}/{len(needs_ocr)} pages have extractable text")
+        return needs_ocr
+    
+    def is_pdf_image_based(self, pdf_source, sample_pages: int = 2) -> bool:
+        """
+        Detect if a PDF is primarily image-based: fewer than half of its first
+        sample_pages pages have a usable text layer
+        Accepts either a file path or a shared PDFAnalysis. Routing itself is
+        per page (classify_pages); this whole-document answer is kept for callers
+        """
+        needs_ocr = self.classify_pages(pdf_source, sample_pages)
+        return not needs_ocr or needs_ocr.count(False) * 2 < len(needs_ocr)
     
-    def preprocess_image(self, image: np.ndarray) -> np.ndarray:
+    def preprocess_image(self, image: np.ndarray, timings: Optional[dict] = None) -> np.ndarray:
         """
         Preprocess image for better OCR results
+        Stages are configured by self.preprocess; if timings is given, the
+        seconds spent in each stage are recorded in it
         """
+        def timed(stage, func, *args):
+            t0 = time.perf_counter()
+            result = func(*args)
+            if timings is not None:
+                timings[stage] = round(time.perf_counter() - t0, 4)
+            return result
+        
         # Convert to grayscale if needed
         if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            gray = timed("grayscale", cv2.cvtColor, image, cv2.COLOR_BGR2GRAY)
         else:
             gray = image
         
-        # Apply denoising
-        denoised = cv2.fastNlMeansDenoising(gray)
+        # Downscale very large renders before the expensive denoising step
+        max_width = self.preprocess["max_width"]
+        if max_width and gray.shape[1] > max_width:
+            height = int(gray.shape[0] * max_width / gray.shape[1])
+            gray = timed("downscale", cv2.resize, gray, (max_width, height), None, 0, 0, cv2.INTER_AREA)
         
-        # Apply adaptive thresholding for better contrast
-        thresh = cv2.adaptiveThreshold(
-            denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-        )
+        # Apply denoising (non-local means is best but slowest; clean renders can skip it)
+        denoise = self.preprocess["denoise"]
+        if denoise == "nlmeans":
+            gray = timed("denoise", cv2.fastNlMeansDenoising, gray)
+        elif denoise == "median":
+            gray = timed("denoise", cv2.medianBlur, gray, 3)
         
-        # Optional: Apply morphological operations to clean up
-        kernel = np.ones((1, 1), np.uint8)
-        cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+        # Apply adaptive thresholding for better contrast
+        # (the former 1x1 morphological close was a no-op and has been dropped)
+        if self.preprocess["threshold"] == "adaptive":
+            gray = timed("threshold", cv2.adaptiveThreshold,
+                         gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
         
-        return cleaned
+        return gray
     
     def extract_text_tesseract(self, image: np.ndarray) -> str:
         """Extract text using Tesseract OCR"""
+        return self.ocr_tesseract(image)[0]
+    
+    def ocr_tesseract(self, image: np.ndarray, preprocessed: bool = False) -> Tuple[str, Optional[float]]:
+        """
+        Extract text and mean word confidence (0-100) using Tesseract OCR
+        Pass preprocessed=True when the image already went through preprocess_image
+        """
         if not self.tesseract_available:
-            return ""
+            return "", None
         
         try:
             import pytesseract
             
             # Preprocess image
-            processed_image = self.preprocess_image(image)
+            processed_image = image if preprocessed else self.preprocess_image(image)
             
             # Configure Tesseract for better accuracy
             custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyzÀÁÂÃÈÉÊÌÍÒÓÔÕÙÚĂĐĨŨƠàáâãèéêìíòóôõùúăđĩũơƯĂẠẢẤẦẨẪẬẮẰẲẴẶẸẺẼỀỀỂưăạảấầẩẫậắằẳẵặẹẻẽềềểỄỆỈỊỌỎỐỒỔỖỘỚỜỞỠỢỤỦỨỪễệỉịọỏốồổỗộớờởỡợụủứừỬỮỰỲỴÝỶỸửữựỳỵýỷỹ '
             
-            # Extract text
-            text = pytesseract.image_to_string(processed_image, config=custom_config, lang='eng+vie')
+            # One pass gives both the words and their confidences
+            data = pytesseract.image_to_data(processed_image, config=custom_config, lang='eng+vie',
+                                             output_type=pytesseract.Output.DICT)
             
-            return text.strip()
+            lines = {}
+            confidences = []
+            for i, word in enumerate(data["text"]):
+                word = word.strip()
+                if not word:
+                    continue
+                key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+                lines.setdefault(key, []).append(word)
+                confidence = float(data["conf"][i])
+                if confidence >= 0:
+                    confidences.append(confidence)
+            
+            text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+            confidence = sum(confidences) / len(confidences) if confidences else 0.0
+            return text.strip(), confidence
             
         except Exception as e:
             logger.error(f"Tesseract OCR error: {e}")
-            return ""
+            return "", None
     
     def extract_text_easyocr(self, image: np.ndarray) -> str:
         """Extract text using EasyOCR"""
+        return self.ocr_easyocr(image)[0]
+    
+    def ocr_easyocr(self, image: np.ndarray, preprocessed: bool = False) -> Tuple[str, Optional[float]]:
+        """
+        Extract text and mean confidence (0-100) using EasyOCR
+        Pass preprocessed=True when the image already went through preprocess_image
+        """
         if not self.easyocr_available:
-            return ""
+            return "", None
         
         try:
             # Preprocess image
-            processed_image = self.preprocess_image(image)
+            processed_image = image if preprocessed else self.preprocess_image(image)
             
             # Extract text with EasyOCR
             results = self.easyocr_reader.readtext(processed_image)
             
             # Combine all detected text
             text_parts = []
+            confidences = []
             for (bbox, text, confidence) in results:
                 if confidence > 0.5:  # Filter low confidence results
                     text_parts.append(text)
+                    confidences.append(confidence * 100)
             
-            return ' '.join(text_parts)
+            confidence = sum(confidences) / len(confidences) if confidences else 0.0
+            return ' '.join(text_parts), confidence
             
         except Exception as e:
             logger.error(f"EasyOCR error: {e}")
-            return ""
+            return "", None
     
-    def extract_text_from_image(self, image_input) -> str:
+    def _run_engine(self, engine: str, image: np.ndarray, stats: dict) -> str:
         """
-        Extract text from image using multiple OCR engines for best results
-        Accepts either numpy array or file path
+        Run one engine on an already preprocessed image and record its
+        timing, confidence and output size
         """
-        # Handle different input types
-        if isinstance(image_input, str):
-            # It's a file path
-            try:
-                from PIL import Image
-                pil_image = Image.open(image_input)
-                image = np.array(pil_image)
-            except Exception as e:
-                logger.error(f"Failed to load image from path {image_input}: {e}")
-                return ""
-        elif isinstance(image_input, np.ndarray):
-            # It's already a numpy array
-            image = image_input
-        else:
-            logger.error(f"Unsupported image input type: {type(image_input)}")
-            return ""
+        t0 = time.perf_counter()
+        with span("ocr_engine", engine=engine):
+            if engine == "tesseract":
+                text, confidence = self.ocr_tesseract(image, preprocessed=True)
+            else:
+                text, confidence = self.ocr_easyocr(image, preprocessed=True)
+        stats["engines"][engine] = {
+            "seconds": round(time.perf_counter() - t0, 3),
+            "confidence": round(confidence, 1) if confidence is not None else None,
+            "chars": len(text)
+        }
+        return text
+    
+    def ocr_image(self, image: np.ndarray) -> Tuple[str, dict]:
+        """
+        OCR one image with the configured strategy
+        Returns the selected text and per-engine stats for this image
         
+        Strategies:
+        - fast_first: Tesseract, escalating to EasyOCR only when its confidence
+          or character count is below the thresholds
+        - tesseract / easyocr: a single engine
+        - both: run both engines and prefer EasyOCR (previous behaviour)
+        """
+        stats = {"strategy": self.strategy, "engines": {}, "selected": None, "preprocess": {}}
         texts = []
         
-        # Try Tesseract
-        if self.tesseract_available:
-            tesseract_text = self.extract_text_tesseract(image)
+        # Preprocess once; every engine reads the same processed page
+        tesseract_installed = self.is_installed("tesseract")
+        easyocr_installed = self.is_installed("easyocr")
+        if tesseract_installed or easyocr_installed:
+            with span("ocr_preprocess"):
+                image = self.preprocess_image(image, stats["preprocess"])
+        
+        # A single-engine strategy falls back to the other engine when its own is missing
+        # (engines are loaded lazily by _run_engine, so EasyOCR is only loaded
+        # in fast_first mode once a page actually escalates)
+        if self.strategy == "easyocr":
+            run_easyocr = easyocr_installed
+            run_tesseract = tesseract_installed and not run_easyocr
+        else:
+            run_tesseract = tesseract_installed
+            if self.strategy == "both":
+                run_easyocr = easyocr_installed
+            else:
+                run_easyocr = easyocr_installed and not run_tesseract
+        
+        if run_tesseract:
+            tesseract_text = self._run_engine("tesseract", image, stats)
             if tesseract_text:
                 texts.append(("Tesseract", tesseract_text))
+            if self.strategy == "fast_first" and self.is_installed("easyocr"):
+                confidence = stats["engines"]["tesseract"]["confidence"] or 0.0
+                good_enough = confidence >= self.min_confidence and len(tesseract_text) >= self.min_chars
+                run_easyocr = not good_enough
+                stats["escalated"] = run_easyocr
         
-        # Try EasyOCR
-        if self.easyocr_available:
-            easyocr_text = self.extract_text_easyocr(image)
+        if run_easyocr:
+            easyocr_text = self._run_engine("easyocr", image, stats)
             if easyocr_text:
                 texts.append(("EasyOCR", easyocr_text))
         
         if not texts:
             logger.warning("No OCR engines available or successful")
-            return ""
+            return "", stats
         
-        # For now, prefer EasyOCR if available, otherwise use Tesseract
-        # In the future, we could implement text comparison and selection logic
+        # Prefer EasyOCR if it produced a meaningful result
         for engine, text in texts:
             if engine == "EasyOCR" and len(text) > 50:
                 logger.info(f"Using EasyOCR result ({len(text)} chars)")
-                return text
+                stats["selected"] = "easyocr"
+                return text, stats
         
         # Fallback to longest result
         best_text = max(texts, key=lambda x: len(x[1]))
         logger.info(f"Using {best_text[0]} result ({len(best_text[1])} chars)")
-        return best_text[1]
+        stats["selected"] = best_text[0].lower()
+        return best_text[1], stats
+    
+    def extract_text_from_image(self, image_input) -> str:
+        """
+        Extract text from image using the configured OCR strategy
+        Accepts either numpy array or file path
+        """
+        # Handle different input types
+        if isinstance(image_input, str):
+            # It's a file path
+            try:
+                from PIL import Image
+                pil_image = Image.open(image_input)
+                image = np.array(pil_image)
+            except Exception as e:
+                logger.error(f"Failed to load image from path {image_input}: {e}")
+                return ""
+        elif isinstance(image_input, np.ndarray):
+            # It's already a numpy array
+            image = image_input
+        else:
+            logger.error(f"Unsupported image input type: {type(image_input)}")
+            return ""
+        
+        return self.ocr_image(image)[0]
     
     def extract_text_from_multiple_images(self, image_paths: List[str]) -> str:
         """
@@ -232,29 +438,79 @@ class OCRProcessor:
         
         return combined_text
 
-    def extract_text_from_pdf_images(self, pdf_path: str) -> str:
+    def ocr_pdf_pages(self, pdf_source, pages: Optional[List[int]] = None, progress=None,
+                      stats: Optional[dict] = None) -> List[str]:
+        """
+        OCR the given page indices (default: every page) of a PDF
+        Accepts either a file path or a shared PDFAnalysis
+        progress(pages_done, pages_total) is called after each page, counting only these pages
+        stats, if given, is filled with per-page and per-engine timing/confidence
+        Returns one text per requested page, in the order given
+        
+        Pages are rendered one at a time and OCRed in parallel; results are
+        merged in page order
+        """
+        with open_analysis(pdf_source) as pdf:
+            pages = list(range(pdf.page_count)) if pages is None else list(pages)
+            total_pages = len(pages)
+            logger.info(f"OCR of {total_pages}/{pdf.page_count} page(s) from {pdf.path} with {self.workers} worker(s)")
+            
+            # Bounds the number of page bitmaps rendered but not yet OCRed
+            slots = threading.BoundedSemaphore(self.max_pages_in_memory)
+            lock = threading.Lock()
+            pages_done = [0]
+            
+            def ocr_page(index):
+                try:
+                    logger.info(f"Processing page {index+1}/{pdf.page_count}")
+                    # Render this page only, then convert PIL Image to numpy array
+                    image = pdf.render_page(index, dpi=self.dpi, fmt='JPEG')
+                    img_array = np.array(image)
+                    del image
+                    
+                    # Extract text from this page
+                    text, page_stats = self.ocr_image(img_array)
+                    page_stats["page"] = index + 1
+                    return text, page_stats
+                finally:
+                    slots.release()
+                    if progress:
+                        with lock:
+                            pages_done[0] += 1
+                            done = pages_done[0]
+                        progress(done, total_pages)
+            
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr") as pool:
+                futures = []
+                for index in pages:
+                    slots.acquire()
+                    # each page thread records its spans on the caller's trace
+                    futures.append(pool.submit(contextvars.copy_context().run, ocr_page, index))
+                page_results = [future.result() for future in futures]
+            
+            if stats is not None:
+                stats.update(summarize_ocr_stats([page_stats for _, page_stats in page_results]))
+                stats["pages_total"] = pdf.page_count
+                stats["pages_ocr"] = [index + 1 for index in pages]
+        return [text for text, _ in page_results]
+
+    def extract_text_from_pdf_images(self, pdf_source, progress=None, stats: Optional[dict] = None,
+                                     pages: Optional[List[int]] = None) -> str:
         """
         Extract text from image-based PDF using OCR
+        Accepts either a file path or a shared PDFAnalysis
+        pages limits OCR to these page indices (default: every page)
+        progress and stats are as for ocr_pdf_pages
         """
         try:
-            logger.info(f"Converting PDF to images: {pdf_path}")
-            
-            # Convert PDF pages to images
-            images = convert_from_path(pdf_path, dpi=300, fmt='JPEG')
+            with open_analysis(pdf_source) as pdf:
+                pages = list(range(pdf.page_count)) if pages is None else list(pages)
+                page_texts = self.ocr_pdf_pages(pdf, pages, progress, stats)
             
             all_text = []
-            
-            for i, image in enumerate(images):
-                logger.info(f"Processing page {i+1}/{len(images)}")
-                
-                # Convert PIL Image to numpy array
-                img_array = np.array(image)
-                
-                # Extract text from this page
-                page_text = self.extract_text_from_image(img_array)
-                
+            for index, page_text in zip(pages, page_texts):
                 if page_text:
-                    all_text.append(f"--- Page {i+1} ---")
+                    all_text.append(f"--- Page {index+1} ---")
                     all_text.append(page_text)
                     all_text.append("")
             
@@ -268,41 +524,124 @@ class OCRProcessor:
             return f"Error extracting text from image PDF: {str(e)}"
     
     def get_ocr_status(self) -> dict:
-        """Get status of available OCR engines"""
+        """Get status of available OCR engines (never triggers loading)"""
         return {
-            "tesseract_available": self.tesseract_available,
-            "easyocr_available": self.easyocr_available,
-            "engines_count": sum([self.tesseract_available, self.easyocr_available])
+            "tesseract_available": self.is_installed("tesseract"),
+            "easyocr_available": self.is_installed("easyocr"),
+            "engines_count": sum(self.is_installed(engine) for engine in self.ENGINES),
+            # not_loaded | loading | loaded | unavailable
+            "engines": dict(self._engine_state)
         }
 
 # Global OCR processor instance
-ocr_processor = OCRProcessor()
+_settings = get_config()
+ocr_processor = OCRProcessor(
+    workers=_settings.get("ocr_workers", 2),
+    max_pages_in_memory=_settings.get("ocr_max_pages_in_memory", 4),
+    dpi=_settings.get("ocr_dpi", 300),
+    strategy=_settings.get("ocr_strategy", "fast_first"),
+    min_confidence=_settings.get("ocr_min_confidence", 60),
+    min_chars=_settings.get("ocr_min_chars", 50),
+    page_min_chars=_settings.get("pdf_page_min_chars", 50),
+    page_image_coverage=_settings.get("pdf_page_image_coverage", 0.5),
+    page_min_density=_settings.get("pdf_page_min_density", 5.0),
+    preprocess={
+        "denoise": _settings.get("ocr_denoise", "nlmeans"),
+        "threshold": _settings.get("ocr_threshold", "adaptive"),
+        "max_width": _settings.get("ocr_max_width", 0),
+    },
+)
+
+def summarize_ocr_stats(page_stats: List[dict]) -> dict:
+    """Aggregate per-page OCR stats into per-engine totals for response metadata"""
+    engines = {}
+    preprocess = {}
+    for page in page_stats:
+        for stage, seconds in page.get("preprocess", {}).items():
+            preprocess[stage] = preprocess.get(stage, 0.0) + seconds
+        for engine, engine_stats in page["engines"].items():
+            total = engines.setdefault(engine, {"pages": 0, "seconds": 0.0, "confidences": []})
+            total["pages"] += 1
+            total["seconds"] += engine_stats["seconds"]
+            if engine_stats["confidence"] is not None:
+                total["confidences"].append(engine_stats["confidence"])
+    for total in engines.values():
+        confidences = total.pop("confidences")
+        total["seconds"] = round(total["seconds"], 3)
+        total["mean_confidence"] = round(sum(confidences) / len(confidences), 1) if confidences else None
+    return {
+        "strategy": ocr_processor.strategy,
+        "engines": engines,
+        "preprocess_seconds": {stage: round(seconds, 3) for stage, seconds in preprocess.items()},
+        "pages": page_stats
+    }
 
-def extract_text_with_ocr(pdf_path: str) -> Tuple[str, bool]:
+def extract_text_with_ocr(pdf_source, progress=None, stats: Optional[dict] = None,
+                          events=None) -> Tuple[str, bool]:
     """
-    Extract text from PDF with automatic OCR detection
-    Returns: (extracted_text, used_ocr)
+    Extract text from PDF with per-page OCR routing
+    Accepts either a file path or a shared PDFAnalysis
+    Pages are classified one by one (see OCRProcessor.page_needs_ocr) and only
+    the pages that need it are OCRed; in a mixed document their text is merged
+    in page order with the layout-ordered, cleaned text of the other pages
+    progress(pages_done, pages_total) is reported for OCR pages
+    stats, if given, receives OCR engine timing and confidence
+    events(stage, **data), if given, is told the detected PDF type
+    Returns: (extracted_text, used_ocr); text-based PDFs return ("", False)
+    and are left to the caller's standard extraction
     """
-    # Check if PDF is image-based
-    is_image_based = ocr_processor.is_pdf_image_based(pdf_path)
-    
-    if is_image_based:
-        logger.info("🔍 Image-based PDF detected, using OCR")
-        text = ocr_processor.extract_text_from_pdf_images(pdf_path)
-        return text, True
-    else:
+    with open_analysis(pdf_source) as pdf:
+        with span("pdf_type_detection"):
+            needs_ocr = ocr_processor.classify_pages(pdf)
+        scanned = [index for index, needed in enumerate(needs_ocr) if needed]
+        if not scanned:
+            pdf_type = "text"
+        elif len(scanned) == len(needs_ocr):
+            pdf_type = "image"
+        else:
+            pdf_type = "mixed"
+        logger.info(f"PDF Type: {pdf_type} ({len(scanned)}/{len(needs_ocr)} page(s) need OCR)")
+        if events:
+            events("pdf_type", pdf_type=pdf_type, pages=pdf.page_count, ocr_pages=[index + 1 for index in scanned])
+        
+        if pdf_type == "image":
+            logger.info("🔍 Image-based PDF detected, using OCR")
+            text = ocr_processor.extract_text_from_pdf_images(pdf, progress, stats)
+            return text, True
+        if pdf_type == "mixed":
+            logger.info("🔍 Mixed PDF detected, using OCR for the scanned pages only")
+            try:
+                ocr_texts = dict(zip(scanned, ocr_processor.ocr_pdf_pages(pdf, scanned, progress, stats)))
+            except Exception as e:
+                # the text layer of the other pages is still worth returning
+                logger.error(f"Error processing PDF images: {e}")
+                ocr_texts = {}
+                if stats is not None:
+                    stats.update({"pages_total": pdf.page_count, "pages_ocr": [], "error": str(e)})
+            # imported here: utils.extract_text imports this module
+            from utils.extract_text import page_layout_texts
+            text_pages = [index for index, needed in enumerate(needs_ocr) if not needed]
+            try:
+                with span("layout_boxes"):
+                    layout_texts = page_layout_texts(pdf, text_pages)
+            except Exception as e:
+                logger.warning(f"Layout extraction failed, using the raw text layer: {e}")
+                layout_texts = {}
+            all_text = []
+            for index in range(pdf.page_count):
+                if index in ocr_texts:
+                    page_text = ocr_texts[index]
+                elif index in layout_texts:
+                    page_text = layout_texts[index]
+                else:
+                    page_text = pdf.page_text(index)
+                if page_text:
+                    all_text.append(f"--- Page {index+1} ---")
+                    all_text.append(page_text)
+                    all_text.append("")
+            return '\n'.join(all_text), True
+        
         logger.info("📄 Text-based PDF detected, using standard extraction")
-        # Fall back to standard text extraction
-        try:
-            import pdfplumber
-            with pdfplumber.open(pdf_path) as pdf:
-                text_parts = []
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        text_parts.append(text)
-                return '\n'.join(text_parts), False
-        except Exception as e:
-            logger.warning(f"Standard extraction failed, trying OCR: {e}")
-            text = ocr_processor.extract_text_from_pdf_images(pdf_path)
-            return text, True
\ No newline at end of file
+        # no text is extracted here: the caller's layout-aware extraction
+        # does it, and a pass here would parse every page twice
+        return "", False
@@ -0,0 +1,184 @@
+"""
+Shared per-document PDF analysis
+Parses a PDF once and caches page text, layouts and rendered pages so that
+classification, column detection and extraction all reuse the same parse
+"""
+import io
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import pdfplumber
+from pdf2image import convert_from_bytes, convert_from_path
+from pdfminer.layout import LTPage
+from pdfminer.pdfpage import PDFTextExtractionNotAllowed
+
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class PDFAnalysis:
+    """
+    One parse of a PDF document, shared by every stage of the pipeline.
+
+    Page text and pdfminer layouts are computed on first access and cached;
+    pages are only rasterized when a caller actually asks for images.
+    """
+
+    def __init__(self, source):
+        # source is a file path, the raw bytes of the PDF or a binary file object
+        if isinstance(source, (bytes, bytearray)):
+            self.path = "<memory>"
+            self._data = bytes(source)
+        elif hasattr(source, "read"):
+            self.path = getattr(source, "name", "<memory>")
+            self._data = source.read()
+        else:
+            self.path = source
+            self._data = None
+        # laparams enables pdfminer layout analysis on the same parse that
+        # pdfplumber uses for its characters, so layouts come for free
+        stream = io.BytesIO(self._data) if self._data is not None else self.path
+        with span("pdf_open"):
+            self._pdf = pdfplumber.open(stream, laparams={})
+        self._texts: Dict[int, Optional[str]] = {}
+        self._layouts = set()
+        self._renders: Dict[Tuple[int, Optional[str]], list] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._pdf.close()
+        self._texts.clear()
+        self._layouts.clear()
+        self._renders.clear()
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pdf.pages)
+
+    @property
+    def is_extractable(self) -> bool:
+        return self._pdf.doc.is_extractable
+
+    @property
+    def mediabox(self):
+        """Mediabox of the first page as (x0, y0, x1, y1)"""
+        return self._pdf.pages[0].mediabox
+
+    def page_mediabox(self, index: int):
+        """Mediabox of one page as (x0, y0, x1, y1), in PDF points"""
+        return self._pdf.pages[index].mediabox
+
+    def page_text(self, index: int) -> Optional[str]:
+        """Text of one page as returned by pdfplumber (cached)"""
+        if index not in self._texts:
+            with span("pdfplumber_text"):
+                self._texts[index] = self._pdf.pages[index].extract_text()
+        return self._texts[index]
+
+    def page_texts(self) -> List[Optional[str]]:
+        return [self.page_text(i) for i in range(self.page_count)]
+
+    def page_char_count(self, index: int) -> int:
+        """
+        Non-whitespace characters in the text layer of one page, from the
+        parsed page objects (cheaper than page_text when no text is needed)
+        """
+        if index in self._texts:
+            text = self._texts[index]
+            return len("".join(text.split())) if text else 0
+        return sum(1 for char in self._pdf.pages[index].chars if not char["text"].isspace())
+
+    def page_area(self, index: int) -> float:
+        """Page area in square PDF points"""
+        page = self._pdf.pages[index]
+        return float(page.width * page.height)
+
+    def page_is_blank(self, index: int) -> bool:
+        """No characters, images or vector curves (outlined text is drawn as curves)"""
+        page = self._pdf.pages[index]
+        return not (page.chars or page.images or page.curves)
+
+    def page_image_coverage(self, index: int) -> float:
+        """
+        Fraction of the page covered by embedded images (0..1), from the
+        parsed page objects, so nothing is rasterized. Overlapping images
+        are counted twice, which only matters below the cap
+        """
+        page = self._pdf.pages[index]
+        area = self.page_area(index)
+        if area <= 0:
+            return 0.0
+        covered = 0.0
+        for image in page.images:
+            width = min(float(image["x1"]), float(page.width)) - max(float(image["x0"]), 0.0)
+            height = min(float(image["bottom"]), float(page.height)) - max(float(image["top"]), 0.0)
+            if width > 0 and height > 0:
+                covered += width * height
+        return min(1.0, covered / area)
+
+    def layout(self, index: int) -> LTPage:
+        """pdfminer layout of one page (cached by pdfplumber)"""
+        if not self.is_extractable:
+            raise PDFTextExtractionNotAllowed
+        if index in self._layouts:
+            return self._pdf.pages[index].layout
+        with span("pdfminer_layout"):
+            layout = self._pdf.pages[index].layout
+        self._layouts.add(index)
+        return layout
+
+    def layouts(self) -> List[LTPage]:
+        return [self.layout(i) for i in range(self.page_count)]
+
+    def render_pages(self, dpi: int = 200, fmt: Optional[str] = None) -> list:
+        """Rasterize every page once per (dpi, fmt) and cache the images"""
+        key = (dpi, fmt)
+        if key not in self._renders:
+            kwargs = {"dpi": dpi}
+            if fmt:
+                kwargs["fmt"] = fmt
+            logger.info(f"Rendering {self.page_count} page(s) at {dpi} DPI")
+            self._renders[key] = self._convert(**kwargs)
+        return self._renders[key]
+
+    def render_page(self, index: int, dpi: int = 200, fmt: Optional[str] = None):
+        """
+        Rasterize a single page without caching it, so callers can bound
+        how many page bitmaps are alive at once
+        """
+        cached = self._renders.get((dpi, fmt))
+        if cached is not None:
+            return cached[index]
+        kwargs = {"dpi": dpi, "first_page": index + 1, "last_page": index + 1}
+        if fmt:
+            kwargs["fmt"] = fmt
+        return self._convert(**kwargs)[0]
+
+    def _convert(self, **kwargs) -> list:
+        with span("pdf_render"):
+            if self._data is not None:
+                return convert_from_bytes(self._data, **kwargs)
+            return convert_from_path(self.path, **kwargs)
+
+
+@contextmanager
+def open_analysis(source):
+    """
+    Yield a PDFAnalysis for a path, bytes or file object, or reuse an existing one.
+    Only analyses created here are closed on exit.
+    """
+    if isinstance(source, PDFAnalysis):
+        yield source
+        return
+    analysis = PDFAnalysis(source)
+    try:
+        yield analysis
+    finally:
+        analysis.close()
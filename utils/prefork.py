@@ -0,0 +1,272 @@
+"""
+Preforking server entry point
+The master binds the listening socket, loads read-only state once (rule
+dictionaries, Tesseract) and forks the HTTP workers, which share those pages
+copy-on-write and all accept from the same socket, each running its own
+uvicorn server. The master only supervises: dead workers are respawned and
+a worker whose memory (with its extraction processes) grows past the limit
+is recycled once it has no request in flight.
+"""
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, List, Optional
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# Set in each forked worker: its slot number and the in-flight counters
+# shared with the master (one per slot, written only by that worker)
+_slot: Optional[int] = None
+_activity = None
+
+
+def worker_slot() -> Optional[int]:
+    """Slot of this preforked worker (0..workers-1), None when not preforked"""
+    return _slot
+
+
+class ActivityMiddleware:
+    """
+    Counts the HTTP requests in flight in this worker so the master only
+    recycles it when idle. Pure ASGI, so streamed responses count until
+    their last byte is sent
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _activity is None:
+            await self.app(scope, receive, send)
+            return
+        _activity[_slot] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _activity[_slot] -= 1
+
+
+def _children() -> Dict[int, List[int]]:
+    """Parent pid -> child pids, from /proc"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name may contain spaces; fields resume after ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _process_memory(pid: int) -> int:
+    """
+    Proportional set size in bytes: pages shared with the master and the
+    other workers are split between them, so preloaded models are not
+    counted once per worker. Falls back to RSS on kernels without smaps_rollup
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def tree_memory(pid: int, children: Optional[Dict[int, List[int]]] = None) -> int:
+    """Memory of a process and all its descendants (extraction pool, job workers)"""
+    children = _children() if children is None else children
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        total += _process_memory(current)
+        pending.extend(children.get(current, ()))
+    return total
+
+
+class PreforkServer:
+    """
+    Supervisor for N forked uvicorn workers sharing one socket
+    """
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 9000, workers: int = 1,
+                 max_worker_memory_mb: Optional[float] = None, graceful_timeout: float = 30.0,
+                 check_interval: float = 5.0, backlog: int = 2048):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_worker_memory = (max_worker_memory_mb or 0) * 1024 * 1024
+        self.graceful_timeout = graceful_timeout
+        self.check_interval = check_interval
+        self.backlog = backlog
+        self._socket: Optional[socket.socket] = None
+        self._pids: Dict[int, int] = {}          # pid -> slot
+        self._started: Dict[int, float] = {}     # slot -> spawn time
+        self._recycling: Dict[int, Optional[float]] = {}  # slot -> when it went over the limit
+        self._stopping = False
+
+    @classmethod
+    def from_config(cls, app, config: dict) -> "PreforkServer":
+        return cls(
+            app,
+            host=config.get("HOST", "127.0.0.1"),
+            port=config.get("PORT", 9000),
+            workers=config.get("WORKERS", 1),
+            max_worker_memory_mb=config.get("MAX_WORKER_MEMORY_MB"),
+            graceful_timeout=config.get("GRACEFUL_TIMEOUT", 30),
+            check_interval=config.get("WORKER_CHECK_SECONDS", 5),
+        )
+
+    @property
+    def preforking(self) -> bool:
+        return self.workers > 1 and hasattr(os, "fork")
+
+    def run(self, preload: Optional[Callable[[], None]] = None):
+        """
+        Serve until SIGTERM/SIGINT. preload runs once in the master before
+        forking; with a single worker (or no fork, e.g. Windows) this is a
+        plain uvicorn.run and preload is skipped, models load on first use
+        """
+        if not self.preforking:
+            uvicorn.run(self.app, host=self.host, port=self.port)
+            return
+        global _activity
+        self._socket = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(self.backlog)
+        self._socket.set_inheritable(True)
+        if preload is not None:
+            t0 = time.perf_counter()
+            preload()
+            print(f"* Preloaded shared state in {time.perf_counter() - t0:.1f}s")
+        # Move everything allocated so far out of the collector's reach, so
+        # collections in the workers don't write to (and copy) shared pages
+        gc.collect()
+        gc.freeze()
+        _activity = multiprocessing.RawArray("i", self.workers)
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle_stop)
+        print(f"* Serving on http://{self.host}:{self.port} with {self.workers} workers")
+        for slot in range(self.workers):
+            self._spawn(slot)
+        try:
+            self._supervise()
+        finally:
+            self._shutdown()
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _spawn(self, slot: int):
+        _activity[slot] = 0
+        pid = os.fork()
+        if pid:
+            self._pids[pid] = slot
+            self._started[slot] = time.monotonic()
+            self._recycling.pop(slot, None)
+            logger.info(f"Started worker {slot} (pid {pid})")
+            return
+        # worker: uvicorn installs its own handlers for a graceful shutdown
+        global _slot
+        _slot = slot
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        code = 0
+        try:
+            uvicorn.Server(uvicorn.Config(self.app)).run(sockets=[self._socket])
+        except BaseException as e:
+            logger.error(f"Worker {slot} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _reap(self):
+        while self._pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self._pids.pop(pid, None)
+            if slot is None:
+                continue
+            if self._stopping:
+                continue
+            if time.monotonic() - self._started.get(slot, 0) < 1.0:
+                # dying right after start (e.g. a startup hook failing): don't spin
+                logger.error(f"Worker {slot} exited during startup (status {status})")
+                time.sleep(1.0)
+            elif slot not in self._recycling:
+                logger.warning(f"Worker {slot} (pid {pid}) exited with status {status}, restarting")
+            self._spawn(slot)
+
+    def _check_memory(self):
+        if not self.max_worker_memory or not os.path.isdir("/proc"):
+            return
+        children = _children()
+        now = time.monotonic()
+        for pid, slot in list(self._pids.items()):
+            if slot in self._recycling:
+                recycling_since = self._recycling[slot]
+                if recycling_since is None:
+                    continue  # already told to stop
+            else:
+                used = tree_memory(pid, children)
+                if used <= self.max_worker_memory:
+                    continue
+                logger.warning(f"Worker {slot} (pid {pid}) uses {used / 1024 / 1024:.0f} MB, "
+                               f"recycling it when idle")
+                recycling_since = self._recycling[slot] = now
+            # idle, or busy for longer than a graceful shutdown may take
+            if _activity[slot] <= 0 or now - recycling_since > self.graceful_timeout:
+                logger.info(f"Recycling worker {slot} (pid {pid})")
+                os.kill(pid, signal.SIGTERM)
+                self._recycling[slot] = None
+
+    def _supervise(self):
+        next_check = time.monotonic() + self.check_interval
+        while not self._stopping:
+            time.sleep(0.2)
+            self._reap()
+            if time.monotonic() >= next_check:
+                self._check_memory()
+                next_check = time.monotonic() + self.check_interval
+
+    def _shutdown(self):
+        self._stopping = True
+        for pid in list(self._pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._pids and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self._pids):
+            logger.warning(f"Worker (pid {pid}) did not stop in {self.graceful_timeout}s, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._socket.close()
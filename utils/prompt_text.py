@@ -0,0 +1,197 @@
+"""
+Prompt text compaction for Gemini
+Extracted text carries page markers, repeated headers/footers, duplicated
+column text and whitespace runs that cost tokens without adding anything.
+compact_text strips those, and fit_to_budget trims the result section by
+section to a token budget, least useful sections first.
+"""
+import math
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from utils.util import get_config
+
+# Rough Gemini tokenizer ratio for mixed English/Vietnamese text
+CHARS_PER_TOKEN = 4
+
+# lines at least this long are kept only once per document
+MIN_DEDUP_CHARS = 20
+
+PAGE_MARKER = re.compile(r"^-{2,}\s*page\s+\d+\s*-{2,}$", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+BOILERPLATE_PATTERNS = (
+    r"^(?:page|trang)\s*\d+\s*(?:(?:of|/)\s*\d+)?$",
+    r"^\d+\s*/\s*\d+$",
+    r"^(?:curriculum vitae|resume|r[ée]sum[ée]|cv|s[ơo] y[ếe]u l[ýy] l[ịi]ch)$",
+    r"^references? (?:are )?available (?:up)?on request\.?$",
+    r"\b(?:powered by|created with|generated by|made with)\b.*\b(?:topcv|canva|novoresume|zety|resume\.io|cv\.?com)\b",
+    r"^(?:www\.)?(?:topcv\.vn|canva\.com|novoresume\.com|zety\.com)$",
+    r"^[\W_]+$",
+)
+
+# Section headings and how much each is worth keeping (higher = kept longer)
+SECTION_PRIORITY = (
+    (("skill", "kỹ năng", "ky nang", "technical", "technologies", "công nghệ"), 5),
+    (("experience", "employment", "work history", "kinh nghiệm", "kinh nghiem"), 4),
+    (("education", "học vấn", "hoc van", "trình độ", "academic"), 4),
+    (("summary", "profile", "objective", "about", "mục tiêu", "muc tieu", "giới thiệu"), 3),
+    (("project", "dự án", "du an"), 3),
+    (("certificat", "chứng chỉ", "award", "giải thưởng", "language", "ngoại ngữ"), 2),
+    (("activit", "hoạt động", "volunteer"), 1),
+    (("hobb", "interest", "sở thích", "reference", "người tham chiếu"), 0),
+)
+HEADER_PRIORITY = 6     # text before the first heading: name and contact details
+DEFAULT_PRIORITY = 2
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@lru_cache(maxsize=8)
+def _boilerplate_pattern(extra: Tuple[str, ...] = ()) -> "re.Pattern":
+    return re.compile("|".join("(?:%s)" % pattern for pattern in (*BOILERPLATE_PATTERNS, *extra)),
+                      re.IGNORECASE)
+
+
+_BOILERPLATE = _boilerplate_pattern()
+
+
+def compact_text(text: str, boilerplate: Optional["re.Pattern"] = None) -> str:
+    """
+    Drop page markers and boilerplate lines, collapse whitespace and keep
+    only the first occurrence of each line (repeated headers/footers and
+    column text extracted twice)
+    """
+    boilerplate = boilerplate or _BOILERPLATE
+    lines = []
+    seen = set()
+    for line in text.split("\n"):
+        line = WHITESPACE.sub(" ", line).strip()
+        if not line or PAGE_MARKER.match(line) or boilerplate.search(line):
+            continue
+        key = line.casefold()
+        # short lines (dates, single skills) legitimately repeat, so only
+        # longer ones are deduplicated across the document
+        if key in seen or (lines and key == lines[-1].casefold()):
+            continue
+        if len(key) >= MIN_DEDUP_CHARS:
+            seen.add(key)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _heading_priority(line: str) -> Optional[int]:
+    """Priority of a section heading line, or None if the line is not one"""
+    if len(line) > 40 or line.endswith((".", ",", ";")):
+        return None
+    lowered = line.casefold().rstrip(":")
+    short = len(lowered.split()) <= 3
+    for keywords, priority in SECTION_PRIORITY:
+        # "Skills", "Technical skills", "Work experience"; not "ABC Technologies, Hanoi"
+        if lowered.startswith(keywords) or (short and any(keyword in lowered for keyword in keywords)):
+            return priority
+    # short all-caps lines are headings we do not know
+    if line.isupper() and len(line.split()) <= 4:
+        return DEFAULT_PRIORITY
+    return None
+
+
+def split_sections(text: str) -> List[Tuple[int, List[str]]]:
+    """[(priority, lines)] in document order; the first is the header block"""
+    sections = [(HEADER_PRIORITY, [])]
+    for line in text.split("\n"):
+        priority = _heading_priority(line)
+        if priority is not None:
+            sections.append((priority, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [section for section in sections if section[1]]
+
+
+def _cut_line(line: str, limit: int) -> str:
+    """The start of line in at most limit characters, cut at a word boundary when there is one"""
+    if limit <= 0:
+        return ""
+    if len(line) <= limit:
+        return line
+    cut = line[:limit]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > 0 else cut).rstrip()
+
+
+def fit_to_budget(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """
+    Trim text to about max_tokens. Whole sections are dropped lowest
+    priority first (never the header block); if that is not enough every
+    remaining section keeps a proportional share of its leading text, the
+    last line cut at a word boundary (OCR output is often one long line
+    per page). Non-empty text never comes back empty.
+    Returns (text, truncated)
+    """
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text, False
+    budget = max_tokens * CHARS_PER_TOKEN
+    sections = split_sections(text)
+    keep = [True] * len(sections)
+    size = lambda: sum(len("\n".join(lines)) + 1 for (_, lines), kept in zip(sections, keep) if kept)
+    for index in sorted(range(len(sections)), key=lambda i: sections[i][0]):
+        if size() <= budget:
+            break
+        if sections[index][0] < HEADER_PRIORITY:
+            keep[index] = False
+
+    kept = [(priority, lines) for (priority, lines), kept_section in zip(sections, keep) if kept_section]
+    sizes = [len("\n".join(lines)) + 1 for _, lines in kept]
+    total = sum(sizes)
+    if total > budget:
+        allowances = [int(size * budget / total) for size in sizes]
+        if kept[0][0] == HEADER_PRIORITY and len(kept) > 1:
+            # the header (name, contact details) keeps at least a quarter of
+            # the budget, the other sections share the rest
+            allowances[0] = max(allowances[0], min(sizes[0], budget // 4))
+            rest = total - sizes[0]
+            allowances[1:] = [int(size * (budget - allowances[0]) / rest) for size in sizes[1:]]
+        trimmed = []
+        for (priority, lines), allowance in zip(kept, allowances):
+            section = []
+            used = 0
+            for line in lines:
+                if used + len(line) + 1 > allowance:
+                    line = _cut_line(line, allowance - used - 1)
+                    if line:
+                        section.append(line)
+                    break
+                section.append(line)
+                used += len(line) + 1
+            if section:
+                trimmed.append((priority, section))
+        kept = trimmed
+    result = "\n".join("\n".join(lines) for _, lines in kept)
+    if not result.strip():
+        # every share rounded down to nothing: keep the start of the document
+        result = _cut_line(text.strip(), budget)
+    return result, True
+
+
+def prepare_prompt_text(text: str, max_tokens: Optional[int] = None) -> Tuple[str, dict]:
+    """
+    Compact text (unless prompt_compaction is off) and fit it to the
+    configured prompt_token_budget
+    Returns (text, stats) where stats holds the before/after token estimates
+    """
+    config = get_config()
+    compacted = text
+    if config.get("prompt_compaction", True):
+        extra = tuple(config.get("prompt_boilerplate") or ())
+        compacted = compact_text(text, _boilerplate_pattern(extra))
+    # the budget applies with or without compaction
+    if max_tokens is None:
+        max_tokens = config.get("prompt_token_budget", 6000)
+    compacted, truncated = fit_to_budget(compacted, max_tokens)
+    return compacted, {
+        "text_tokens_raw": estimate_tokens(text),
+        "text_tokens": estimate_tokens(compacted),
+        "truncated": truncated
+    }
@@ -0,0 +1,207 @@
+"""
+Content-addressed result cache for uploads
+Results are keyed by a hash of the uploaded bytes and their format, with
+one namespace (layer) per pipeline stage, e.g. extracted text and AI
+extraction
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from utils.document_formats import document_format
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data: bytes) -> str:
+    """Stable cache key for the raw bytes of an upload"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def document_cache_key(digest: str, filename: Optional[str]) -> str:
+    """
+    Key of a document's cached results: its content hash qualified by its
+    format, since the same bytes uploaded as .txt and as .rtf are
+    extracted differently
+    """
+    return f"{document_format(filename or '') or 'none'}:{digest}"
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with an entry limit and an optional TTL
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, layer: str, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((layer, key))
+            if entry is None:
+                return None
+            created, value = entry
+            if self.ttl_seconds and time.time() - created > self.ttl_seconds:
+                del self._entries[(layer, key)]
+                return None
+            self._entries.move_to_end((layer, key))
+            return value
+
+    def set(self, layer: str, key: str, value: Any):
+        with self._lock:
+            self._entries[(layer, key)] = (time.time(), value)
+            self._entries.move_to_end((layer, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """
+    On-disk cache that survives restarts. Values are stored as JSON and
+    the least recently used entries are evicted past max_entries. A hit only
+    rewrites its access time once it is touch_seconds old, so repeated reads
+    of a hot entry don't each cost a write and a commit
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None, touch_seconds: float = 300.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.touch_seconds = touch_seconds
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = self._connect()
+        self._pid = os.getpid()
+        self._inherited = []
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " layer TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL,"
+            " PRIMARY KEY (layer, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # SQLite connections must not be used across fork (preforked server
+        # workers inherit this cache), so each process opens its own. The
+        # inherited one is kept unclosed: closing it could checkpoint or
+        # remove the WAL still used by the parent
+        if self._pid != os.getpid():
+            self._inherited.append(self._connection)
+            self._connection = self._connect()
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, layer: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created, accessed FROM cache WHERE layer = ? AND key = ?", (layer, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created, accessed = row
+            now = time.time()
+            if self.ttl_seconds and now - created > self.ttl_seconds:
+                self._conn.execute("DELETE FROM cache WHERE layer = ? AND key = ?", (layer, key))
+                self._conn.commit()
+                return None
+            if now - accessed >= self.touch_seconds:
+                self._conn.execute(
+                    "UPDATE cache SET accessed = ? WHERE layer = ? AND key = ?", (now, layer, key)
+                )
+                self._conn.commit()
+        return json.loads(value)
+
+    def set(self, layer: str, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (layer, key, value, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (layer, key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache"
+                    " ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+
+class ResultCache:
+    """
+    Layered cache: backends are checked in order (fastest first) and a hit
+    in a slower backend is promoted into the faster ones
+    """
+
+    def __init__(self, backends: List):
+        self.backends = backends
+
+    def get(self, layer: str, key: str) -> Optional[Any]:
+        for i, backend in enumerate(self.backends):
+            try:
+                value = backend.get(layer, key)
+            except Exception as e:
+                logger.warning(f"Cache read failed ({type(backend).__name__}): {e}")
+                continue
+            if value is not None:
+                for faster in self.backends[:i]:
+                    faster.set(layer, key, value)
+                return value
+        return None
+
+    def set(self, layer: str, key: str, value: Any):
+        for backend in self.backends:
+            try:
+                backend.set(layer, key, value)
+            except Exception as e:
+                logger.warning(f"Cache write failed ({type(backend).__name__}): {e}")
+
+    def clear(self):
+        for backend in self.backends:
+            backend.clear()
+
+
+def build_cache(config: dict) -> ResultCache:
+    """Create the cache described by the cache_* settings in config.yaml"""
+    max_entries = config.get("cache_max_entries", 256)
+    ttl_seconds = config.get("cache_ttl_seconds")
+    backends = []
+    for name in config.get("cache_backends", ["memory"]):
+        if name == "memory":
+            backends.append(MemoryCache(max_entries, ttl_seconds))
+        elif name == "sqlite":
+            backends.append(SQLiteCache(config.get("cache_path", "./data/cache.sqlite3"),
+                                        config.get("cache_disk_max_entries"), ttl_seconds,
+                                        config.get("cache_touch_seconds", 300)))
+        else:
+            logger.warning(f"Unknown cache backend '{name}' ignored")
+    return ResultCache(backends)
@@ -0,0 +1,215 @@
+"""
+Rule-based extraction of contact fields, links, dates and skills
+Precompiled patterns run over the cleaned text in about a millisecond per
+CV, so requests that only need these fields never wait on a model
+"""
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from utils.util import get_config
+
+logger = logging.getLogger(__name__)
+
+# fields the rules can answer on their own
+RULE_FIELDS = ("phone", "phones", "email", "emails", "urls", "dates", "skill")
+
+EMAIL_PATTERN = re.compile(r"(?<![\w.+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+URL_PATTERN = re.compile(
+    r"(?:https?://|www\.)[^\s<>\"'()]+"
+    r"|(?<![\w@.])(?:linkedin\.com|github\.com|gitlab\.com|bitbucket\.org)/[^\s<>\"'()]+",
+    re.IGNORECASE,
+)
+# digits in groups separated by spaces, dots, dashes or parentheses;
+# candidates are validated by digit count below
+PHONE_PATTERN = re.compile(r"(?<![\w+])\+?\(?\d{1,4}\)?(?:[ .-]?\(?\d{2,4}\)?){2,5}(?![\w])")
+_MONTHS = (r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+           r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?")
+DATE_PATTERN = re.compile(
+    r"(?<!\d)(?:0?[1-9]|[12]\d|3[01])[/.-](?:0?[1-9]|1[0-2])[/.-](?:19|20)\d{2}(?!\d)"
+    r"|(?<!\d)(?:19|20)\d{2}-(?:0[1-9]|1[0-2])(?:-(?:0[1-9]|[12]\d|3[01]))?(?!\d)"
+    r"|(?<![\d/.-])(?:0?[1-9]|1[0-2])[/.-](?:19|20)\d{2}(?!\d)"
+    r"|\b(?:" + _MONTHS + r")\.?,? (?:(?:0?[1-9]|[12]\d|3[01]),? )?(?:19|20)\d{2}\b"
+    r"|\b(?:th[aá]ng|thg) ?(?:0?[1-9]|1[0-2])[/ ,-]+(?:n[aă]m )?(?:19|20)\d{2}\b",
+    re.IGNORECASE,
+)
+_TRAILING_PUNCTUATION = ".,;:!?"
+
+
+def _valid_phone(candidate: str) -> Optional[str]:
+    """Return the phone number if the digits look like one, else None"""
+    digits = re.sub(r"\D", "", candidate)
+    if candidate.startswith("+") or (digits.startswith("84") and len(digits) == 11):
+        # international: Vietnam is +84 followed by 9 digits
+        if digits.startswith("84"):
+            return candidate if len(digits) == 11 else None
+        return candidate if 9 <= len(digits) <= 15 else None
+    if digits.startswith("0"):
+        # Vietnamese mobile (10 digits) or old landline (11 digits)
+        return candidate if len(digits) in (10, 11) else None
+    # e.g. (415) 555-1234
+    return candidate if len(digits) == 10 and not DATE_PATTERN.fullmatch(candidate) else None
+
+
+def load_skills(path: Optional[str]) -> List[str]:
+    """One skill per line; blank lines and # comments are ignored"""
+    if not path or not os.path.exists(path):
+        logger.info(f"Skill dictionary not found at {path}, skill rules disabled")
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class RuleExtractor:
+    """
+    Precompiled regex rules plus a skill dictionary matcher
+    """
+
+    def __init__(self, skills: Iterable[str] = ()):
+        self.skills = {}
+        for skill in skills:
+            self.skills.setdefault(skill.lower(), skill)
+        # Short names (C, R, Go, AWS) only match with their dictionary casing;
+        # longer ones match case-insensitively
+        short = [skill for skill in self.skills.values() if len(skill) <= 3]
+        long = [skill for skill in self.skills.values() if len(skill) > 3]
+        self._short_pattern = self._compile(short, 0)
+        self._long_pattern = self._compile(long, re.IGNORECASE)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RuleExtractor":
+        return cls(load_skills(config.get("skill")))
+
+    @staticmethod
+    def _compile(skills: List[str], flags: int):
+        if not skills:
+            return None
+        if flags & re.IGNORECASE:
+            skills = [skill.lower() for skill in skills]
+        return re.compile(r"(?<![\w+#.])" + _trie_pattern(skills) + r"(?![\w+#])", flags)
+
+    def find_skills(self, text: str) -> List[str]:
+        found = {}
+        for pattern in (self._long_pattern, self._short_pattern):
+            if pattern is None:
+                continue
+            for match in pattern.finditer(text):
+                skill = self.skills[match.group(0).lower()]
+                found.setdefault(skill, match.start())
+        return sorted(found, key=found.get)
+
+    def extract(self, text: str) -> Dict[str, object]:
+        phones, seen_digits = [], set()
+        for match in PHONE_PATTERN.finditer(text):
+            phone = _valid_phone(match.group(0).strip())
+            digits = re.sub(r"\D", "", phone or "")
+            if phone and digits[-9:] not in seen_digits:
+                seen_digits.add(digits[-9:])
+                phones.append(phone)
+        emails = _unique(match.group(0) for match in EMAIL_PATTERN.finditer(text))
+        urls = _unique(match.group(0).rstrip(_TRAILING_PUNCTUATION) for match in URL_PATTERN.finditer(text))
+        dates = _unique(match.group(0) for match in DATE_PATTERN.finditer(text))
+        return {
+            "phone": phones[0] if phones else "",
+            "phones": phones,
+            "email": emails[0] if emails else "",
+            "emails": emails,
+            "urls": urls,
+            "dates": dates,
+            "skill": self.find_skills(text),
+        }
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Alternation factored by common prefix ("java", "javascript" ->
+    java(?:script)?), so matching cost does not grow with the dictionary
+    size. Longer words are tried first, so "Spring Boot" wins over "Spring"
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # a word ending here makes the rest optional (greedy, so longest first)
+        return "(?:" + body + ")?" if "" in node else body
+
+    return "(?:" + build(trie) + ")"
+
+
+def _unique(values: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(values))
+
+
+_rule_extractor = None
+_rule_extractor_lock = threading.Lock()
+
+
+def get_rule_extractor() -> RuleExtractor:
+    """Process-wide extractor built from the service configuration"""
+    global _rule_extractor
+    if _rule_extractor is None:
+        with _rule_extractor_lock:
+            if _rule_extractor is None:
+                _rule_extractor = RuleExtractor.from_config(get_config())
+    return _rule_extractor
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Comma-separated ?fields= value -> list (None when not given)"""
+    if not fields:
+        return None
+    return [field.strip().lower() for field in fields.split(",") if field.strip()] or None
+
+
+def rules_cover(fields: Optional[List[str]]) -> bool:
+    return bool(fields) and all(field in RULE_FIELDS for field in fields)
+
+
+def rules_result(texts: str, fields: Optional[List[str]] = None) -> dict:
+    """Answer a request from the rules alone, in the extract_feature_text format"""
+    rules = get_rule_extractor().extract(texts)
+    return {
+        "status": "success",
+        "extraction": {field: rules[field] for field in (fields or RULE_FIELDS)},
+        "extracted_text_length": len(texts),
+        "engine": "rules"
+    }
+
+
+def merge_rules(result: dict, rules: Dict[str, object]) -> dict:
+    """
+    Fill a model result with rule output: empty phone is filled, skills are
+    unioned (model order first) and rule-only fields are added
+    """
+    if "error" in result:
+        result["rules"] = rules
+        return result
+    extraction = result["extraction"]
+    if not extraction.get("phone"):
+        extraction["phone"] = rules["phone"]
+    known = {skill.lower() for skill in extraction.get("skill", [])}
+    extraction["skill"] = list(extraction.get("skill", [])) + [
+        skill for skill in rules["skill"] if skill.lower() not in known
+    ]
+    for field in ("phones", "email", "emails", "urls", "dates"):
+        extraction.setdefault(field, rules[field])
+    return result
+
+
+def select_fields(result: dict, fields: Optional[List[str]]) -> dict:
+    """Keep only the requested extraction fields"""
+    if not fields or not result or "error" in result:
+        return result
+    selected = dict(result)
+    selected["extraction"] = {field: result["extraction"].get(field) for field in fields}
+    return selected
@@ -0,0 +1,206 @@
+"""
+Per-request spans and an on-demand sampling profiler
+
+span("stage") times a block and records it on the trace active in the
+current context, if any. Traces live in a context variable, so spans from
+the thread pool (run_io copies the context) and from OCR page threads land
+on the request that started them. Worker processes run their own trace and
+return its spans with the result, which the API process merges in.
+
+SamplingProfiler periodically samples the stacks of the threads working
+on one request (threads are attached by watch() and while inside a span).
+The thread that starts the profiler, normally the event loop shared by all
+requests, is never sampled.
+"""
+import sys
+import threading
+import time
+from collections import Counter as Tally
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+class Trace:
+    """Spans of one request as (name, wall-clock start, seconds, labels)"""
+
+    def __init__(self):
+        self.start = time.time()
+        self.spans: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, seconds: float, labels: Optional[dict] = None):
+        with self._lock:
+            self.spans.append((name, start, seconds, dict(labels or {})))
+
+    def merge(self, spans: Optional[List[tuple]]):
+        """Add spans recorded elsewhere (e.g. returned by a worker process)"""
+        for span in spans or ():
+            self.add(*span)
+
+    def export(self) -> List[dict]:
+        """Spans for response metadata, in start order, times in ms relative to the trace start"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span[1])
+        return [{
+            "name": name,
+            "start_ms": round((start - self.start) * 1000, 2),
+            "duration_ms": round(seconds * 1000, 2),
+            **labels
+        } for name, start, seconds, labels in spans]
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_profiler: ContextVar[Optional["SamplingProfiler"]] = ContextVar("profiler", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def tracing():
+    """Collect the spans recorded in this context (and contexts copied from it)"""
+    trace = Trace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def span(name: str, **labels):
+    """
+    Time a block as a span of the current trace. Yields the labels dict so
+    labels known only at the end (e.g. which engine ran) can be added
+    """
+    trace = _trace.get()
+    profiler = _profiler.get()
+    if trace is None and profiler is None:
+        yield labels
+        return
+    if profiler is not None:
+        profiler.attach()
+    start = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        if trace is not None:
+            trace.add(name, start, time.perf_counter() - t0, labels)
+        if profiler is not None:
+            profiler.detach()
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of attached threads every interval seconds
+    (sys._current_frames, so the profiled code runs unmodified)
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks: Tally = Tally()
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._token = None
+        self._owner: Optional[int] = None
+        self._started = 0.0
+        self._seconds = 0.0
+
+    def attach(self):
+        """Sample the calling thread until detach(); nested attaches are counted"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def detach(self):
+        ident = threading.get_ident()
+        with self._lock:
+            remaining = self._threads.get(ident, 0) - 1
+            if remaining > 0:
+                self._threads[ident] = remaining
+            else:
+                self._threads.pop(ident, None)
+
+    def watch(self, func):
+        """Wrap func so the thread running it is sampled while it runs"""
+        def watched(*args, **kwargs):
+            self.attach()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.detach()
+        return watched
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = [ident for ident in self._threads if ident != self._owner]
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{_short_path(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self._stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    @contextmanager
+    def running(self):
+        """Profile the block; code in it (and copied contexts) can attach threads via span/watch"""
+        self._token = _profiler.set(self)
+        self._owner = threading.get_ident()
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._sampler.start()
+        try:
+            yield self
+        finally:
+            self._stop.set()
+            self._sampler.join()
+            self._seconds = time.perf_counter() - self._started
+            _profiler.reset(self._token)
+
+    def report(self, top: int = 25) -> dict:
+        """Top functions by own and cumulative samples, plus the hottest collapsed stacks"""
+        own: Tally = Tally()
+        cumulative: Tally = Tally()
+        for stack, count in self._stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                cumulative[function] += count
+        total = self.samples or 1
+        return {
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": self.samples,
+            "seconds": round(self._seconds, 3),
+            "functions": [{
+                "function": function,
+                "own_samples": own[function],
+                "own_percent": round(own[function] * 100 / total, 1),
+                "cumulative_percent": round(cumulative[function] * 100 / total, 1)
+            } for function, _ in own.most_common(top)],
+            # flamegraph.pl / speedscope "collapsed" format
+            "stacks": [f"{';'.join(stack)} {count}" for stack, count in self._stacks.most_common(top)]
+        }
+
+
+def _short_path(filename: str) -> str:
+    """.../site-packages/pdfminer/layout.py -> pdfminer/layout.py, otherwise the last two parts"""
+    filename = filename.replace("\\", "/")
+    for marker in ("site-packages/", "dist-packages/"):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return "/".join(filename.split("/")[-2:])
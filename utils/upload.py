@@ -0,0 +1,191 @@
+"""
+Memory-bounded upload ingestion
+Multipart request bodies are parsed as they stream in and each file is
+written into memory, or into a unique temp file once it grows past a
+threshold, while the size limits and content hash are computed on the fly
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from typing import List, Optional, Union
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeded the configured size limit"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File exceeds the {max_bytes / (1024 * 1024):g} MB upload limit")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """
+    Upload contents held in memory (small files) or in a unique temp file
+    (large files). `source` is what the extractors take: bytes or a path.
+    """
+
+    def __init__(self, filename: str, memory_bytes: int):
+        self.filename = filename
+        self.memory_bytes = memory_bytes
+        self.size = 0
+        self.path: Optional[str] = None
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._hash = hashlib.sha256()
+
+    def write(self, chunk: bytes):
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        if self._file is None and self.size > self.memory_bytes:
+            # Roll over to disk, keeping the original extension for type detection
+            suffix = os.path.splitext(self.filename)[1].lower()
+            fd, self.path = tempfile.mkstemp(suffix=suffix, prefix="upload-")
+            self._file = os.fdopen(fd, "wb")
+            self._file.write(self._buffer.getvalue())
+            self._buffer = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def content_hash(self) -> str:
+        return self._hash.hexdigest()
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        return self.path if self.path else self._buffer.getvalue()
+
+    def read_bytes(self) -> bytes:
+        if self.path:
+            with open(self.path, "rb") as f:
+                return f.read()
+        return self._buffer.getvalue()
+
+    def save(self, path: str):
+        """Persist the contents at path (moving the temp file when there is one)"""
+        if self.path:
+            shutil.move(self.path, path)
+            self.path = None
+            self._buffer = io.BytesIO()
+        else:
+            with open(path, "wb") as f:
+                f.write(self._buffer.getvalue())
+
+    def cleanup(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError as e:
+                print(f"Warning: Error deleting file {self.path}: {e}")
+            self.path = None
+
+
+class InvalidUpload(Exception):
+    """The request body is not a multipart form with the expected file field"""
+
+
+class _MultipartSpooler:
+    """python-multipart callbacks writing the file parts of one field into SpooledUploads"""
+
+    def __init__(self, field: str, max_bytes: int, memory_bytes: int, max_files: Optional[int]):
+        self.field = field
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.max_files = max_files
+        self.files: List[SpooledUpload] = []
+        self._current: Optional[SpooledUpload] = None
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+
+    def on_part_begin(self):
+        self._current = None
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        # other form fields and parts without a filename are skipped
+        if options.get(b"name", b"").decode("utf-8", "replace") != self.field or b"filename" not in options:
+            return
+        if self.max_files is not None and len(self.files) >= self.max_files:
+            raise InvalidUpload(f"Expected at most {self.max_files} file(s) in '{self.field}'")
+        filename = options[b"filename"].decode("utf-8", "replace")
+        self._current = SpooledUpload(filename or "upload", self.memory_bytes)
+        self.files.append(self._current)
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._current is None:
+            return
+        if self._current.size + end - start > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        self._current.write(data[start:end])
+
+    def on_part_end(self):
+        if self._current is not None:
+            self._current.finish()
+            self._current = None
+
+    def callbacks(self) -> dict:
+        return {name: getattr(self, name) for name in (
+            "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+            "on_headers_finished", "on_part_data", "on_part_end")}
+
+
+async def spool_multipart(request, field: str, max_bytes: int, memory_bytes: int,
+                          body_bytes: int, max_files: Optional[int] = None) -> List[SpooledUpload]:
+    """
+    Parse a multipart/form-data request body as it arrives, writing each file
+    of `field` straight into a SpooledUpload (no intermediate copy)
+    Raises UploadTooLarge as soon as a file passes max_bytes or the raw body
+    passes body_bytes; both are counted on the wire, so chunked bodies without
+    a Content-Length are limited too. Raises InvalidUpload for anything that
+    is not a multipart form carrying at least one such file.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise InvalidUpload("Expected a multipart/form-data body")
+    spooler = _MultipartSpooler(field, max_bytes, memory_bytes, max_files)
+    parser = MultipartParser(params[b"boundary"], spooler.callbacks())
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > body_bytes:
+                raise UploadTooLarge(max_bytes)
+            parser.write(chunk)
+        parser.finalize()
+        if not spooler.files:
+            raise InvalidUpload(f"Missing file field '{field}'")
+    except MultipartParseError as e:
+        for spooled in spooler.files:
+            spooled.cleanup()
+        raise InvalidUpload(f"Malformed multipart body: {e}")
+    except BaseException:
+        for spooled in spooler.files:
+            spooled.cleanup()
+        raise
+    return spooler.files
@@ -1,9 +1,22 @@
+import os
 import yaml
 
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "configs", "config.yaml")
+_config = None
+
 '''
     Load the configuration file
 '''
 def load_config(config_path):
     with open(config_path) as file:
         config = yaml.safe_load(file)
-    return config
\ No newline at end of file
+    return config
+
+'''
+    Load the service configuration once and share it between modules
+'''
+def get_config():
+    global _config
+    if _config is None:
+        _config = load_config(CONFIG_PATH)
+    return _config
@@ -0,0 +1,117 @@
+"""
+Worker pools that keep blocking work off the event loop
+CPU-bound parsing and OCR run in a process pool, Gemini calls in a thread pool
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPools:
+    """
+    Process pool for extraction, thread pool for network-bound calls and a
+    concurrency limit with queue-depth accounting for incoming requests
+    """
+
+    def __init__(self, extraction_workers: Optional[int] = None, io_workers: int = 8,
+                 max_concurrent: int = 16):
+        self.extraction_workers = extraction_workers or os.cpu_count() or 1
+        self.io_workers = io_workers
+        self.max_concurrent = max_concurrent
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._manager = None
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "WorkerPools":
+        return cls(
+            extraction_workers=config.get("extraction_workers"),
+            io_workers=config.get("gemini_workers", 8),
+            max_concurrent=config.get("max_concurrent_uploads", 16),
+        )
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        # Created on first use so importing the app never forks
+        if self._process_pool is None:
+            logger.info(f"Starting extraction pool with {self.extraction_workers} process(es)")
+            self._process_pool = ProcessPoolExecutor(max_workers=self.extraction_workers)
+        return self._process_pool
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.io_workers,
+                                                   thread_name_prefix="gemini")
+        return self._thread_pool
+
+    async def run_cpu(self, func, *args, **kwargs):
+        """Run a CPU-bound, picklable callable in the process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.process_pool, functools.partial(func, *args, **kwargs))
+
+    async def run_io(self, func, *args, **kwargs):
+        """Run a blocking I/O callable in the thread pool, keeping context variables"""
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self.thread_pool, functools.partial(ctx.run, func, *args, **kwargs))
+
+    @asynccontextmanager
+    async def slot(self):
+        """Limit how many requests are processed at once; waiters count as queued"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "extraction_workers": self.extraction_workers,
+            "io_workers": self.io_workers,
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "queue_depth": self.queued,
+            "completed": self.completed,
+        }
+
+    def event_queue(self):
+        """
+        A queue worker processes can put progress events on (process pool
+        futures only carry the final result)
+        """
+        if self._manager is None:
+            self._manager = multiprocessing.Manager()
+        return self._manager.Queue()
+
+    def shutdown(self):
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None